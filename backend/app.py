@@ -4,11 +4,12 @@ Main Flask Application Entry Point
 """
 
 import os
+import itertools
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from config import config
 from models import db, init_db
@@ -22,6 +23,21 @@ from routes import (
     admin_bp
 )
 from services.challenge_engine import reset_daily_equity
+from services.batch_evaluator import evaluate_active_challenges, revalue_positions
+from services.evaluation_queue import evaluation_queue
+from services.order_book import order_book
+from services.idempotency import idempotency_store
+from services.portfolio_cache import portfolio_cache
+from services.trading_stats import backfill_trading_stats
+from services.ledger import backfill_ledger
+from services.leaderboard import backfill_leaderboard
+from services.period_leaderboard import backfill_period_rankings
+from services.rank_index import rank_index
+from services.platform_stats import platform_stats
+from services.http_cache import ensure_versions
+from services.metrics import ensure_rollup, reconcile
+from services.analytics import backfill_daily_rollups, rebuild_daily_rollups
+from services.auth_cache import auth_cache
 
 
 def create_app(config_name=None):
@@ -34,6 +50,8 @@ def create_app(config_name=None):
     
     # Initialize extensions
     db.init_app(app)
+    idempotency_store.init_app(app)
+    portfolio_cache.init_app(app)
     CORS(app, origins=app.config.get('CORS_ORIGINS', ['*']))
     JWTManager(app)
     
@@ -84,6 +102,19 @@ def create_app(config_name=None):
     # Initialize database
     with app.app_context():
         init_db(app)
+        backfill_trading_stats()
+        backfill_ledger()
+        backfill_leaderboard()
+        backfill_period_rankings()
+        ensure_versions()
+        ensure_rollup()
+        backfill_daily_rollups()
+    
+    evaluation_queue.init_app(app)
+    order_book.init_app(app)
+    rank_index.init_app(app)
+    platform_stats.init_app(app)
+    auth_cache.init_app(app)
     
     return app
 
@@ -99,6 +130,40 @@ def setup_scheduler(app):
             result = reset_daily_equity()
             print(f"Daily equity reset: {result}")
     
+    # Mark-to-market: revalue open positions, then evaluate the killer rules
+    # for all active challenges (read endpoints never persist prices)
+    # Equity and running statistics that only moved with prices are written every STATS_WRITE_INTERVAL
+    stats_every = max(1, app.config['STATS_WRITE_INTERVAL'] // app.config['MARKET_UPDATE_INTERVAL'])
+    runs = itertools.count()
+    
+    @scheduler.scheduled_job('interval', seconds=app.config['MARKET_UPDATE_INTERVAL'])
+    def mark_to_market():
+        with app.app_context():
+            revalue_positions()
+            evaluate_active_challenges(write_stats=next(runs) % stats_every == 0)
+    
+    # Matching engine: fill resting orders whose trigger the latest quotes cross
+    @scheduler.scheduled_job('interval', seconds=app.config['ORDER_MATCH_INTERVAL'])
+    def match_orders():
+        with app.app_context():
+            order_book.match()
+    
+    # Admin dashboard counters and the recent daily rollups: repair any drift from the source tables
+    @scheduler.scheduled_job('interval', seconds=app.config['METRICS_RECONCILE_INTERVAL'])
+    def reconcile_metrics():
+        with app.app_context():
+            drift = reconcile()
+            if drift:
+                print(f"Metrics rollup drift repaired: {drift}")
+            rebuild_daily_rollups(since=datetime.utcnow().date() - timedelta(days=1))
+            db.session.commit()
+    
+    # Expired Idempotency-Keys
+    @scheduler.scheduled_job('interval', hours=1)
+    def purge_idempotency_keys():
+        with app.app_context():
+            idempotency_store.purge()
+    
     scheduler.start()
     return scheduler
 
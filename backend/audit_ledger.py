@@ -0,0 +1,50 @@
+"""
+Offline ledger audit
+Rebuilds every challenge from the trade ledger in parallel and compares the
+result with the live challenge/position rows
+Run with: python audit_ledger.py [--workers 4] [--status active]
+"""
+
+import argparse
+from decimal import Decimal
+from app import create_app
+from models import db, Challenge, Position
+from services.ledger import replay_challenges, compare_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify challenges against the trade ledger')
+    parser.add_argument('--workers', type=int, default=4, help='parallel replay processes')
+    parser.add_argument('--status', help='only audit challenges with this status')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        query = db.session.query(Challenge.id, Challenge.current_balance).filter(Challenge.ledger_seq > 0)
+        if args.status:
+            query = query.filter(Challenge.status == args.status)
+        balances = {row.id: Decimal(str(row.current_balance)) for row in query}
+        
+        database_url = db.engine.url.render_as_string(hide_password=False)
+        states = replay_challenges(database_url, sorted(balances), workers=args.workers)
+        
+        live_positions = {}
+        for pos in db.session.query(Position.challenge_id, Position.symbol, Position.quantity, Position.avg_entry_price):
+            if pos.challenge_id in balances:
+                live_positions.setdefault(pos.challenge_id, {})[pos.symbol] = [
+                    Decimal(str(pos.quantity)), Decimal(str(pos.avg_entry_price))
+                ]
+    
+    mismatches = 0
+    for challenge_id, state in sorted(states.items()):
+        result = compare_state(challenge_id, balances[challenge_id], live_positions.get(challenge_id, {}), state)
+        if not result['consistent']:
+            mismatches += 1
+            print(f"Challenge {challenge_id} (seq {result['seq']}): {result['differences']}")
+    
+    print(f"Audited {len(states)} challenges, {mismatches} inconsistent")
+
+
+if __name__ == '__main__':
+    main()
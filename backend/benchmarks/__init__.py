@@ -0,0 +1,2 @@
+# Benchmarks package
+# Run from backend/, e.g.: python -m benchmarks.engine_bench --users 10000
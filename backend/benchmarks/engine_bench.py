@@ -0,0 +1,117 @@
+"""
+Challenge engine benchmark
+Generates a synthetic population into a scratch database, then times rule
+evaluation, position revaluation, the daily reset, the positions view and
+the leaderboard queries, reporting p50/p99 latency and queries per operation
+
+Run from backend/:
+    python -m benchmarks.engine_bench --users 10000
+    python -m benchmarks.engine_bench --users 100000 --database-url postgresql://localhost/tradesense_bench
+"""
+
+import argparse
+import random
+from benchmarks.harness import bootstrap_app, QueryCounter, Measurement, measure, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the challenge engine on a synthetic population')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--trades', type=int, default=20, help='trades per challenge')
+    parser.add_argument('--samples', type=int, default=200, help='runs for per-request operations')
+    parser.add_argument('--repeat', type=int, default=3, help='runs for population-wide jobs')
+    parser.add_argument('--database-url', help='scratch database (default: BenchmarkConfig)')
+    parser.add_argument('--skip-populate', action='store_true', help='reuse the existing scratch data')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    app = bootstrap_app(args.database_url)
+    
+    from flask_jwt_extended import create_access_token
+    from models import db, Challenge
+    from services.challenge_engine import ChallengeEngine, reset_daily_equity
+    from services.batch_evaluator import evaluate_active_challenges, revalue_positions
+    from services.market_data import MarketDataService
+    from benchmarks.population import generate_population
+    
+    # Quotes come from the built-in simulator so results don't depend on the network
+    MarketDataService.get_price = staticmethod(MarketDataService._get_simulated_us_price)
+    MarketDataService.get_prices = staticmethod(
+        lambda symbols: {s: MarketDataService._get_simulated_us_price(s) for s in symbols}
+    )
+    
+    if not args.skip_populate:
+        counts = generate_population(app, args.users, trades_per_challenge=args.trades, seed=args.seed)
+        print(f"Population: {counts}")
+    
+    rng = random.Random(args.seed)
+    client = app.test_client()
+    results = []
+    
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        
+        active_ids = [row.id for row in db.session.query(Challenge.id).filter_by(status='active')]
+        sample = rng.sample(active_ids, min(args.samples, len(active_ids)))
+        user_ids = {row.id: row.user_id for row in db.session.query(Challenge.id, Challenge.user_id).filter(Challenge.id.in_(sample))}
+        tokens = {cid: create_access_token(identity=str(user_ids[cid])) for cid in sample}
+        db.session.remove()
+        
+        # Read paths first, before evaluation starts changing statuses
+        for name, path in (('GET /api/leaderboard', '/api/leaderboard'),
+                           ('GET /api/leaderboard/all', '/api/leaderboard/all'),
+                           ('GET /api/leaderboard/stats', '/api/leaderboard/stats')):
+            m = Measurement(name)
+            for _ in range(args.samples):
+                with measure(m, counter):
+                    client.get(path)
+            results.append(m)
+        
+        m = Measurement('GET /api/trades/positions')
+        for cid in sample:
+            with measure(m, counter):
+                client.get('/api/trades/positions', headers={'Authorization': f'Bearer {tokens[cid]}'})
+        results.append(m)
+        
+        m = Measurement('ChallengeEngine.evaluate')
+        for cid in sample:
+            with measure(m, counter):
+                ChallengeEngine(db.session.get(Challenge, cid)).evaluate()
+        db.session.remove()
+        results.append(m)
+        
+        m = Measurement('revalue_positions')
+        for _ in range(args.repeat):
+            with measure(m, counter):
+                revalue_positions()
+        db.session.remove()
+        results.append(m)
+        
+        m = Measurement('evaluate_active_challenges')
+        for _ in range(args.repeat):
+            with measure(m, counter):
+                evaluate_active_challenges()
+        db.session.remove()
+        results.append(m)
+        
+        # Scheduler runs between statistics write-backs
+        m = Measurement('evaluate_active_challenges (status only)')
+        for _ in range(args.repeat):
+            revalue_positions()
+            with measure(m, counter):
+                evaluate_active_challenges(write_stats=False)
+        db.session.remove()
+        results.append(m)
+        
+        m = Measurement('reset_daily_equity')
+        for _ in range(args.repeat):
+            with measure(m, counter):
+                reset_daily_equity()
+        db.session.remove()
+        results.append(m)
+    
+    print_report(results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark harness helpers
+App bootstrap on a scratch database, query counting and latency reporting
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+
+def bootstrap_app(database_url: str = None):
+    """
+    Create the Flask app on the benchmark config
+    Must run before anything imports `app`, which builds its app at import time
+    """
+    os.environ['FLASK_ENV'] = 'benchmark'
+    if database_url:
+        os.environ['BENCH_DATABASE_URL'] = database_url
+    
+    from app import app
+    return app
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine"""
+    
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+    
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class Measurement:
+    """Latency samples and query count for one operation"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = []
+        self.queries = 0
+    
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def as_row(self) -> dict:
+        runs = len(self.samples)
+        return {
+            'operation': self.name,
+            'runs': runs,
+            'total_s': round(sum(self.samples), 3),
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p99_ms': round(self.percentile(99) * 1000, 2),
+            'queries_per_op': round(self.queries / runs, 1) if runs else 0
+        }
+
+
+@contextmanager
+def measure(measurement: Measurement, counter: QueryCounter):
+    """Time one run of an operation and attribute its queries"""
+    queries_before = counter.count
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        measurement.samples.append(time.perf_counter() - start)
+        measurement.queries += counter.count - queries_before
+
+
+def print_report(measurements: list[Measurement]):
+    rows = [m.as_row() for m in measurements if m.samples]
+    headers = ['operation', 'runs', 'total_s', 'p50_ms', 'p99_ms', 'queries_per_op']
+    widths = [max(len(h), *(len(str(r[h])) for r in rows)) for h in headers]
+    
+    print('  '.join(h.ljust(w) for h, w in zip(headers, widths)))
+    print('  '.join('-' * w for w in widths))
+    for row in rows:
+        print('  '.join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
@@ -0,0 +1,268 @@
+"""
+Money arithmetic micro-benchmark
+Times the per-order CPU work of the fill and rule paths (balance check,
+balance update, position averaging, realized P&L, equity and the loss /
+profit checks) with Decimal values against integer micro-units (money.py)
+
+Two pairs of kernels: plain values (the arithmetic alone, as the
+in-memory portfolio cache does it), and fills on real Plan / Challenge /
+Position instances, in Decimal straight from the NUMERIC columns (as
+trade_executor does) or converting every column to and from micro-units.
+"reloaded" rows replace every column value with a new Decimal before each
+order, as a commit followed by a fresh load does
+No database: only the work the order path performs in Python
+
+Run from backend/:
+    python -m benchmarks.money_bench
+    python -m benchmarks.money_bench --orders 200000 --positions 10
+"""
+
+import argparse
+import random
+import time
+from decimal import Decimal
+from sqlalchemy.orm.attributes import set_committed_value
+from benchmarks.harness import Measurement
+from money import to_micros, from_micros, mul, div, to_cents, reaches_pct, round_micros, round_cents
+from models import Plan, Challenge, Position
+
+CHALLENGE_COLUMNS = ('current_balance', 'initial_balance', 'daily_start_equity')
+POSITION_COLUMNS = ('quantity', 'avg_entry_price', 'current_price')
+
+
+def decimal_order(state: dict, side: str, quantity: Decimal, price: Decimal) -> bool:
+    """One order with Decimal(str()) round trips, as the columns are read back"""
+    balance = Decimal(str(state['balance']))
+    position = state['positions'][0]
+    
+    if side == 'buy':
+        trade_value = price * quantity
+        if trade_value > balance:
+            return False
+        state['balance'] = balance - trade_value
+        total_quantity = Decimal(str(position[0])) + quantity
+        total_cost = Decimal(str(position[1])) * Decimal(str(position[0])) + price * quantity
+        position[1] = total_cost / total_quantity
+        position[0] = total_quantity
+    else:
+        if quantity > Decimal(str(position[0])):
+            return False
+        pnl = (price - Decimal(str(position[1]))) * quantity
+        state['pnl'] = state['pnl'] + pnl
+        position[0] = Decimal(str(position[0])) - quantity
+        state['balance'] = balance + price * quantity
+    
+    equity = Decimal(str(state['balance'])) + sum(
+        (Decimal(str(held)) * Decimal(str(mark)) for held, _, mark in state['positions']), Decimal('0')
+    )
+    initial = Decimal(str(state['initial']))
+    daily_start = Decimal(str(state['daily_start']))
+    limit = Decimal(str(state['limit'])) / 100
+    
+    return not ((daily_start - equity) / daily_start >= limit or (initial - equity) / initial >= limit)
+
+
+def micros_order(state: dict, side: str, quantity: int, price: int) -> bool:
+    """The same order in integer micro-units"""
+    balance = state['balance']
+    position = state['positions'][0]
+    
+    if side == 'buy':
+        trade_value = to_cents(mul(price, quantity))
+        if trade_value > balance:
+            return False
+        state['balance'] = balance - trade_value
+        total_quantity = position[0] + quantity
+        total_cost = mul(position[1], position[0]) + mul(price, quantity)
+        position[1] = div(total_cost, total_quantity)
+        position[0] = total_quantity
+    else:
+        if quantity > position[0]:
+            return False
+        state['pnl'] += to_cents(mul(price - position[1], quantity))
+        position[0] -= quantity
+        state['balance'] = balance + to_cents(mul(price, quantity))
+    
+    equity = state['balance'] + sum(mul(held, mark) for held, _, mark in state['positions'])
+    initial = state['initial']
+    daily_start = state['daily_start']
+    limit = state['limit']
+    
+    return not (reaches_pct(daily_start - equity, daily_start, limit) or reaches_pct(initial - equity, initial, limit))
+
+
+def decimal_model_order(rows: dict, side: str, quantity: Decimal, price: Decimal) -> bool:
+    """One fill on model instances in Decimal, as trade_executor applies it"""
+    challenge, plan, positions = rows['challenge'], rows['plan'], rows['positions']
+    position = positions[0]
+    balance = challenge.current_balance
+    
+    if side == 'buy':
+        trade_value = round_cents(round_micros(price * quantity))
+        if trade_value > balance:
+            return False
+        challenge.current_balance = balance - trade_value
+        held = position.quantity
+        total_quantity = held + quantity
+        total_cost = round_micros(position.avg_entry_price * held) + round_micros(price * quantity)
+        position.avg_entry_price = round_micros(total_cost / total_quantity)
+        position.quantity = total_quantity
+    else:
+        held = position.quantity
+        if quantity > held:
+            return False
+        position.quantity = held - quantity
+        challenge.current_balance = balance + round_cents(round_micros(price * quantity))
+    
+    equity = challenge.current_balance + sum(
+        (round_micros(pos.quantity * pos.current_price) for pos in positions), Decimal('0')
+    )
+    initial = challenge.initial_balance
+    daily_start = challenge.daily_start_equity
+    
+    return not ((daily_start - equity) * 100 >= plan.max_daily_loss_pct * daily_start
+                or (initial - equity) * 100 >= plan.max_total_loss_pct * initial)
+
+
+def converted_model_order(rows: dict, side: str, quantity: int, price: int) -> bool:
+    """The same fill in micro-units, converting every column read and write"""
+    challenge, plan, positions = rows['challenge'], rows['plan'], rows['positions']
+    position = positions[0]
+    balance = to_micros(challenge.current_balance)
+    
+    if side == 'buy':
+        trade_value = to_cents(mul(price, quantity))
+        if trade_value > balance:
+            return False
+        challenge.current_balance = from_micros(balance - trade_value)
+        held = to_micros(position.quantity)
+        total_quantity = held + quantity
+        total_cost = mul(to_micros(position.avg_entry_price), held) + mul(price, quantity)
+        position.avg_entry_price = from_micros(div(total_cost, total_quantity))
+        position.quantity = from_micros(total_quantity)
+    else:
+        held = to_micros(position.quantity)
+        if quantity > held:
+            return False
+        position.quantity = from_micros(held - quantity)
+        challenge.current_balance = from_micros(balance + to_cents(mul(price, quantity)))
+    
+    equity = to_micros(challenge.current_balance) + sum(
+        mul(to_micros(pos.quantity), to_micros(pos.current_price)) for pos in positions
+    )
+    initial = to_micros(challenge.initial_balance)
+    daily_start = to_micros(challenge.daily_start_equity)
+    
+    return not (reaches_pct(daily_start - equity, daily_start, to_micros(plan.max_daily_loss_pct))
+                or reaches_pct(initial - equity, initial, to_micros(plan.max_total_loss_pct)))
+
+
+def build_rows(positions: int) -> dict:
+    """Transient model instances holding Decimal column values, as loaded from NUMERIC columns"""
+    plan = Plan(max_daily_loss_pct=Decimal('10.00'), max_total_loss_pct=Decimal('10.00'))
+    challenge = Challenge(
+        current_balance=Decimal('1000000.00'),
+        initial_balance=Decimal('1000000.00'),
+        daily_start_equity=Decimal('1000000.00')
+    )
+    return {
+        'plan': plan,
+        'challenge': challenge,
+        'positions': [
+            Position(quantity=Decimal('100.000000'), avg_entry_price=Decimal('178.500000'), current_price=Decimal('178.500000'))
+            for _ in range(positions)
+        ]
+    }
+
+
+def reload_rows(rows: dict):
+    """Replace every column value with a new Decimal, like a commit and a fresh load"""
+    for column in CHALLENGE_COLUMNS:
+        set_committed_value(rows['challenge'], column, Decimal(str(getattr(rows['challenge'], column))))
+    for position in rows['positions']:
+        for column in POSITION_COLUMNS:
+            set_committed_value(position, column, Decimal(str(getattr(position, column))))
+
+
+def reloading(kernel):
+    def run_reloaded(rows, side, quantity, price):
+        reload_rows(rows)
+        return kernel(rows, side, quantity, price)
+    return run_reloaded
+
+
+def build_orders(count: int, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    return [
+        ('buy' if rng.random() < 0.6 else 'sell', rng.randint(1, 20), round(178.50 * rng.uniform(0.98, 1.02), 2))
+        for _ in range(count)
+    ]
+
+
+def run(name: str, kernel, state: dict, orders: list[tuple], batch: int) -> Measurement:
+    measurement = Measurement(name)
+    for start in range(0, len(orders), batch):
+        chunk = orders[start:start + batch]
+        began = time.perf_counter()
+        for side, quantity, price in chunk:
+            kernel(state, side, quantity, price)
+        measurement.samples.append((time.perf_counter() - began) / len(chunk))
+    return measurement
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-order CPU cost of Decimal vs integer micro-unit money')
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--positions', type=int, default=5, help='open positions valued for equity')
+    parser.add_argument('--batch', type=int, default=1000, help='orders per latency sample')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    orders = build_orders(args.orders, args.seed)
+    
+    decimal_state = {
+        'balance': Decimal('1000000.00'), 'initial': Decimal('1000000.00'), 'daily_start': Decimal('1000000.00'),
+        'limit': Decimal('10.00'), 'pnl': Decimal('0'),
+        'positions': [[Decimal('100'), Decimal('178.50'), Decimal('178.50')] for _ in range(args.positions)]
+    }
+    micros_state = {
+        'balance': to_micros(1000000), 'initial': to_micros(1000000), 'daily_start': to_micros(1000000),
+        'limit': to_micros(10), 'pnl': 0,
+        'positions': [[to_micros(100), to_micros(Decimal('178.50')), to_micros(Decimal('178.50'))] for _ in range(args.positions)]
+    }
+    
+    decimal_rows, micros_rows = build_rows(args.positions), build_rows(args.positions)
+    decimal_orders = [(side, Decimal(quantity), Decimal(str(price))) for side, quantity, price in orders]
+    micros_orders = [(side, to_micros(quantity), to_micros(price)) for side, quantity, price in orders]
+    
+    results = [
+        run('decimal', decimal_order, decimal_state, decimal_orders, args.batch),
+        run('micro-units', micros_order, micros_state, micros_orders, args.batch),
+        run('decimal model', decimal_model_order, decimal_rows, decimal_orders, args.batch),
+        run('micro-units model', converted_model_order, micros_rows, micros_orders, args.batch),
+        run('decimal model reloaded', reloading(decimal_model_order), build_rows(args.positions), decimal_orders, args.batch),
+        run('micro-units model reloaded', reloading(converted_model_order), build_rows(args.positions), micros_orders, args.batch)
+    ]
+    
+    print(f"{args.orders} orders, {args.positions} open positions, per-order CPU in microseconds")
+    print(f"{'kernel':<28}  {'p50_us':>8}  {'p99_us':>8}  {'mean_us':>8}")
+    for measurement in results:
+        mean = sum(measurement.samples) / len(measurement.samples)
+        print(f"{measurement.name:<28}  {measurement.percentile(50) * 1e6:>8.2f}  "
+              f"{measurement.percentile(99) * 1e6:>8.2f}  {mean * 1e6:>8.2f}")
+    
+    means = [sum(m.samples) / len(m.samples) for m in results]
+    for label, decimal_cost, micros_cost in zip(('values', 'model', 'model reloaded'), means[0::2], means[1::2]):
+        print(f"micro-units, {label}: {decimal_cost / micros_cost:.2f}x the Decimal throughput")
+    
+    # Both paths must agree to the cent on the final balance
+    drift = abs(Decimal(str(decimal_state['balance'])) - from_micros(micros_state['balance']))
+    print(f"final balance: decimal {round(decimal_state['balance'], 2)}, micro-units {from_micros(micros_state['balance'])} "
+          f"(difference {drift:.6f})")
+    # The row path rounds the same way in either representation
+    print(f"final model balance: decimal {decimal_rows['challenge'].current_balance}, "
+          f"micro-units {micros_rows['challenge'].current_balance}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Order execution stress test
+Fires concurrent market orders at a handful of challenges from many threads,
+then checks that no balance was double-spent and that balances, positions,
+trades, the ledger and the write-through portfolio cache all agree
+
+Run from backend/:
+    python -m benchmarks.order_stress --orders 5000 --threads 16 --challenges 4
+"""
+
+import argparse
+import random
+import threading
+import time
+from decimal import Decimal
+from benchmarks.harness import bootstrap_app, Measurement, print_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent order execution stress test')
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--challenges', type=int, default=4, help='few challenges = heavy contention')
+    parser.add_argument('--database-url', help='scratch database (default: BenchmarkConfig)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    app = bootstrap_app(args.database_url)
+    
+    from sqlalchemy import func
+    from models import db, init_db, User, Plan, Challenge, Position, Trade
+    from money import to_micros
+    from services.ledger import record_deposit, verify_challenge
+    from services.trade_executor import execute_order
+    from services.portfolio_cache import portfolio_cache
+    
+    symbols = {'AAPL': 178.50, 'MSFT': 378.20, 'NVDA': 495.30}
+    
+    with app.app_context():
+        db.drop_all()
+        init_db(app)
+        
+        plan = Plan.query.filter_by(name='Pro').first()
+        challenge_ids = []
+        for i in range(args.challenges):
+            user = User(email=f'stress{i}@tradesense.test', password_hash='x', username=f'stress{i}')
+            db.session.add(user)
+            challenge = Challenge(
+                user=user,
+                plan_id=plan.id,
+                initial_balance=plan.initial_balance,
+                current_balance=plan.initial_balance,
+                equity=plan.initial_balance,
+                daily_start_equity=plan.initial_balance,
+                status='active'
+            )
+            db.session.add(challenge)
+            record_deposit(challenge, plan.initial_balance)
+            db.session.flush()
+            challenge_ids.append(challenge.id)
+        db.session.commit()
+        
+        # Prime the portfolio cache so every fill is written through
+        for challenge in Challenge.query.filter(Challenge.id.in_(challenge_ids)).all():
+            portfolio_cache.get(challenge)
+    
+    outcomes = {'filled': 0, 'rejected': 0, 'conflict': 0}
+    outcomes_lock = threading.Lock()
+    latency = Measurement('execute_order')
+    per_thread = [args.orders // args.threads + (1 if t < args.orders % args.threads else 0) for t in range(args.threads)]
+    
+    def worker(thread_index, count):
+        rng = random.Random(args.seed + thread_index)
+        samples = []
+        local = {'filled': 0, 'rejected': 0, 'conflict': 0}
+        
+        with app.app_context():
+            for _ in range(count):
+                symbol = rng.choice(list(symbols))
+                price = to_micros(round(symbols[symbol] * rng.uniform(0.98, 1.02), 2))
+                side = 'buy' if rng.random() < 0.6 else 'sell'
+                quantity = to_micros(rng.randint(1, 20))
+                
+                start = time.perf_counter()
+                result = execute_order(rng.choice(challenge_ids), symbol, side, quantity, price)
+                samples.append(time.perf_counter() - start)
+                
+                if 'error' not in result:
+                    local['filled'] += 1
+                elif result.get('retryable'):
+                    local['conflict'] += 1
+                else:
+                    local['rejected'] += 1
+            db.session.remove()
+        
+        with outcomes_lock:
+            latency.samples.extend(samples)
+            for key, value in local.items():
+                outcomes[key] += value
+    
+    threads = [threading.Thread(target=worker, args=(t, n)) for t, n in enumerate(per_thread)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    print(f"{args.orders} orders from {args.threads} threads on {args.challenges} challenges in {elapsed:.2f}s "
+          f"({args.orders / elapsed:.0f} orders/s): {outcomes}")
+    print_report([latency])
+    
+    # Invariants
+    problems = []
+    with app.app_context():
+        for challenge in Challenge.query.filter(Challenge.id.in_(challenge_ids)).all():
+            balance = Decimal(str(challenge.current_balance))
+            if balance < 0:
+                problems.append(f"challenge {challenge.id}: negative balance {balance}")
+            
+            audit = verify_challenge(challenge)
+            if not audit['consistent']:
+                problems.append(f"challenge {challenge.id}: ledger mismatch {audit['differences']}")
+            
+            cached = portfolio_cache._entries.get(challenge.id)
+            if cached is not None and cached.version == challenge.version:
+                stored = portfolio_cache._load(challenge, 0)
+                if (cached.balance, cached.positions) != (stored.balance, stored.positions):
+                    problems.append(f"challenge {challenge.id}: portfolio cache diverged from the database")
+            
+            net = dict(db.session.query(
+                Trade.symbol,
+                func.sum(db.case((Trade.side == 'buy', Trade.quantity), else_=-Trade.quantity))
+            ).filter(Trade.challenge_id == challenge.id).group_by(Trade.symbol).all())
+            held = {p.symbol: Decimal(str(p.quantity)) for p in Position.query.filter_by(challenge_id=challenge.id)}
+            
+            for symbol in set(net) | set(held):
+                if Decimal(str(net.get(symbol) or 0)) != held.get(symbol, Decimal('0')):
+                    problems.append(f"challenge {challenge.id}: {symbol} trades net {net.get(symbol)} != position {held.get(symbol)}")
+        
+        fills = Trade.query.filter(Trade.challenge_id.in_(challenge_ids)).count()
+        if fills != outcomes['filled']:
+            problems.append(f"{fills} trades recorded for {outcomes['filled']} acknowledged fills")
+    
+    if problems:
+        print('INCONSISTENT:')
+        for problem in problems:
+            print(f"  {problem}")
+        raise SystemExit(1)
+    
+    print('Consistent: no negative balance, ledger, positions, trades and portfolio cache agree')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Synthetic population generator
+Fills a scratch database with users, challenges, positions and trade histories
+"""
+
+import random
+from datetime import datetime, timedelta
+from sqlalchemy import insert, text
+from models import db, User, Plan, Challenge, Trade, Position, init_db
+from services.leaderboard import refresh_entries
+from services.market_data import MarketDataService
+
+SYMBOLS = list(MarketDataService.US_BASE_PRICES)
+
+
+def generate_population(app, users: int, trades_per_challenge: int = 20, max_positions: int = 5,
+                        seed: int = 42, chunk_size: int = 2000) -> dict:
+    """
+    Recreate the schema and insert `users` users with one challenge each
+    Roughly 70% active, 15% passed, 15% failed; active challenges hold up to
+    `max_positions` positions. Explicit ids keep the bulk inserts single-pass
+    """
+    rng = random.Random(seed)
+    
+    with app.app_context():
+        db.drop_all()
+        init_db(app)
+        
+        plans = [(plan.id, float(plan.initial_balance)) for plan in Plan.query.all()]
+        now = datetime.utcnow()
+        
+        user_rows, challenge_rows, position_rows, trade_rows = [], [], [], []
+        counts = {'users': 0, 'challenges': 0, 'positions': 0, 'trades': 0}
+        
+        def flush(force=False):
+            # Parents first, so foreign keys hold on databases that enforce them
+            if not force and len(user_rows) < chunk_size:
+                return
+            for model, rows in ((User, user_rows), (Challenge, challenge_rows),
+                                (Position, position_rows), (Trade, trade_rows)):
+                if rows:
+                    db.session.execute(insert(model), rows)
+                    rows.clear()
+        
+        for i in range(1, users + 1):
+            user_rows.append({
+                'id': i,
+                'email': f'bench{i}@tradesense.test',
+                'password_hash': 'x',
+                'username': f'bench{i}',
+                'created_at': now - timedelta(days=rng.randint(0, 365))
+            })
+            
+            plan_id, initial = rng.choice(plans)
+            roll = rng.random()
+            status = 'active' if roll < 0.7 else ('passed' if roll < 0.85 else 'failed')
+            start_date = now - timedelta(days=rng.randint(0, 60))
+            
+            if status == 'passed':
+                equity = initial * rng.uniform(1.10, 1.35)
+            elif status == 'failed':
+                equity = initial * rng.uniform(0.80, 0.95)
+            else:
+                equity = initial * rng.uniform(0.95, 1.08)
+            
+            # Active challenges keep part of their equity in open positions
+            invested = 0.0
+            if status == 'active':
+                for symbol in rng.sample(SYMBOLS, rng.randint(0, max_positions)):
+                    price = MarketDataService.US_BASE_PRICES[symbol]
+                    quantity = round(equity * rng.uniform(0.02, 0.12) / price, 4)
+                    if quantity <= 0:
+                        continue
+                    invested += quantity * price
+                    position_rows.append({
+                        'challenge_id': i,
+                        'symbol': symbol,
+                        'quantity': quantity,
+                        'avg_entry_price': price * rng.uniform(0.95, 1.05),
+                        'current_price': price
+                    })
+                    counts['positions'] += 1
+            
+            challenge_rows.append({
+                'id': i,
+                'user_id': i,
+                'plan_id': plan_id,
+                'initial_balance': initial,
+                'current_balance': round(equity - invested, 2),
+                'equity': round(equity, 2),
+                'daily_start_equity': round(equity * rng.uniform(0.99, 1.01), 2),
+                'status': status,
+                'start_date': start_date,
+                'end_date': None if status == 'active' else start_date + timedelta(days=rng.randint(1, 30)),
+                'created_at': start_date
+            })
+            
+            for t in range(trades_per_challenge):
+                symbol = rng.choice(SYMBOLS)
+                price = MarketDataService.US_BASE_PRICES[symbol]
+                opened_at = start_date + timedelta(minutes=t * 37)
+                side = 'buy' if t % 2 == 0 else 'sell'
+                trade_rows.append({
+                    'challenge_id': i,
+                    'symbol': symbol,
+                    'side': side,
+                    'quantity': round(rng.uniform(0.1, 10), 4),
+                    'entry_price': price,
+                    'exit_price': price * rng.uniform(0.97, 1.03) if side == 'sell' else None,
+                    'pnl': round(rng.uniform(-50, 60), 2) if side == 'sell' else 0,
+                    'status': 'closed' if side == 'sell' else 'open',
+                    'opened_at': opened_at,
+                    'closed_at': opened_at if side == 'sell' else None
+                })
+            
+            counts['users'] += 1
+            counts['challenges'] += 1
+            counts['trades'] += trades_per_challenge
+            flush()
+        
+        flush(force=True)
+        
+        # Explicit ids bypass PostgreSQL sequences; move them past the inserted rows
+        if db.engine.dialect.name == 'postgresql':
+            for table in ('users', 'challenges'):
+                db.session.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT MAX(id) FROM {table}))"
+                ))
+        
+        refresh_entries()
+        db.session.commit()
+    
+    return counts
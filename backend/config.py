@@ -17,6 +17,47 @@ class Config:
     
     # Market data settings
     MARKET_UPDATE_INTERVAL = int(os.getenv('MARKET_UPDATE_INTERVAL', 30))  # seconds
+    STATS_WRITE_INTERVAL = int(os.getenv('STATS_WRITE_INTERVAL', 300))  # seconds between write-backs of equity and running statistics
+    
+    # Trade ledger: write a state snapshot every N entries per challenge
+    LEDGER_SNAPSHOT_INTERVAL = int(os.getenv('LEDGER_SNAPSHOT_INTERVAL', 50))
+    
+    # Order execution: retries on concurrent-write conflicts (exponential backoff)
+    ORDER_MAX_RETRIES = int(os.getenv('ORDER_MAX_RETRIES', 3))
+    ORDER_RETRY_BACKOFF = float(os.getenv('ORDER_RETRY_BACKOFF', 0.02))  # seconds
+    
+    # Matching engine: how often resting orders are checked against fresh quotes
+    ORDER_MATCH_INTERVAL = int(os.getenv('ORDER_MATCH_INTERVAL', 5))  # seconds
+    
+    # Idempotency-Key support on order and checkout endpoints
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))  # seconds
+    IDEMPOTENCY_WAIT_TIMEOUT = int(os.getenv('IDEMPOTENCY_WAIT_TIMEOUT', 30))  # seconds
+    IDEMPOTENCY_CLAIM_TIMEOUT = int(os.getenv('IDEMPOTENCY_CLAIM_TIMEOUT', 300))  # seconds before a crashed request's claim is taken over
+    
+    # Portfolio cache: max age of a cached challenge portfolio, entries kept per process
+    PORTFOLIO_CACHE_TTL = int(os.getenv('PORTFOLIO_CACHE_TTL', 30))  # seconds
+    PORTFOLIO_CACHE_MAX_ENTRIES = int(os.getenv('PORTFOLIO_CACHE_MAX_ENTRIES', 10000))
+    
+    # Rank index (/api/leaderboard/me): max age before a process reloads it from the leaderboard table
+    RANK_INDEX_MAX_AGE = int(os.getenv('RANK_INDEX_MAX_AGE', 60))  # seconds
+    
+    # Public platform stats: max age of the cached rollup (dropped early on any status change)
+    PLATFORM_STATS_TTL = int(os.getenv('PLATFORM_STATS_TTL', 15))  # seconds
+    
+    # Admin authorization: max age of a cached auth_version before a revoked admin token is refused
+    AUTH_CACHE_TTL = int(os.getenv('AUTH_CACHE_TTL', 30))  # seconds
+    
+    # Admin dashboard rollup: how often the counters are recomputed from the source tables
+    METRICS_RECONCILE_INTERVAL = int(os.getenv('METRICS_RECONCILE_INTERVAL', 3600))  # seconds
+    
+    # Challenge exports: rows fetched per server-side cursor batch, concurrent downloads per process
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+    EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', 2))
+    
+    # Post-trade rule evaluation queue (max delay before a fill is evaluated)
+    EVALUATION_QUEUE_ENABLED = True
+    EVALUATION_QUEUE_INTERVAL = float(os.getenv('EVALUATION_QUEUE_INTERVAL', 0.5))  # seconds
+    EVALUATION_CLAIM_TIMEOUT = int(os.getenv('EVALUATION_CLAIM_TIMEOUT', 60))  # seconds before another worker may take over a claim
     
     # PayPal settings (can be overridden in SuperAdmin)
     PAYPAL_MODE = os.getenv('PAYPAL_MODE', 'sandbox')
@@ -38,12 +79,20 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///tradesense_test.db'
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URL', 'sqlite:///tradesense_test.db')
+    EVALUATION_QUEUE_ENABLED = False  # evaluate inline for deterministic tests
+
+
+class BenchmarkConfig(Config):
+    """Benchmark configuration (scratch database, see benchmarks/)"""
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URL', 'sqlite:///tradesense_bench.db')
+    EVALUATION_QUEUE_ENABLED = False
 
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
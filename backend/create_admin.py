@@ -5,6 +5,7 @@ Exécuter avec: python create_admin.py
 
 from app import create_app
 from models import db, User
+from services.metrics import adjust as adjust_metrics
 from werkzeug.security import generate_password_hash
 
 app = create_app()
@@ -16,6 +17,9 @@ with app.app_context():
     
     if existing:
         # Mettre à jour l'utilisateur existant en admin
+        if not existing.is_admin:
+            adjust_metrics(users_admins=1)
+            existing.auth_version = (existing.auth_version or 0) + 1
         existing.is_admin = True
         db.session.commit()
         print(f"✅ Utilisateur {admin_email} mis à jour en admin!")
@@ -28,6 +32,7 @@ with app.app_context():
             is_admin=True
         )
         db.session.add(admin)
+        adjust_metrics(users_total=1, users_admins=1)
         db.session.commit()
         print(f"✅ Admin créé avec succès!")
         print(f"   Email: {admin_email}")
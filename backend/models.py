@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
@@ -11,12 +12,16 @@ class User(db.Model):
     password_hash = db.Column(db.String(255), nullable=False)
     username = db.Column(db.String(100))
     is_admin = db.Column(db.Boolean, default=False)
+    auth_version = db.Column(db.Integer, nullable=False, default=0)  # bumped on admin rights changes, revokes older tokens' claims
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     challenges = db.relationship('Challenge', backref='user', lazy=True, cascade='all, delete-orphan')
     payments = db.relationship('Payment', backref='user', lazy=True, cascade='all, delete-orphan')
     
+    # Admin list pages: newest first, keyset on (created_at, id)
+    __table_args__ = (db.Index('ix_users_created_id', 'created_at', 'id'),)
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -37,6 +42,7 @@ class Plan(db.Model):
     max_daily_loss_pct = db.Column(db.Numeric(5, 2), default=5.00)
     max_total_loss_pct = db.Column(db.Numeric(5, 2), default=10.00)
     profit_target_pct = db.Column(db.Numeric(5, 2), default=10.00)
+    max_trailing_drawdown_pct = db.Column(db.Numeric(5, 2))  # optional, measured from the high-water mark
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -49,6 +55,7 @@ class Plan(db.Model):
             'max_daily_loss_pct': float(self.max_daily_loss_pct),
             'max_total_loss_pct': float(self.max_total_loss_pct),
             'profit_target_pct': float(self.profit_target_pct),
+            'max_trailing_drawdown_pct': float(self.max_trailing_drawdown_pct) if self.max_trailing_drawdown_pct is not None else None,
             'description': self.description
         }
 
@@ -65,6 +72,17 @@ class Challenge(db.Model):
     daily_start_equity = db.Column(db.Numeric(15, 2), nullable=False)
     status = db.Column(db.String(20), default='active')  # active, passed, failed
     failure_reason = db.Column(db.String(255))
+    
+    # Running statistics, updated incrementally on each evaluation
+    high_water_mark = db.Column(db.Numeric(15, 2))
+    max_drawdown_pct = db.Column(db.Numeric(7, 4), default=0)
+    intraday_high = db.Column(db.Numeric(15, 2))
+    intraday_low = db.Column(db.Numeric(15, 2))
+    best_day_pnl = db.Column(db.Numeric(15, 2))
+    worst_day_pnl = db.Column(db.Numeric(15, 2))
+    
+    ledger_seq = db.Column(db.Integer, default=0)  # last sequence number written to the ledger
+    version = db.Column(db.Integer, nullable=False, default=1)  # optimistic concurrency check on every write
     start_date = db.Column(db.DateTime, default=datetime.utcnow)
     end_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -73,6 +91,18 @@ class Challenge(db.Model):
     plan = db.relationship('Plan', backref='challenges')
     trades = db.relationship('Trade', backref='challenge', lazy=True, cascade='all, delete-orphan')
     positions = db.relationship('Position', backref='challenge', lazy=True, cascade='all, delete-orphan')
+    orders = db.relationship('Order', backref='challenge', lazy=True, cascade='all, delete-orphan')
+    ledger_entries = db.relationship('LedgerEntry', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
+    ledger_snapshots = db.relationship('LedgerSnapshot', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
+    trading_stats = db.relationship('TradingStat', backref='challenge', lazy='dynamic', cascade='all, delete-orphan')
+    leaderboard_entry = db.relationship('LeaderboardEntry', backref='challenge', uselist=False, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_challenges_created_id', 'created_at', 'id'),
+        db.Index('ix_challenges_status_created_id', 'status', 'created_at', 'id'),
+    )
+    
+    __mapper_args__ = {'version_id_col': version}
     
     def to_dict(self):
         return {
@@ -107,6 +137,12 @@ class Trade(db.Model):
     opened_at = db.Column(db.DateTime, default=datetime.utcnow)
     closed_at = db.Column(db.DateTime)
     
+    # Trade history pages are range scans on these (see services/pagination.py)
+    __table_args__ = (
+        db.Index('idx_trades_challenge_opened', 'challenge_id', 'opened_at', 'id'),
+        db.Index('idx_trades_challenge_symbol_opened', 'challenge_id', 'symbol', 'opened_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -150,6 +186,268 @@ class Position(db.Model):
         }
 
 
+class Order(db.Model):
+    """Resting limit / stop-loss / take-profit order, filled by the matching engine"""
+    __tablename__ = 'orders'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    side = db.Column(db.String(10), nullable=False)  # buy, sell
+    order_type = db.Column(db.String(20), nullable=False)  # limit, stop_loss, take_profit
+    quantity = db.Column(db.Numeric(15, 6), nullable=False)
+    trigger_price = db.Column(db.Numeric(15, 6), nullable=False)
+    status = db.Column(db.String(20), default='open')  # open, filled, cancelled, rejected
+    reject_reason = db.Column(db.String(255))
+    fill_price = db.Column(db.Numeric(15, 6))
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    filled_at = db.Column(db.DateTime)
+    
+    __table_args__ = (db.Index('ix_orders_status_id', 'status', 'id'),)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'challenge_id': self.challenge_id,
+            'symbol': self.symbol,
+            'side': self.side,
+            'order_type': self.order_type,
+            'quantity': float(self.quantity),
+            'trigger_price': float(self.trigger_price),
+            'status': self.status,
+            'reject_reason': self.reject_reason,
+            'fill_price': float(self.fill_price) if self.fill_price else None,
+            'trade_id': self.trade_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'filled_at': self.filled_at.isoformat() if self.filled_at else None
+        }
+
+
+class LedgerEntry(db.Model):
+    """Append-only record of every fill and cash movement of a challenge"""
+    __tablename__ = 'ledger_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)  # per-challenge sequence, starts at 1
+    entry_type = db.Column(db.String(20), nullable=False)  # deposit, fill
+    symbol = db.Column(db.String(20))
+    side = db.Column(db.String(10))  # buy, sell
+    quantity = db.Column(db.Numeric(15, 6))
+    price = db.Column(db.Numeric(15, 6))
+    cash_delta = db.Column(db.Numeric(15, 2), nullable=False)
+    trade_id = db.Column(db.Integer, db.ForeignKey('trades.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    trade = db.relationship('Trade')
+    
+    __table_args__ = (db.UniqueConstraint('challenge_id', 'seq'),)
+    
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'entry_type': self.entry_type,
+            'symbol': self.symbol,
+            'side': self.side,
+            'quantity': float(self.quantity) if self.quantity is not None else None,
+            'price': float(self.price) if self.price is not None else None,
+            'cash_delta': float(self.cash_delta),
+            'trade_id': self.trade_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class LedgerSnapshot(db.Model):
+    """Challenge state folded from the ledger up to and including entry `seq`"""
+    __tablename__ = 'ledger_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    balance = db.Column(db.Numeric(15, 2), nullable=False)
+    positions = db.Column(db.Text, nullable=False)  # JSON: {symbol: [quantity, avg_entry_price]}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('challenge_id', 'seq'),)
+
+
+class PendingEvaluation(db.Model):
+    """Durable queue of challenges awaiting post-trade rule evaluation"""
+    __tablename__ = 'pending_evaluations'
+    
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id', ondelete='CASCADE'), primary_key=True)
+    enqueued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, default=0)
+    claimed_by = db.Column(db.String(100))  # host:pid of the worker evaluating it
+    claimed_at = db.Column(db.DateTime)
+
+
+class IdempotencyKey(db.Model):
+    """Idempotency-Key claimed by a request, with its recorded response once it completes"""
+    __tablename__ = 'idempotency_keys'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer)  # NULL while the first request is in flight
+    body = db.Column(db.LargeBinary)
+    mimetype = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'key'),
+        db.Index('ix_idempotency_keys_expires', 'expires_at'),
+    )
+
+
+class TradingStat(db.Model):
+    """Realized trading statistics per challenge and symbol, updated on every sell"""
+    __tablename__ = 'trading_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id', ondelete='CASCADE'), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    closed_trades = db.Column(db.Integer, nullable=False, default=0)
+    winning_trades = db.Column(db.Integer, nullable=False, default=0)
+    losing_trades = db.Column(db.Integer, nullable=False, default=0)
+    gross_profit = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    gross_loss = db.Column(db.Numeric(15, 2), nullable=False, default=0)  # positive amount
+    largest_win = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    largest_loss = db.Column(db.Numeric(15, 2), nullable=False, default=0)  # positive amount
+    volume = db.Column(db.Numeric(15, 6), nullable=False, default=0)  # quantity sold
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (db.UniqueConstraint('challenge_id', 'symbol'),)
+    
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'closed_trades': self.closed_trades,
+            'winning_trades': self.winning_trades,
+            'losing_trades': self.losing_trades,
+            'win_rate': round(self.winning_trades / self.closed_trades * 100, 2) if self.closed_trades else 0,
+            'realized_pnl': float(self.gross_profit - self.gross_loss),
+            'gross_profit': float(self.gross_profit),
+            'gross_loss': float(self.gross_loss),
+            'largest_win': float(self.largest_win),
+            'largest_loss': float(self.largest_loss),
+            'volume': float(self.volume)
+        }
+
+
+class LeaderboardEntry(db.Model):
+    """Materialized ranking row per challenge, refreshed whenever its equity or status changes"""
+    __tablename__ = 'leaderboard_entries'
+    
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    initial_balance = db.Column(db.Numeric(15, 2), nullable=False)
+    equity = db.Column(db.Numeric(15, 2), nullable=False)
+    profit_pct = db.Column(db.Numeric(11, 4), nullable=False)
+    start_date = db.Column(db.DateTime)
+    end_date = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Top-N reads walk these indexes backwards instead of sorting every challenge
+    __table_args__ = (
+        db.Index('ix_leaderboard_status_profit', 'status', 'profit_pct'),
+        db.Index('ix_leaderboard_profit', 'profit_pct'),
+    )
+
+
+class PeriodRanking(db.Model):
+    """Passed challenge in the daily, weekly and monthly leaderboards of the period it closed in"""
+    __tablename__ = 'period_rankings'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    period = db.Column(db.String(10), nullable=False)  # day, week, month
+    period_key = db.Column(db.String(10), nullable=False)  # 2026-10-19, 2026-W42, 2026-10
+    plan_id = db.Column(db.Integer, db.ForeignKey('plans.id'), nullable=False)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenges.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    username = db.Column(db.String(100))  # display name when the challenge passed
+    initial_balance = db.Column(db.Numeric(15, 2), nullable=False)
+    equity = db.Column(db.Numeric(15, 2), nullable=False)
+    profit_pct = db.Column(db.Numeric(11, 4), nullable=False)
+    closed_at = db.Column(db.DateTime, nullable=False)
+    
+    # One bucket's top N is an index range scan; closed buckets never change
+    __table_args__ = (
+        db.UniqueConstraint('period', 'period_key', 'challenge_id'),
+        db.Index('ix_period_rankings_bucket', 'period', 'period_key', 'profit_pct'),
+        db.Index('ix_period_rankings_plan_bucket', 'period', 'period_key', 'plan_id', 'profit_pct'),
+    )
+
+
+class DataVersion(db.Model):
+    """Change counter per public data set, bumped by the transaction that changes it (HTTP ETags)"""
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class MetricsRollup(db.Model):
+    """Single-row platform counters for the admin dashboard, kept in step by the writes (services/metrics.py)"""
+    __tablename__ = 'metrics_rollup'
+    
+    id = db.Column(db.Integer, primary_key=True)  # always 1
+    users_total = db.Column(db.Integer, nullable=False, default=0)
+    users_admins = db.Column(db.Integer, nullable=False, default=0)
+    challenges_active = db.Column(db.Integer, nullable=False, default=0)
+    challenges_passed = db.Column(db.Integer, nullable=False, default=0)
+    challenges_failed = db.Column(db.Integer, nullable=False, default=0)
+    payments_pending = db.Column(db.Integer, nullable=False, default=0)
+    payments_completed = db.Column(db.Integer, nullable=False, default=0)
+    payments_failed = db.Column(db.Integer, nullable=False, default=0)
+    revenue_pending = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    revenue_completed = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    revenue_failed = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    
+    # Completed revenue by payment method
+    revenue_mock_cmi = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    revenue_mock_crypto = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    revenue_paypal = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    revenue_other = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    
+    reconciled_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DailyRevenue(db.Model):
+    """Completed payments per day, plan and payment method (services/analytics.py)"""
+    __tablename__ = 'daily_revenue'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    plan_id = db.Column(db.Integer, db.ForeignKey('plans.id'), nullable=False)
+    payment_method = db.Column(db.String(50), nullable=False)
+    payments = db.Column(db.Integer, nullable=False, default=0)
+    revenue_dh = db.Column(db.Numeric(15, 2), nullable=False, default=0)
+    
+    # Also the index of the date-range reads
+    __table_args__ = (db.UniqueConstraint('day', 'plan_id', 'payment_method'),)
+
+
+class DailyChallengeStat(db.Model):
+    """Challenges started, passed and failed per day and plan (services/analytics.py)"""
+    __tablename__ = 'daily_challenge_stats'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    plan_id = db.Column(db.Integer, db.ForeignKey('plans.id'), nullable=False)
+    started = db.Column(db.Integer, nullable=False, default=0)
+    passed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    
+    __table_args__ = (db.UniqueConstraint('day', 'plan_id'),)
+
+
 class Payment(db.Model):
     __tablename__ = 'payments'
     
@@ -164,6 +462,11 @@ class Payment(db.Model):
     
     plan = db.relationship('Plan', backref='payments')
     
+    __table_args__ = (
+        db.Index('ix_payments_created_id', 'created_at', 'id'),
+        db.Index('ix_payments_status_created_id', 'status', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -241,10 +544,55 @@ class AISignal(db.Model):
         }
 
 
+# Columns added to tables that already existed: (table, column, type and default)
+# db.create_all() only creates missing tables, so upgrade_schema adds these to older databases
+SCHEMA_UPGRADES = [
+    ('users', 'auth_version', 'INTEGER NOT NULL DEFAULT 0'),
+    ('plans', 'max_trailing_drawdown_pct', 'NUMERIC(5, 2)'),
+    ('challenges', 'high_water_mark', 'NUMERIC(15, 2)'),
+    ('challenges', 'max_drawdown_pct', 'NUMERIC(7, 4) DEFAULT 0'),
+    ('challenges', 'intraday_high', 'NUMERIC(15, 2)'),
+    ('challenges', 'intraday_low', 'NUMERIC(15, 2)'),
+    ('challenges', 'best_day_pnl', 'NUMERIC(15, 2)'),
+    ('challenges', 'worst_day_pnl', 'NUMERIC(15, 2)'),
+    ('challenges', 'ledger_seq', 'INTEGER DEFAULT 0'),
+    ('challenges', 'version', 'INTEGER NOT NULL DEFAULT 1'),
+    ('pending_evaluations', 'claimed_by', 'VARCHAR(100)'),
+    ('pending_evaluations', 'claimed_at', 'TIMESTAMP'),
+    ('period_rankings', 'username', 'VARCHAR(100)'),
+]
+
+
+def upgrade_schema():
+    """
+    Add the SCHEMA_UPGRADES columns and the model indexes an existing
+    database lacks (idempotent)
+    """
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    columns = {}
+    
+    for table, column, ddl in SCHEMA_UPGRADES:
+        if table not in tables:
+            continue
+        if table not in columns:
+            columns[table] = {c['name'] for c in inspector.get_columns(table)}
+        if column not in columns[table]:
+            db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+            columns[table].add(column)
+    db.session.commit()
+    
+    # create_all only indexes the tables it creates
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
 def init_db(app):
     """Initialize database and create default data"""
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         
         # Create default plans if not exist
         if Plan.query.count() == 0:
@@ -0,0 +1,100 @@
+"""
+Fixed-point money and quantities
+Amounts, prices and quantities as integer micro-units (1 unit = 1_000_000)
+
+Rounding rules:
+- Values entering micro-units (Decimal, float, str) are rounded half away
+  from zero at the 6th decimal, like PostgreSQL NUMERIC(_, 6)
+- Products and quotients of micro-unit values are rounded half away from
+  zero to the nearest micro-unit
+- Cash amounts (balances, trade values, P&L) are rounded half away from zero
+  to whole cents with to_cents before they touch a balance, matching the
+  NUMERIC(15, 2) money columns
+
+Integer math is for state held in memory (the portfolio cache, the batch
+evaluator's arrays), converted once when it is loaded. Code working on ORM
+rows keeps the NUMERIC columns' Decimals and rounds them the same way with
+round_micros and round_cents: converting each column per operation costs
+more than the integer arithmetic saves
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+SCALE = 1_000_000
+CENT = SCALE // 100
+
+MICRO = Decimal('0.000001')
+CENTS = Decimal('0.01')
+
+_EXPONENT = -6
+
+
+def to_micros(value) -> int:
+    """Convert an int, float, Decimal or numeric string to micro-units"""
+    if isinstance(value, int):
+        return value * SCALE
+    if isinstance(value, float):
+        scaled = value * SCALE
+        return int(scaled + 0.5) if scaled >= 0 else -int(-scaled + 0.5)
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    scaled = value.scaleb(6)
+    micros = int(scaled)
+    return micros if micros == scaled else int(scaled.to_integral_value(ROUND_HALF_UP))
+
+
+def from_micros(micros: int) -> Decimal:
+    """Exact Decimal for a micro-unit value (for NUMERIC columns)"""
+    return Decimal(micros).scaleb(_EXPONENT)
+
+
+def to_float(micros: int) -> float:
+    """Float for JSON responses"""
+    return micros / SCALE
+
+
+def _div_round(numerator: int, denominator: int) -> int:
+    """Integer division rounded half away from zero"""
+    quotient, remainder = divmod(abs(numerator), abs(denominator))
+    if remainder * 2 >= abs(denominator):
+        quotient += 1
+    return quotient if (numerator >= 0) == (denominator > 0) else -quotient
+
+
+def mul(a: int, b: int) -> int:
+    """a * b for two micro-unit values (e.g. price x quantity)"""
+    return _div_round(a * b, SCALE)
+
+
+def div(a: int, b: int) -> int:
+    """a / b for two micro-unit values (e.g. cost / quantity)"""
+    return _div_round(a * SCALE, b)
+
+
+def to_cents(micros: int) -> int:
+    """Round a micro-unit amount to whole cents (still in micro-units)"""
+    return _div_round(micros, CENT) * CENT
+
+
+def round_micros(value: Decimal) -> Decimal:
+    """A Decimal product or quotient rounded like mul and div"""
+    return value.quantize(MICRO, ROUND_HALF_UP)
+
+
+def round_cents(value: Decimal) -> Decimal:
+    """A Decimal micro-unit amount rounded to whole cents like to_cents"""
+    return value.quantize(CENTS, ROUND_HALF_UP)
+
+
+def pct(part: int, whole: int) -> float:
+    """part / whole as a percentage, for display"""
+    return part / whole * 100 if whole else 0.0
+
+
+def reaches_pct(part: int, whole: int, pct_micros: int) -> bool:
+    """
+    part / whole >= pct_micros / 100, exactly and without dividing
+    whole must be positive
+    """
+    return part * 100 * SCALE >= pct_micros * whole
+
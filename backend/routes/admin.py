@@ -3,12 +3,24 @@ Admin Routes
 SuperAdmin panel for PayPal configuration and platform management
 """
 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import date, datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, case, or_
 from models import db, User, PaypalConfig, Challenge, Payment, Plan
+from services.pagination import keyset_paginate, page_size, date_range
+from services.portfolio_cache import portfolio_cache
+from services.http_cache import bump_version
+from services.metrics import dashboard, reconcile, adjust as adjust_metrics
+from services.analytics import daily_series
+from services import bulk_admin
+from services.auth_cache import auth_cache, has_admin_claim
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
+DEFAULT_ANALYTICS_DAYS = 30
+MAX_ANALYTICS_DAYS = 1096  # three years of daily rows
+
 
 def admin_required(f):
     """Decorator to require admin privileges"""
@@ -18,26 +30,17 @@ def admin_required(f):
     @jwt_required()
     def decorated_function(*args, **kwargs):
         try:
-            user_id = get_jwt_identity()
-            # Convert to int (JWT identity is now a string)
-            user_id = int(user_id) if isinstance(user_id, str) else user_id
-            print(f"[ADMIN] Checking admin access for user_id: {user_id}")
-            
-            user = User.query.get(user_id)
-            
-            if not user:
-                print(f"[ADMIN] User {user_id} not found in database")
-                return jsonify({'error': 'User not found'}), 404
-            
-            if not user.is_admin:
-                print(f"[ADMIN] User {user.email} is not an admin")
-                return jsonify({'error': f'Admin access required. User {user.email} is not an admin.'}), 403
-            
-            print(f"[ADMIN] Access granted for {user.email}")
-            return f(*args, **kwargs)
+            # Signed is_admin claim, checked against the cached auth_version (services/auth_cache.py)
+            is_admin = has_admin_claim()
         except Exception as e:
-            print(f"[ADMIN] Error checking admin access: {e}")
+            current_app.logger.exception('Error checking admin access')
             return jsonify({'error': str(e)}), 500
+        
+        if not is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        # Errors raised by the view reach Flask's handlers
+        return f(*args, **kwargs)
     
     return decorated_function
 
@@ -98,12 +101,37 @@ def update_paypal_config():
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_all_users():
-    """Get all users"""
-    users = User.query.order_by(User.created_at.desc()).all()
+    """
+    Get users, newest first, one keyset page at a time
+    Query: limit, cursor, q (email / username), is_admin (true / false)
+    """
+    args = request.args
+    query = db.session.query(User.id, User.email, User.username, User.is_admin, User.created_at)
+    
+    if args.get('q'):
+        query = query.filter(or_(
+            User.email.icontains(args['q'], autoescape=True),
+            User.username.icontains(args['q'], autoescape=True)
+        ))
+    if args.get('is_admin') in ('true', 'false'):
+        query = query.filter(User.is_admin == (args['is_admin'] == 'true'))
+    
+    try:
+        limit = page_size(args.get('limit'))
+        users, next_cursor = keyset_paginate(query, User.created_at, User.id, args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
     
     return jsonify({
-        'users': [u.to_dict() for u in users],
-        'total': len(users)
+        'users': [{
+            'id': row.id,
+            'email': row.email,
+            'username': row.username,
+            'is_admin': row.is_admin,
+            'created_at': _iso(row.created_at)
+        } for row in users],
+        'total': _count(query, User.id),
+        'next_cursor': next_cursor
     }), 200
 
 
@@ -117,7 +145,10 @@ def toggle_admin(user_id):
         return jsonify({'error': 'User not found'}), 404
     
     user.is_admin = not user.is_admin
+    user.auth_version = (user.auth_version or 0) + 1  # revokes the admin claim of older tokens
+    adjust_metrics(users_admins=1 if user.is_admin else -1)
     db.session.commit()
+    auth_cache.invalidate(user.id)
     
     return jsonify({
         'message': f'Admin status {"granted" if user.is_admin else "revoked"}',
@@ -128,37 +159,144 @@ def toggle_admin(user_id):
 @admin_bp.route('/challenges', methods=['GET'])
 @admin_required
 def get_all_challenges():
-    """Get all challenges"""
-    status = request.args.get('status')
+    """
+    Get challenges, newest first, one keyset page at a time
+    Query: limit, cursor, status, plan_id, user_id, q (user email / username)
+    Plan and user names come from joins in the same SELECT
+    """
+    args = request.args
+    query = db.session.query(
+        Challenge.id, Challenge.user_id, Challenge.plan_id, Challenge.initial_balance,
+        Challenge.current_balance, Challenge.equity, Challenge.daily_start_equity,
+        Challenge.status, Challenge.failure_reason, Challenge.start_date, Challenge.end_date,
+        Challenge.created_at, Plan.name.label('plan_name'), User.email.label('user_email'),
+        User.username
+    ).join(User, User.id == Challenge.user_id).outerjoin(Plan, Plan.id == Challenge.plan_id)
     
-    query = Challenge.query
+    if args.get('status'):
+        query = query.filter(Challenge.status == args['status'].lower())
+    if args.get('q'):
+        query = query.filter(or_(
+            User.email.icontains(args['q'], autoescape=True),
+            User.username.icontains(args['q'], autoescape=True)
+        ))
     
-    if status:
-        query = query.filter_by(status=status)
+    try:
+        if args.get('plan_id'):
+            query = query.filter(Challenge.plan_id == int(args['plan_id']))
+        if args.get('user_id'):
+            query = query.filter(Challenge.user_id == int(args['user_id']))
+    except ValueError:
+        return jsonify({'error': 'plan_id and user_id must be integers'}), 400
     
-    challenges = query.order_by(Challenge.created_at.desc()).all()
+    try:
+        limit = page_size(args.get('limit'))
+        challenges, next_cursor = keyset_paginate(query, Challenge.created_at, Challenge.id, args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
     
     return jsonify({
-        'challenges': [c.to_dict() for c in challenges],
-        'total': len(challenges)
+        'challenges': [{
+            'id': row.id,
+            'user_id': row.user_id,
+            'user_email': row.user_email,
+            'username': row.username,
+            'plan_id': row.plan_id,
+            'plan_name': row.plan_name,
+            'initial_balance': float(row.initial_balance),
+            'current_balance': float(row.current_balance),
+            'equity': float(row.equity),
+            'daily_start_equity': float(row.daily_start_equity),
+            'status': row.status,
+            'failure_reason': row.failure_reason,
+            'profit_pct': round((float(row.equity) - float(row.initial_balance)) / float(row.initial_balance) * 100, 2),
+            'start_date': _iso(row.start_date),
+            'end_date': _iso(row.end_date)
+        } for row in challenges],
+        'total': _count(query, Challenge.id),
+        'next_cursor': next_cursor
     }), 200
 
 
 @admin_bp.route('/payments', methods=['GET'])
 @admin_required
 def get_all_payments():
-    """Get all payments"""
-    payments = Payment.query.order_by(Payment.created_at.desc()).all()
+    """
+    Get payments, newest first, one keyset page at a time
+    Query: limit, cursor, status, payment_method, plan_id, user_id,
+    from, to (ISO dates, on created_at), q (transaction id / user email)
+    total and total_revenue cover every payment matching the filters
+    """
+    args = request.args
+    query = db.session.query(
+        Payment.id, Payment.user_id, Payment.plan_id, Payment.amount_dh, Payment.payment_method,
+        Payment.transaction_id, Payment.status, Payment.created_at,
+        Plan.name.label('plan_name'), User.email.label('user_email')
+    ).join(User, User.id == Payment.user_id).outerjoin(Plan, Plan.id == Payment.plan_id)
+    
+    if args.get('status'):
+        query = query.filter(Payment.status == args['status'].lower())
+    if args.get('payment_method'):
+        query = query.filter(Payment.payment_method == args['payment_method'])
+    if args.get('q'):
+        query = query.filter(or_(
+            Payment.transaction_id.icontains(args['q'], autoescape=True),
+            User.email.icontains(args['q'], autoescape=True)
+        ))
+    
+    try:
+        if args.get('plan_id'):
+            query = query.filter(Payment.plan_id == int(args['plan_id']))
+        if args.get('user_id'):
+            query = query.filter(Payment.user_id == int(args['user_id']))
+    except ValueError:
+        return jsonify({'error': 'plan_id and user_id must be integers'}), 400
+    
+    try:
+        query = date_range(query, Payment.created_at, args.get('from'), args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be ISO formatted (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)'}), 400
     
-    total_revenue = sum(float(p.amount_dh) for p in payments if p.status == 'completed')
+    try:
+        limit = page_size(args.get('limit'))
+        payments, next_cursor = keyset_paginate(query, Payment.created_at, Payment.id, args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+    
+    # Count and completed revenue of the whole filtered set, in one aggregate
+    total, total_revenue = query.with_entities(
+        func.count(Payment.id),
+        func.sum(case((Payment.status == 'completed', Payment.amount_dh), else_=0))
+    ).one()
     
     return jsonify({
-        'payments': [p.to_dict() for p in payments],
-        'total': len(payments),
-        'total_revenue': round(total_revenue, 2)
+        'payments': [{
+            'id': row.id,
+            'user_id': row.user_id,
+            'user_email': row.user_email,
+            'plan_id': row.plan_id,
+            'plan_name': row.plan_name,
+            'amount_dh': float(row.amount_dh),
+            'payment_method': row.payment_method,
+            'transaction_id': row.transaction_id,
+            'status': row.status,
+            'created_at': _iso(row.created_at)
+        } for row in payments],
+        'total': total,
+        'total_revenue': round(float(total_revenue or 0), 2),
+        'next_cursor': next_cursor
     }), 200
 
 
+def _count(query, id_column) -> int:
+    """COUNT of a filtered list query in SQL (no ORDER BY, no row fetch)"""
+    return query.order_by(None).with_entities(func.count(id_column)).scalar()
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
 @admin_bp.route('/plans', methods=['GET'])
 @admin_required
 def get_plans():
@@ -185,10 +323,12 @@ def create_plan():
         max_daily_loss_pct=data.get('max_daily_loss_pct', 5.00),
         max_total_loss_pct=data.get('max_total_loss_pct', 10.00),
         profit_target_pct=data.get('profit_target_pct', 10.00),
+        max_trailing_drawdown_pct=data.get('max_trailing_drawdown_pct'),
         description=data.get('description')
     )
     
     db.session.add(plan)
+    bump_version('plans')
     db.session.commit()
     
     return jsonify({
@@ -222,42 +362,152 @@ def update_plan(plan_id):
         plan.max_total_loss_pct = data['max_total_loss_pct']
     if 'profit_target_pct' in data:
         plan.profit_target_pct = data['profit_target_pct']
+    if 'max_trailing_drawdown_pct' in data:
+        plan.max_trailing_drawdown_pct = data['max_trailing_drawdown_pct']
     
+    bump_version('plans')
     db.session.commit()
     
+    # Cached portfolios carry this plan's thresholds
+    portfolio_cache.invalidate_plan(plan.id)
+    
     return jsonify({
         'message': 'Plan updated',
         'plan': plan.to_dict()
     }), 200
 
 
+@admin_bp.route('/bulk/challenges/close-expired', methods=['POST'])
+@admin_required
+def bulk_close_expired():
+    """
+    Fail every active challenge older than a number of days
+    Body: older_than_days (required), plan_id, dry_run, chunk_size
+    """
+    data = request.get_json() or {}
+    
+    try:
+        older_than_days = int(data.get('older_than_days'))
+        plan_id = int(data['plan_id']) if data.get('plan_id') is not None else None
+        dry_run, chunk_size = _bulk_options(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'older_than_days, plan_id and chunk_size must be integers'}), 400
+    
+    if older_than_days < 1:
+        return jsonify({'error': 'older_than_days must be at least 1'}), 400
+    
+    started_before = datetime.utcnow() - timedelta(days=older_than_days)
+    return jsonify(bulk_admin.close_expired(started_before, plan_id, dry_run, chunk_size)), 200
+
+
+@admin_bp.route('/bulk/plans/migrate', methods=['POST'])
+@admin_required
+def bulk_migrate_plan():
+    """
+    Move a plan's active challenges to another plan, optionally re-pricing it
+    in the same run
+    Body: from_plan_id, to_plan_id (required), price_dh (new price of from_plan),
+    dry_run, chunk_size
+    """
+    data = request.get_json() or {}
+    
+    try:
+        from_plan = Plan.query.get(int(data.get('from_plan_id')))
+        to_plan = Plan.query.get(int(data.get('to_plan_id')))
+        price_dh = float(data['price_dh']) if data.get('price_dh') is not None else None
+        dry_run, chunk_size = _bulk_options(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'from_plan_id, to_plan_id and chunk_size must be integers, price_dh a number'}), 400
+    
+    if not from_plan or not to_plan:
+        return jsonify({'error': 'Plan not found'}), 404
+    if from_plan.id == to_plan.id:
+        return jsonify({'error': 'from_plan_id and to_plan_id must differ'}), 400
+    if price_dh is not None and price_dh <= 0:
+        return jsonify({'error': 'price_dh must be positive'}), 400
+    
+    return jsonify(bulk_admin.migrate_plan(from_plan.id, to_plan.id, price_dh, dry_run, chunk_size)), 200
+
+
+@admin_bp.route('/bulk/users/admin', methods=['POST'])
+@admin_required
+def bulk_set_admin():
+    """
+    Grant or revoke admin rights in bulk
+    Body: is_admin (required), user_ids and / or email_domain (at least one),
+    dry_run, chunk_size
+    """
+    data = request.get_json() or {}
+    
+    if not isinstance(data.get('is_admin'), bool):
+        return jsonify({'error': 'is_admin must be true or false'}), 400
+    if data.get('user_ids') is None and not data.get('email_domain'):
+        return jsonify({'error': 'Select users with user_ids or email_domain'}), 400
+    
+    try:
+        user_ids = [int(user_id) for user_id in data['user_ids']] if data.get('user_ids') is not None else None
+        dry_run, chunk_size = _bulk_options(data)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'user_ids must be a list of integers, chunk_size an integer'}), 400
+    
+    return jsonify(bulk_admin.set_admin(
+        data['is_admin'], user_ids, data.get('email_domain'), dry_run, chunk_size
+    )), 200
+
+
+def _bulk_options(data: dict) -> tuple[bool, int]:
+    """dry_run flag and clamped chunk_size of a bulk request. Raises ValueError"""
+    chunk_size = int(data.get('chunk_size') or bulk_admin.DEFAULT_CHUNK_SIZE)
+    if chunk_size < 1:
+        raise ValueError('chunk_size must be positive')
+    return bool(data.get('dry_run')), min(chunk_size, bulk_admin.MAX_CHUNK_SIZE)
+
+
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def get_admin_dashboard():
-    """Get admin dashboard statistics"""
-    total_users = User.query.count()
-    total_challenges = Challenge.query.count()
-    active_challenges = Challenge.query.filter_by(status='active').count()
-    passed_challenges = Challenge.query.filter_by(status='passed').count()
-    failed_challenges = Challenge.query.filter_by(status='failed').count()
+    """Get admin dashboard statistics (one read of the metrics rollup row)"""
+    return jsonify(dashboard()), 200
+
+
+@admin_bp.route('/analytics', methods=['GET'])
+@admin_required
+def get_analytics():
+    """
+    Daily revenue and challenge time series from the rollup tables
+    Query: from, to (YYYY-MM-DD, inclusive; default the last 30 days),
+    plan_id, payment_method
+    """
+    args = request.args
+    
+    try:
+        end = date.fromisoformat(args['to']) if args.get('to') else datetime.utcnow().date()
+        start = date.fromisoformat(args['from']) if args.get('from') else end - timedelta(days=DEFAULT_ANALYTICS_DAYS - 1)
+    except ValueError:
+        return jsonify({'error': 'Dates must be formatted YYYY-MM-DD'}), 400
+    
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if (end - start).days + 1 > MAX_ANALYTICS_DAYS:
+        return jsonify({'error': f'Date range is limited to {MAX_ANALYTICS_DAYS} days'}), 400
     
-    total_payments = Payment.query.filter_by(status='completed').count()
-    total_revenue = db.session.query(db.func.sum(Payment.amount_dh)).filter_by(status='completed').scalar() or 0
+    try:
+        plan_id = int(args['plan_id']) if args.get('plan_id') else None
+    except ValueError:
+        return jsonify({'error': 'plan_id must be an integer'}), 400
     
     return jsonify({
-        'users': {
-            'total': total_users,
-            'admins': User.query.filter_by(is_admin=True).count()
-        },
-        'challenges': {
-            'total': total_challenges,
-            'active': active_challenges,
-            'passed': passed_challenges,
-            'failed': failed_challenges,
-            'pass_rate': round((passed_challenges / (passed_challenges + failed_challenges) * 100) if (passed_challenges + failed_challenges) > 0 else 0, 1)
-        },
-        'revenue': {
-            'total_payments': total_payments,
-            'total_revenue_dh': float(total_revenue)
-        }
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        **daily_series(start, end, plan_id, args.get('payment_method'))
+    }), 200
+
+
+@admin_bp.route('/metrics/reconcile', methods=['POST'])
+@admin_required
+def reconcile_metrics():
+    """Recompute the dashboard counters from the source tables now"""
+    return jsonify({
+        'message': 'Metrics reconciled',
+        'drift': reconcile()
     }), 200
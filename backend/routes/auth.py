@@ -11,6 +11,9 @@ from flask_jwt_extended import (
 )
 from werkzeug.security import generate_password_hash, check_password_hash
 from models import db, User
+from services.http_cache import bump_version
+from services.metrics import adjust as adjust_metrics
+from services.auth_cache import token_claims
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
@@ -46,10 +49,11 @@ def register():
     )
     
     db.session.add(user)
+    adjust_metrics(users_total=1)
     db.session.commit()
     
-    # Create access token (identity must be a string)
-    access_token = create_access_token(identity=str(user.id))
+    # Create access token (identity must be a string, admin role as a signed claim)
+    access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
     
     return jsonify({
         'message': 'User registered successfully',
@@ -78,8 +82,8 @@ def login():
     if not user or not check_password_hash(user.password_hash, password):
         return jsonify({'error': 'Invalid email or password'}), 401
     
-    # Create access token (identity must be a string)
-    access_token = create_access_token(identity=str(user.id))
+    # Create access token (identity must be a string, admin role as a signed claim)
+    access_token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
     
     return jsonify({
         'message': 'Login successful',
@@ -115,6 +119,7 @@ def update_profile():
     
     if 'username' in data:
         user.username = data['username'].strip()
+        bump_version('leaderboard')  # usernames are shown on the public leaderboard
     
     if 'password' in data and len(data['password']) >= 6:
         user.password_hash = generate_password_hash(data['password'])
@@ -3,10 +3,19 @@ Challenge Routes
 Handles trading challenges CRUD and status
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from models import db, Challenge, Plan, User
+from models import db, Challenge, Plan
+from money import pct, to_float
 from services.challenge_engine import ChallengeEngine
+from services.portfolio_cache import portfolio_cache
+from services.trading_stats import trading_summary
+from services.http_cache import http_cached
+from services.export import (
+    EXPORT_KINDS, EXPORT_FORMATS, export_columns, iter_rows, stream_csv, stream_parquet,
+    parquet_available, acquire_export_slot, release_export_slot
+)
+from services.auth_cache import has_admin_claim
 
 challenge_bp = Blueprint('challenges', __name__, url_prefix='/api/challenges')
 
@@ -36,12 +45,12 @@ def get_active_challenge():
         return jsonify({'challenge': None, 'message': 'No active challenge'}), 200
     
     # Recalculate equity
-    engine = ChallengeEngine(challenge)
-    current_equity = engine.calculate_equity()
+    portfolio = ChallengeEngine(challenge).portfolio
+    current_equity = portfolio.equity()
     
     result = challenge.to_dict()
-    result['equity'] = float(current_equity)
-    result['profit_pct'] = round(((float(current_equity) - float(challenge.initial_balance)) / float(challenge.initial_balance)) * 100, 2)
+    result['equity'] = to_float(current_equity)
+    result['profit_pct'] = round(pct(current_equity - portfolio.initial_balance, portfolio.initial_balance), 2)
     
     return jsonify({'challenge': result}), 200
 
@@ -71,12 +80,12 @@ def get_challenge_status(challenge_id):
     if not challenge:
         return jsonify({'error': 'Challenge not found'}), 404
     
-    engine = ChallengeEngine(challenge)
-    current_equity = engine.calculate_equity()
+    # Balance, positions and thresholds from the portfolio cache (memory-only when current)
+    portfolio = portfolio_cache.get(challenge)
     
-    initial = float(challenge.initial_balance)
-    daily_start = float(challenge.daily_start_equity)
-    equity = float(current_equity)
+    initial = to_float(portfolio.initial_balance)
+    daily_start = to_float(portfolio.daily_start_equity)
+    equity = to_float(portfolio.equity())
     
     # Calculate metrics
     total_pnl = equity - initial
@@ -85,9 +94,28 @@ def get_challenge_status(challenge_id):
     daily_pnl_pct = (daily_pnl / daily_start) * 100 if daily_start > 0 else 0
     
     # Thresholds
-    max_daily_loss = float(challenge.plan.max_daily_loss_pct)
-    max_total_loss = float(challenge.plan.max_total_loss_pct)
-    profit_target = float(challenge.plan.profit_target_pct)
+    thresholds = portfolio.thresholds
+    max_daily_loss = to_float(thresholds['max_daily_loss_pct'])
+    max_total_loss = to_float(thresholds['max_total_loss_pct'])
+    profit_target = to_float(thresholds['profit_target_pct'])
+    max_trailing_drawdown = to_float(thresholds['max_trailing_drawdown_pct']) if thresholds['max_trailing_drawdown_pct'] is not None else None
+    
+    # Running statistics (today's open day is folded in without writing)
+    high_water_mark = max(float(challenge.high_water_mark if challenge.high_water_mark is not None else initial), equity)
+    current_drawdown_pct = ((high_water_mark - equity) / high_water_mark) * 100 if high_water_mark > 0 else 0
+    max_drawdown_pct = max(float(challenge.max_drawdown_pct or 0), current_drawdown_pct)
+    intraday_high = max(float(challenge.intraday_high), equity) if challenge.intraday_high is not None else equity
+    intraday_low = min(float(challenge.intraday_low), equity) if challenge.intraday_low is not None else equity
+    best_day = max(float(challenge.best_day_pnl), daily_pnl) if challenge.best_day_pnl is not None else daily_pnl
+    worst_day = min(float(challenge.worst_day_pnl), daily_pnl) if challenge.worst_day_pnl is not None else daily_pnl
+    
+    progress = {
+        'to_profit_target': round(profit_target - total_pnl_pct, 2),
+        'daily_loss_remaining': round(max_daily_loss + daily_pnl_pct, 2),
+        'total_loss_remaining': round(max_total_loss + total_pnl_pct, 2)
+    }
+    if max_trailing_drawdown is not None:
+        progress['trailing_drawdown_remaining'] = round(max_trailing_drawdown - current_drawdown_pct, 2)
     
     return jsonify({
         'challenge_id': challenge.id,
@@ -104,13 +132,20 @@ def get_challenge_status(challenge_id):
         'thresholds': {
             'max_daily_loss_pct': max_daily_loss,
             'max_total_loss_pct': max_total_loss,
-            'profit_target_pct': profit_target
+            'profit_target_pct': profit_target,
+            'max_trailing_drawdown_pct': max_trailing_drawdown
+        },
+        'progress': progress,
+        'statistics': {
+            'high_water_mark': round(high_water_mark, 2),
+            'current_drawdown_pct': round(current_drawdown_pct, 2),
+            'max_drawdown_pct': round(max_drawdown_pct, 2),
+            'intraday_high': round(intraday_high, 2),
+            'intraday_low': round(intraday_low, 2),
+            'best_day_pnl': round(best_day, 2),
+            'worst_day_pnl': round(worst_day, 2)
         },
-        'progress': {
-            'to_profit_target': round(profit_target - total_pnl_pct, 2),
-            'daily_loss_remaining': round(max_daily_loss + daily_pnl_pct, 2),
-            'total_loss_remaining': round(max_total_loss + total_pnl_pct, 2)
-        }
+        'trading_stats': trading_summary(challenge.id)
     }), 200
 
 
@@ -132,9 +167,55 @@ def evaluate_challenge(challenge_id):
 
 
 @challenge_bp.route('/plans', methods=['GET'])
+@http_cached('plans', max_age=300)
 def get_plans():
     """Get all available challenge plans (public)"""
     plans = Plan.query.all()
     return jsonify({
         'plans': [p.to_dict() for p in plans]
     }), 200
+
+
+@challenge_bp.route('/<int:challenge_id>/export', methods=['GET'])
+@jwt_required()
+def export_challenge(challenge_id):
+    """
+    Download a challenge's full trade history or equity curve
+    Query: kind=trades|equity, format=csv|parquet
+    Owners can export their own challenges, admins any challenge
+    """
+    user_id = int(get_jwt_identity())
+    
+    challenge = db.session.get(Challenge, challenge_id)
+    if not challenge or (challenge.user_id != user_id and not has_admin_claim()):
+        return jsonify({'error': 'Challenge not found'}), 404
+    
+    kind = request.args.get('kind', 'trades').lower()
+    export_format = request.args.get('format', 'csv').lower()
+    
+    if kind not in EXPORT_KINDS:
+        return jsonify({'error': f'Kind must be one of: {", ".join(EXPORT_KINDS)}'}), 400
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f'Format must be one of: {", ".join(EXPORT_FORMATS)}'}), 400
+    
+    if export_format == 'parquet' and not parquet_available():
+        return jsonify({'error': 'Parquet export is not available on this server (pyarrow not installed)'}), 501
+    
+    if not acquire_export_slot(current_app.config['EXPORT_MAX_CONCURRENT']):
+        return jsonify({'error': 'Too many exports in progress, please retry shortly'}), 429, {'Retry-After': '5'}
+    
+    columns = export_columns(kind)
+    rows = iter_rows(kind, challenge_id, current_app.config['EXPORT_BATCH_SIZE'])
+    
+    if export_format == 'csv':
+        body, mimetype = stream_csv(columns, rows), 'text/csv'
+    else:
+        body, mimetype = stream_parquet(columns, rows), 'application/vnd.apache.parquet'
+    
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=challenge-{challenge_id}-{kind}.{export_format}'
+    
+    # Runs once the download finished or the client went away
+    response.call_on_close(release_export_slot)
+    return response
@@ -1,43 +1,54 @@
 """
 Leaderboard Routes
 Top traders ranking based on profit percentage
+Rankings read the materialized leaderboard_entries table (services/leaderboard.py)
 """
 
-from flask import Blueprint, jsonify
-from models import db, Challenge, User
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from models import db, Challenge, User, LeaderboardEntry
+from services.rank_index import rank_index
+from services.platform_stats import platform_stats
+from services.http_cache import http_cached
+from services.period_leaderboard import PERIODS, period_key, parse_period_key, is_closed, top_ranked
 
 leaderboard_bp = Blueprint('leaderboard', __name__, url_prefix='/api/leaderboard')
 
+MAX_AROUND = 25
+OPEN_PERIOD_MAX_AGE = 60  # seconds; the current period still changes
+
 
 @leaderboard_bp.route('', methods=['GET'])
+@http_cached('leaderboard', max_age=60)
 def get_leaderboard():
     """
-    Get Top 10 Traders of the Month
+    Get Top 10 Traders of all time
     Sorted by profit percentage from passed challenges
+    (per day / week / month: /periods/<period>)
     """
-    # Query for top performers
+    # Top performers: a top-10 scan of ix_leaderboard_status_profit
     results = db.session.query(
         User.id,
         User.username,
         User.email,
-        Challenge.id.label('challenge_id'),
-        Challenge.initial_balance,
-        Challenge.equity,
-        Challenge.status,
-        Challenge.start_date,
-        Challenge.end_date
+        LeaderboardEntry.challenge_id,
+        LeaderboardEntry.initial_balance,
+        LeaderboardEntry.equity,
+        LeaderboardEntry.profit_pct,
+        LeaderboardEntry.start_date,
+        LeaderboardEntry.end_date
     ).join(
-        Challenge, User.id == Challenge.user_id
+        User, User.id == LeaderboardEntry.user_id
     ).filter(
-        Challenge.status == 'passed'
+        LeaderboardEntry.status == 'passed'
     ).order_by(
-        ((Challenge.equity - Challenge.initial_balance) / Challenge.initial_balance).desc()
+        LeaderboardEntry.profit_pct.desc()
     ).limit(10).all()
     
     leaderboard = []
     for i, row in enumerate(results):
         profit = float(row.equity) - float(row.initial_balance)
-        profit_pct = (profit / float(row.initial_balance)) * 100
         
         leaderboard.append({
             'rank': i + 1,
@@ -47,7 +58,7 @@ def get_leaderboard():
             'initial_balance': float(row.initial_balance),
             'final_equity': float(row.equity),
             'profit': round(profit, 2),
-            'profit_pct': round(profit_pct, 2),
+            'profit_pct': round(float(row.profit_pct), 2),
             'start_date': row.start_date.isoformat() if row.start_date else None,
             'end_date': row.end_date.isoformat() if row.end_date else None
         })
@@ -63,33 +74,28 @@ def get_all_rankings():
     """
     Get all rankings including active challenges
     """
-    # Get all challenges with performance data
+    # Get all challenges with performance data (top-50 scan of ix_leaderboard_profit)
     results = db.session.query(
         User.id,
         User.username,
         User.email,
-        Challenge.id.label('challenge_id'),
-        Challenge.initial_balance,
-        Challenge.equity,
-        Challenge.status,
-        Challenge.start_date
+        LeaderboardEntry.challenge_id,
+        LeaderboardEntry.profit_pct,
+        LeaderboardEntry.status
     ).join(
-        Challenge, User.id == Challenge.user_id
+        User, User.id == LeaderboardEntry.user_id
     ).order_by(
-        ((Challenge.equity - Challenge.initial_balance) / Challenge.initial_balance).desc()
+        LeaderboardEntry.profit_pct.desc()
     ).limit(50).all()
     
     rankings = []
     for i, row in enumerate(results):
-        profit = float(row.equity) - float(row.initial_balance)
-        profit_pct = (profit / float(row.initial_balance)) * 100
-        
         rankings.append({
             'rank': i + 1,
             'user_id': row.id,
             'username': row.username or row.email.split('@')[0],
             'challenge_id': row.challenge_id,
-            'profit_pct': round(profit_pct, 2),
+            'profit_pct': round(float(row.profit_pct), 2),
             'status': row.status
         })
     
@@ -98,27 +104,113 @@ def get_all_rankings():
     }), 200
 
 
-@leaderboard_bp.route('/stats', methods=['GET'])
-def get_platform_stats():
-    """Get platform statistics"""
-    total_challenges = Challenge.query.count()
-    passed_challenges = Challenge.query.filter_by(status='passed').count()
-    failed_challenges = Challenge.query.filter_by(status='failed').count()
-    active_challenges = Challenge.query.filter_by(status='active').count()
+@leaderboard_bp.route('/periods/<period>', methods=['GET'])
+@leaderboard_bp.route('/periods/<period>/<key>', methods=['GET'])
+def get_period_leaderboard(period, key=None):
+    """
+    Top 10 passed challenges of a day, ISO week or month (?plan_id= to filter)
+    key: 2026-10-19 / 2026-W42 / 2026-10, default the current period
+    Closed periods never change (names are stored as of the pass) and are cacheable forever
+    """
+    if period not in PERIODS:
+        return jsonify({'error': f'Period must be one of: {", ".join(PERIODS)}'}), 400
+    
+    if key is None:
+        key = period_key(period, datetime.utcnow())
+    elif parse_period_key(period, key) is None:
+        return jsonify({'error': f'Invalid {period} key: {key}'}), 400
+    
+    plan_id = request.args.get('plan_id', type=int)
+    rows = top_ranked(period, key, plan_id)
+    
+    closed = is_closed(period, key)
+    response = jsonify({
+        'period': period,
+        'key': key,
+        'plan_id': plan_id,
+        'closed': closed,
+        'leaderboard': [
+            {
+                'rank': i + 1,
+                'user_id': row.user_id,
+                'username': row.username,
+                'challenge_id': row.challenge_id,
+                'plan_id': row.plan_id,
+                'initial_balance': float(row.initial_balance),
+                'final_equity': float(row.equity),
+                'profit': round(float(row.equity) - float(row.initial_balance), 2),
+                'profit_pct': round(float(row.profit_pct), 2),
+                'end_date': row.closed_at.isoformat()
+            }
+            for i, row in enumerate(rows)
+        ]
+    })
+    response.headers['Cache-Control'] = (
+        'public, max-age=31536000, immutable' if closed else f'public, max-age={OPEN_PERIOD_MAX_AGE}'
+    )
+    return response, 200
+
+
+@leaderboard_bp.route('/me', methods=['GET'])
+@jwt_required()
+def get_my_rank():
+    """
+    Rank of the current user's active challenge among all active challenges,
+    with ?around=N neighbors above and below (default 5, max 25)
+    Served from the in-process rank index in O(log n)
+    """
+    user_id = int(get_jwt_identity())
+    around = min(max(request.args.get('around', 5, type=int), 0), MAX_AROUND)
     
-    # Calculate pass rate
-    completed = passed_challenges + failed_challenges
-    pass_rate = (passed_challenges / completed * 100) if completed > 0 else 0
+    rank_index.refresh_if_stale()
+    challenge_id = rank_index.challenge_of(user_id)
+    
+    if challenge_id is None:
+        # Started since the last reload in another process: index it from its row
+        entry = LeaderboardEntry.query.join(
+            Challenge, Challenge.id == LeaderboardEntry.challenge_id
+        ).filter(
+            Challenge.user_id == user_id,
+            Challenge.status == 'active'
+        ).first()
+        
+        if not entry:
+            return jsonify({'rank': None, 'message': 'No active challenge'}), 200
+        
+        rank_index.update(entry.challenge_id, entry.user_id, entry.status, entry.profit_pct)
+        challenge_id = entry.challenge_id
     
-    # Total profit from passed challenges
-    passed = Challenge.query.filter_by(status='passed').all()
-    total_profit = sum(float(c.equity) - float(c.initial_balance) for c in passed)
+    neighbors = rank_index.around(challenge_id, around)
+    users = {
+        user.id: user.username or user.email.split('@')[0]
+        for user in User.query.filter(User.id.in_({row['user_id'] for row in neighbors})).all()
+    }
+    
+    me = next((row for row in neighbors if row['challenge_id'] == challenge_id), None)
+    if me is None:
+        return jsonify({'rank': None, 'message': 'No active challenge'}), 200
     
     return jsonify({
-        'total_challenges': total_challenges,
-        'active_challenges': active_challenges,
-        'passed_challenges': passed_challenges,
-        'failed_challenges': failed_challenges,
-        'pass_rate': round(pass_rate, 1),
-        'total_profit': round(total_profit, 2)
+        'challenge_id': challenge_id,
+        'rank': me['rank'],
+        'total_active': rank_index.total(),
+        'profit_pct': round(me['profit_pct'], 2),
+        'neighbors': [
+            {
+                'rank': row['rank'],
+                'user_id': row['user_id'],
+                'username': users.get(row['user_id']),
+                'challenge_id': row['challenge_id'],
+                'profit_pct': round(row['profit_pct'], 2),
+                'is_me': row['challenge_id'] == challenge_id
+            }
+            for row in neighbors
+        ]
     }), 200
+
+
+@leaderboard_bp.route('/stats', methods=['GET'])
+@http_cached('challenge_status', max_age=15)
+def get_platform_stats():
+    """Get platform statistics (cached rollup of one grouped query)"""
+    return jsonify(platform_stats.get()), 200
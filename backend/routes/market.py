@@ -3,14 +3,26 @@ Market Data Routes
 Provides real-time market data for US and Morocco markets
 """
 
+import hashlib
+import time
 from flask import Blueprint, request, jsonify
 from services.market_data import MarketDataService
 from services.ai_signals import AISignalService
+from services.http_cache import http_cached
 
 market_bp = Blueprint('market', __name__, url_prefix='/api/market')
 
+# Quotes are served as one snapshot per window: its ETag changes with the window
+PRICES_WINDOW = 15  # seconds
+
+# The symbol lists only change with a deploy (same token in every process)
+SYMBOLS_VERSION = hashlib.sha1(repr((
+    MarketDataService.US_SYMBOLS, MarketDataService.MOROCCO_SYMBOLS, sorted(MarketDataService.MOROCCO_NAMES.items())
+)).encode()).hexdigest()[:12]
+
 
 @market_bp.route('/prices', methods=['GET'])
+@http_cached(lambda: int(time.time() // PRICES_WINDOW), max_age=PRICES_WINDOW)
 def get_all_prices():
     """Get all market prices (US + Morocco)"""
     data = MarketDataService.get_all_prices()
@@ -90,6 +102,7 @@ def get_batch_signals():
 
 
 @market_bp.route('/symbols', methods=['GET'])
+@http_cached(lambda: SYMBOLS_VERSION, max_age=3600)
 def get_available_symbols():
     """Get list of available symbols"""
     return jsonify({
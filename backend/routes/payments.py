@@ -10,12 +10,19 @@ from decimal import Decimal
 import time
 import uuid
 from models import db, Payment, Plan, Challenge, User, PaypalConfig
+from services.ledger import record_deposit
+from services.leaderboard import sync_entry
+from services.http_cache import http_cached
+from services.idempotency import idempotent
+from services.metrics import payment_recorded
+from services.analytics import record_payment
 
 payments_bp = Blueprint('payments', __name__, url_prefix='/api/payments')
 
 
 @payments_bp.route('/checkout', methods=['POST'])
 @jwt_required()
+@idempotent
 def checkout():
     """
     Mock payment gateway checkout
@@ -59,6 +66,8 @@ def checkout():
         status='completed'
     )
     db.session.add(payment)
+    payment_recorded(payment)
+    record_payment(payment)
     
     # Create new challenge
     initial_balance = Decimal(str(plan.initial_balance))
@@ -72,6 +81,8 @@ def checkout():
         status='active'
     )
     db.session.add(challenge)
+    record_deposit(challenge, initial_balance)
+    sync_entry(challenge)
     db.session.commit()
     
     return jsonify({
@@ -120,6 +131,7 @@ def create_paypal_order():
 
 @payments_bp.route('/paypal/capture', methods=['POST'])
 @jwt_required()
+@idempotent
 def capture_paypal_order():
     """Capture PayPal order after approval"""
     user_id = int(get_jwt_identity())
@@ -150,6 +162,8 @@ def capture_paypal_order():
         status='completed'
     )
     db.session.add(payment)
+    payment_recorded(payment)
+    record_payment(payment)
     
     # Create challenge
     initial_balance = Decimal(str(plan.initial_balance))
@@ -163,6 +177,8 @@ def capture_paypal_order():
         status='active'
     )
     db.session.add(challenge)
+    record_deposit(challenge, initial_balance)
+    sync_entry(challenge)
     db.session.commit()
     
     return jsonify({
@@ -187,6 +203,7 @@ def get_payment_history():
 
 
 @payments_bp.route('/plans', methods=['GET'])
+@http_cached('plans', max_age=300)
 def get_pricing_plans():
     """Get all available pricing plans (public)"""
     plans = Plan.query.all()
@@ -5,17 +5,25 @@ Handles trade execution and history
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
 from decimal import Decimal
-from models import db, Trade, Position, Challenge
-from services.challenge_engine import evaluate_challenge
+from models import db, Trade, Position, Challenge, Order
+from money import to_micros, from_micros, to_float
 from services.market_data import MarketDataService
+from services.trade_executor import execute_order, execute_orders
+from services.evaluation_queue import evaluation_queue
+from services.order_book import ORDER_TYPES, place_order, cancel_order
+from services.pagination import keyset_paginate, page_size, date_range
+from services.idempotency import idempotent
+from services.portfolio_cache import portfolio_cache
 
 trades_bp = Blueprint('trades', __name__, url_prefix='/api/trades')
 
+MAX_BATCH_ORDERS = 50
+
 
 @trades_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent
 def execute_trade():
     """Execute a new trade (buy or sell)"""
     user_id = int(get_jwt_identity())
@@ -31,176 +39,252 @@ def execute_trade():
         return jsonify({'error': 'No active challenge. Please start a challenge first.'}), 400
     
     # Validate trade data
-    symbol = data.get('symbol', '').upper()
-    side = data.get('side', '').lower()  # buy or sell
+    order = _parse_order(data)
+    if isinstance(order, str):
+        return jsonify({'error': order}), 400
+    symbol, side, quantity = order
+    
+    # Get current market price
+    price_data = MarketDataService.get_price(symbol)
+    if not price_data:
+        return jsonify({'error': f'Could not fetch price for {symbol}'}), 400
+    
+    current_price = to_micros(price_data['price'])
+    
+    # Memory-only pre-trade check on the cached portfolio: rejects without a transaction
+    rejection = portfolio_cache.get(challenge).check_order(symbol, side, quantity, current_price)
+    if rejection:
+        return jsonify({'error': rejection}), 400
+    
+    # Execute trade (balance is re-checked on the locked challenge row)
+    result = execute_order(challenge.id, symbol, side, quantity, current_price)
+    
+    if 'error' in result:
+        return jsonify(result), 409 if result.get('retryable') else 400
+    
+    # Rule evaluation runs off the order path, within EVALUATION_QUEUE_INTERVAL
+    evaluation_queue.notify()
+    
+    return jsonify({
+        'message': f'{side.capitalize()} order executed',
+        'trade': result['trade'],
+        'position': result.get('position'),
+        'challenge_status': {'status': challenge.status, 'evaluation': 'queued'}
+    }), 201
+
+
+@trades_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent
+def execute_batch():
+    """
+    Execute several orders in one transaction (e.g. a portfolio rebalance)
+    All orders are priced from one snapshot and filled in sequence; if any
+    order is rejected, none are applied
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    orders = data.get('orders') if data else None
+    if not orders or not isinstance(orders, list):
+        return jsonify({'error': 'A non-empty list of orders is required'}), 400
+    
+    if len(orders) > MAX_BATCH_ORDERS:
+        return jsonify({'error': f'At most {MAX_BATCH_ORDERS} orders per batch'}), 400
+    
+    challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
+    
+    if not challenge:
+        return jsonify({'error': 'No active challenge. Please start a challenge first.'}), 400
+    
+    parsed = [_parse_order(order) if isinstance(order, dict) else 'Order must be an object' for order in orders]
+    errors = [{'index': i, 'status': 'invalid', 'error': p} for i, p in enumerate(parsed) if isinstance(p, str)]
+    if errors:
+        return jsonify({'error': 'Invalid orders, nothing was executed', 'results': errors}), 400
+    
+    # One consistent price snapshot for every symbol in the batch
+    prices = MarketDataService.get_prices([symbol for symbol, _, _ in parsed])
+    missing = sorted({symbol for symbol, _, _ in parsed if symbol not in prices})
+    if missing:
+        return jsonify({'error': f'Could not fetch price for {", ".join(missing)}'}), 400
+    
+    snapshot = {symbol: to_micros(quote['price']) for symbol, quote in prices.items()}
+    result = execute_orders(challenge.id, [
+        (symbol, side, quantity, snapshot[symbol]) for symbol, side, quantity in parsed
+    ])
+    
+    if 'error' in result:
+        if result.get('retryable'):
+            return jsonify(result), 409
+        failed = result['failed_index']
+        return jsonify({
+            'error': f'Order {failed} rejected, nothing was executed',
+            'results': [
+                {'index': i, 'status': 'rejected', 'error': result['error']} if i == failed
+                else {'index': i, 'status': 'not_executed'}
+                for i in range(len(parsed))
+            ]
+        }), 400
+    
+    # One rule evaluation for the whole batch
+    evaluation_queue.notify()
+    
+    return jsonify({
+        'message': f'{len(parsed)} orders executed',
+        'prices': {symbol: to_float(price) for symbol, price in snapshot.items()},
+        'results': [
+            {'index': i, 'status': 'filled', 'trade': fill['trade'], 'position': fill.get('position')}
+            for i, fill in enumerate(result['fills'])
+        ],
+        'challenge_status': {'status': challenge.status, 'evaluation': 'queued'}
+    }), 201
+
+
+def _parse_order(data: dict):
+    """Validate an order payload. Returns (symbol, side, quantity in micro-units) or an error message"""
+    symbol = str(data.get('symbol', '')).upper()
+    side = str(data.get('side', '')).lower()  # buy or sell
     quantity = data.get('quantity')
     
     if not symbol or not side or not quantity:
-        return jsonify({'error': 'Symbol, side (buy/sell), and quantity are required'}), 400
+        return 'Symbol, side (buy/sell), and quantity are required'
     
     if side not in ['buy', 'sell']:
-        return jsonify({'error': 'Side must be "buy" or "sell"'}), 400
+        return 'Side must be "buy" or "sell"'
     
     try:
-        quantity = Decimal(str(quantity))
+        quantity = to_micros(Decimal(str(quantity)))
         if quantity <= 0:
             raise ValueError()
     except:
-        return jsonify({'error': 'Quantity must be a positive number'}), 400
+        return 'Quantity must be a positive number'
     
-    # Get current market price
-    price_data = MarketDataService.get_price(symbol)
-    if not price_data:
-        return jsonify({'error': f'Could not fetch price for {symbol}'}), 400
+    return symbol, side, quantity
+
+
+@trades_bp.route('/orders', methods=['POST'])
+@jwt_required()
+@idempotent
+def create_order():
+    """
+    Place a resting order, filled by the matching engine when price crosses trigger_price
+    limit: buy at or below / sell at or above the trigger
+    stop_loss / take_profit: sell once price falls to / rises to the trigger
+    """
+    user_id = int(get_jwt_identity())
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
     
-    current_price = Decimal(str(price_data['price']))
-    trade_value = current_price * quantity
+    challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
     
-    # Check if user has enough balance for buy
-    if side == 'buy':
-        if trade_value > Decimal(str(challenge.current_balance)):
-            return jsonify({'error': 'Insufficient balance for this trade'}), 400
+    if not challenge:
+        return jsonify({'error': 'No active challenge. Please start a challenge first.'}), 400
     
-    # Execute trade
-    if side == 'buy':
-        result = _execute_buy(challenge, symbol, quantity, current_price)
-    else:
-        result = _execute_sell(challenge, symbol, quantity, current_price)
+    order = _parse_order(data)
+    if isinstance(order, str):
+        return jsonify({'error': order}), 400
+    symbol, side, quantity = order
     
-    if 'error' in result:
-        return jsonify(result), 400
+    order_type = str(data.get('order_type', '')).lower()
+    if order_type not in ORDER_TYPES:
+        return jsonify({'error': f'Order type must be one of: {", ".join(ORDER_TYPES)}'}), 400
     
-    # Evaluate challenge rules after trade
-    eval_result = evaluate_challenge(challenge.id)
+    if order_type != 'limit' and side != 'sell':
+        return jsonify({'error': 'Stop-loss and take-profit orders close a position and must be sells'}), 400
+    
+    try:
+        trigger_price = Decimal(str(data.get('trigger_price')))
+        if trigger_price <= 0:
+            raise ValueError()
+    except:
+        return jsonify({'error': 'Trigger price must be a positive number'}), 400
+    
+    order = place_order(challenge, symbol, side, order_type, from_micros(quantity), trigger_price)
     
     return jsonify({
-        'message': f'{side.capitalize()} order executed',
-        'trade': result['trade'],
-        'position': result.get('position'),
-        'challenge_status': eval_result
+        'message': f'{order_type.replace("_", " ").capitalize()} order placed',
+        'order': order.to_dict()
     }), 201
 
 
-def _execute_buy(challenge, symbol, quantity, price):
-    """Execute a buy order"""
-    trade_value = price * quantity
-    
-    # Deduct from balance
-    challenge.current_balance = Decimal(str(challenge.current_balance)) - trade_value
-    
-    # Create trade record
-    trade = Trade(
-        challenge_id=challenge.id,
-        symbol=symbol,
-        side='buy',
-        quantity=quantity,
-        entry_price=price,
-        status='open'
-    )
-    db.session.add(trade)
-    
-    # Update or create position
-    position = Position.query.filter_by(challenge_id=challenge.id, symbol=symbol).first()
-    
-    if position:
-        # Average down/up
-        total_quantity = Decimal(str(position.quantity)) + quantity
-        total_cost = (Decimal(str(position.avg_entry_price)) * Decimal(str(position.quantity))) + (price * quantity)
-        position.avg_entry_price = total_cost / total_quantity
-        position.quantity = total_quantity
-        position.current_price = price
-    else:
-        position = Position(
-            challenge_id=challenge.id,
-            symbol=symbol,
-            quantity=quantity,
-            avg_entry_price=price,
-            current_price=price
-        )
-        db.session.add(position)
-    
-    db.session.commit()
-    
-    return {
-        'trade': trade.to_dict(),
-        'position': position.to_dict()
-    }
-
-
-def _execute_sell(challenge, symbol, quantity, price):
-    """Execute a sell order (close position)"""
-    # Find existing position
-    position = Position.query.filter_by(challenge_id=challenge.id, symbol=symbol).first()
-    
-    if not position:
-        return {'error': f'No open position for {symbol}'}
-    
-    if quantity > Decimal(str(position.quantity)):
-        return {'error': f'Cannot sell more than position size ({position.quantity})'}
-    
-    # Calculate P&L
-    entry_price = Decimal(str(position.avg_entry_price))
-    pnl = (price - entry_price) * quantity
-    
-    # Create trade record
-    trade = Trade(
-        challenge_id=challenge.id,
-        symbol=symbol,
-        side='sell',
-        quantity=quantity,
-        entry_price=entry_price,
-        exit_price=price,
-        pnl=pnl,
-        status='closed',
-        closed_at=datetime.utcnow()
-    )
-    db.session.add(trade)
-    
-    # Update position
-    position.quantity = Decimal(str(position.quantity)) - quantity
-    
-    if position.quantity <= 0:
-        db.session.delete(position)
-        position_dict = None
-    else:
-        position.current_price = price
-        position_dict = position.to_dict()
-    
-    # Add proceeds to balance
-    sale_proceeds = price * quantity
-    challenge.current_balance = Decimal(str(challenge.current_balance)) + sale_proceeds
-    
-    db.session.commit()
-    
-    return {
-        'trade': trade.to_dict(),
-        'position': position_dict,
-        'realized_pnl': float(pnl)
-    }
+@trades_bp.route('/orders', methods=['GET'])
+@jwt_required()
+def get_orders():
+    """Get resting orders for active challenge (?status=open|filled|cancelled|rejected)"""
+    user_id = int(get_jwt_identity())
+    
+    challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
+    
+    if not challenge:
+        return jsonify({'orders': [], 'message': 'No active challenge'}), 200
+    
+    query = Order.query.filter_by(challenge_id=challenge.id)
+    
+    status = request.args.get('status')
+    if status:
+        query = query.filter_by(status=status)
+    
+    orders = query.order_by(Order.created_at.desc()).all()
+    
+    return jsonify({
+        'orders': [o.to_dict() for o in orders]
+    }), 200
+
+
+@trades_bp.route('/orders/<int:order_id>', methods=['DELETE'])
+@jwt_required()
+def delete_order(order_id):
+    """Cancel an open resting order"""
+    user_id = int(get_jwt_identity())
+    
+    order = Order.query.join(Challenge).filter(
+        Order.id == order_id,
+        Challenge.user_id == user_id
+    ).first()
+    
+    if not order:
+        return jsonify({'error': 'Order not found'}), 404
+    
+    if order.status != 'open' or not cancel_order(order):
+        db.session.refresh(order)
+        return jsonify({'error': f'Order is already {order.status}'}), 400
+    
+    db.session.refresh(order)
+    
+    return jsonify({
+        'message': 'Order cancelled',
+        'order': order.to_dict()
+    }), 200
 
 
 @trades_bp.route('', methods=['GET'])
 @jwt_required()
 def get_trades():
-    """Get trade history for active challenge"""
+    """
+    Get trade history for active challenge, newest first
+    Query: limit, cursor (next_cursor of the previous page), symbol, side,
+    status, from, to (ISO dates, on opened_at)
+    """
     user_id = int(get_jwt_identity())
     
     challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
     
     if not challenge:
-        return jsonify({'trades': [], 'message': 'No active challenge'}), 200
+        return jsonify({'trades': [], 'next_cursor': None, 'message': 'No active challenge'}), 200
     
-    trades = Trade.query.filter_by(challenge_id=challenge.id).order_by(Trade.opened_at.desc()).all()
-    
-    return jsonify({
-        'trades': [t.to_dict() for t in trades]
-    }), 200
+    return _trade_page(challenge.id)
 
 
 @trades_bp.route('/positions', methods=['GET'])
 @jwt_required()
 def get_positions():
-    """Get open positions for active challenge"""
+    """
+    Get open positions for active challenge, valued at live prices
+    Read-only: quotes come in one batch and P&L is computed for the response;
+    the mark-to-market job persists prices for the rule engine
+    """
     user_id = int(get_jwt_identity())
     
     challenge = Challenge.query.filter_by(user_id=user_id, status='active').first()
@@ -209,26 +293,30 @@ def get_positions():
         return jsonify({'positions': [], 'message': 'No active challenge'}), 200
     
     positions = Position.query.filter_by(challenge_id=challenge.id).all()
-    
-    # Update unrealized P&L with current prices
-    for pos in positions:
-        price_data = MarketDataService.get_price(pos.symbol)
-        if price_data:
-            current_price = Decimal(str(price_data['price']))
-            pos.current_price = current_price
-            pos.unrealized_pnl = (current_price - Decimal(str(pos.avg_entry_price))) * Decimal(str(pos.quantity))
-    
-    db.session.commit()
+    quotes = MarketDataService.get_prices([pos.symbol for pos in positions]) if positions else {}
     
     return jsonify({
-        'positions': [p.to_dict() for p in positions]
+        'positions': [_position_view(pos, quotes.get(pos.symbol)) for pos in positions]
     }), 200
 
 
+def _position_view(position, quote) -> dict:
+    """Position dict with current price and unrealized P&L from a live quote (stored values as fallback)"""
+    data = position.to_dict()
+    
+    if quote and quote.get('price'):
+        current_price = Decimal(str(quote['price']))
+        pnl = (current_price - position.avg_entry_price) * position.quantity
+        data['current_price'] = float(current_price)
+        data['unrealized_pnl'] = round(float(pnl), 2)
+    
+    return data
+
+
 @trades_bp.route('/history/<int:challenge_id>', methods=['GET'])
 @jwt_required()
 def get_challenge_trades(challenge_id):
-    """Get all trades for a specific challenge"""
+    """Get trades for a specific challenge (same paging and filters as GET /api/trades)"""
     user_id = int(get_jwt_identity())
     
     challenge = Challenge.query.filter_by(id=challenge_id, user_id=user_id).first()
@@ -236,8 +324,33 @@ def get_challenge_trades(challenge_id):
     if not challenge:
         return jsonify({'error': 'Challenge not found'}), 404
     
-    trades = Trade.query.filter_by(challenge_id=challenge_id).order_by(Trade.opened_at.desc()).all()
+    return _trade_page(challenge_id)
+
+
+def _trade_page(challenge_id: int):
+    """One keyset page of a challenge's trades, filtered from the query string"""
+    args = request.args
+    query = Trade.query.filter(Trade.challenge_id == challenge_id)
+    
+    if args.get('symbol'):
+        query = query.filter(Trade.symbol == args['symbol'].upper())
+    if args.get('side'):
+        query = query.filter(Trade.side == args['side'].lower())
+    if args.get('status'):
+        query = query.filter(Trade.status == args['status'].lower())
+    
+    try:
+        query = date_range(query, Trade.opened_at, args.get('from'), args.get('to'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be ISO formatted (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)'}), 400
+    
+    try:
+        limit = page_size(args.get('limit'))
+        trades, next_cursor = keyset_paginate(query, Trade.opened_at, Trade.id, args.get('cursor'), limit)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
     
     return jsonify({
-        'trades': [t.to_dict() for t in trades]
+        'trades': [t.to_dict() for t in trades],
+        'next_cursor': next_cursor
     }), 200
@@ -1,5 +1,6 @@
 # Services package
 from services.challenge_engine import ChallengeEngine, evaluate_challenge, reset_daily_equity
+from services.batch_evaluator import evaluate_active_challenges, revalue_positions
 from services.market_data import MarketDataService
 from services.ai_signals import AISignalService
 
@@ -7,6 +8,8 @@ __all__ = [
     'ChallengeEngine',
     'evaluate_challenge', 
     'reset_daily_equity',
+    'evaluate_active_challenges',
+    'revalue_positions',
     'MarketDataService',
     'AISignalService'
 ]
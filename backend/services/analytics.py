@@ -0,0 +1,193 @@
+"""
+Analytics Service
+Daily rollups for the admin analytics endpoint: completed revenue per day,
+plan and payment method, and challenges started / passed / failed per day
+and plan
+
+Payments and status changes add to their day's row in the transaction that
+records them, so a date range of any length is one index range read per
+table. rebuild_daily_rollups() recomputes days from the source tables (first
+start, and the recent days on each metrics reconciliation)
+"""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from models import db, Challenge, Payment, DailyRevenue, DailyChallengeStat
+
+CLOSED_STATUSES = ('passed', 'failed')
+
+
+def record_payment(payment):
+    """Add a completed payment to its day (caller commits)"""
+    if payment.status != 'completed':
+        return
+    
+    _increment(
+        DailyRevenue,
+        {'day': _day(payment.created_at), 'plan_id': payment.plan_id, 'payment_method': payment.payment_method},
+        {'payments': 1, 'revenue_dh': Decimal(str(payment.amount_dh))}
+    )
+
+
+def record_challenge(challenge, previous: str = None):
+    """Count a new challenge (previous None) as started, and a pass or fail on its end day"""
+    if previous is None:
+        _increment(DailyChallengeStat, {'day': _day(challenge.start_date), 'plan_id': challenge.plan_id}, {'started': 1})
+    if challenge.status in CLOSED_STATUSES and previous not in CLOSED_STATUSES:
+        _increment(DailyChallengeStat, {'day': _day(challenge.end_date), 'plan_id': challenge.plan_id}, {challenge.status: 1})
+
+
+def record_closed(challenge_ids: list[int]):
+    """
+    Count passes and fails of many challenges (caller commits)
+    One grouped read, then one increment per (day, plan)
+    """
+    if not challenge_ids:
+        return
+    
+    rows = db.session.execute(
+        select(
+            func.date(Challenge.end_date), Challenge.plan_id, Challenge.status, func.count(Challenge.id)
+        ).where(
+            Challenge.id.in_(challenge_ids),
+            Challenge.status.in_(CLOSED_STATUSES),
+            Challenge.end_date.isnot(None)
+        ).group_by(func.date(Challenge.end_date), Challenge.plan_id, Challenge.status)
+    ).all()
+    
+    for day, plan_id, status, count in rows:
+        _increment(DailyChallengeStat, {'day': _as_date(day), 'plan_id': plan_id}, {status: count})
+
+
+def rebuild_daily_rollups(since: date = None) -> int:
+    """
+    Recompute the rollups of every day from `since` (all days when None)
+    from the source tables, set-based (caller commits). Returns the rows written
+    """
+    start = datetime.combine(since, time.min) if since else None
+    
+    revenue_day = func.date(Payment.created_at)
+    revenue = select(
+        revenue_day, Payment.plan_id, Payment.payment_method, func.count(Payment.id), func.sum(Payment.amount_dh)
+    ).where(Payment.status == 'completed').group_by(revenue_day, Payment.plan_id, Payment.payment_method)
+    
+    started_day = func.date(Challenge.start_date)
+    started = select(started_day, Challenge.plan_id, func.count(Challenge.id)).where(
+        Challenge.start_date.isnot(None)
+    ).group_by(started_day, Challenge.plan_id)
+    
+    closed_day = func.date(Challenge.end_date)
+    closed = select(closed_day, Challenge.plan_id, Challenge.status, func.count(Challenge.id)).where(
+        Challenge.status.in_(CLOSED_STATUSES), Challenge.end_date.isnot(None)
+    ).group_by(closed_day, Challenge.plan_id, Challenge.status)
+    
+    if start:
+        revenue = revenue.where(Payment.created_at >= start)
+        started = started.where(Challenge.start_date >= start)
+        closed = closed.where(Challenge.end_date >= start)
+    
+    revenue_rows = [
+        {'day': _as_date(day), 'plan_id': plan_id, 'payment_method': method, 'payments': count, 'revenue_dh': amount}
+        for day, plan_id, method, count, amount in db.session.execute(revenue)
+    ]
+    
+    challenge_rows = {}
+    for day, plan_id, count in db.session.execute(started):
+        challenge_rows.setdefault((_as_date(day), plan_id), {'started': 0, 'passed': 0, 'failed': 0})['started'] = count
+    for day, plan_id, status, count in db.session.execute(closed):
+        challenge_rows.setdefault((_as_date(day), plan_id), {'started': 0, 'passed': 0, 'failed': 0})[status] = count
+    
+    for model in (DailyRevenue, DailyChallengeStat):
+        query = delete(model)
+        if since:
+            query = query.where(model.day >= since)
+        db.session.execute(query)
+    
+    if revenue_rows:
+        db.session.execute(insert(DailyRevenue), revenue_rows)
+    if challenge_rows:
+        db.session.execute(insert(DailyChallengeStat), [
+            {'day': day, 'plan_id': plan_id, **counts} for (day, plan_id), counts in challenge_rows.items()
+        ])
+    return len(revenue_rows) + len(challenge_rows)
+
+
+def backfill_daily_rollups() -> int:
+    """One-off backfill on the first start after the rollup tables were added"""
+    if DailyRevenue.query.first() is not None or DailyChallengeStat.query.first() is not None:
+        return 0
+    if Challenge.query.first() is None and Payment.query.first() is None:
+        return 0
+    
+    count = rebuild_daily_rollups()
+    db.session.commit()
+    return count
+
+
+def daily_series(start: date, end: date, plan_id: int = None, payment_method: str = None) -> dict:
+    """Rollup rows of a date range (inclusive), oldest first, with their totals"""
+    revenue = DailyRevenue.query.filter(DailyRevenue.day >= start, DailyRevenue.day <= end)
+    challenges = DailyChallengeStat.query.filter(DailyChallengeStat.day >= start, DailyChallengeStat.day <= end)
+    if plan_id is not None:
+        revenue = revenue.filter(DailyRevenue.plan_id == plan_id)
+        challenges = challenges.filter(DailyChallengeStat.plan_id == plan_id)
+    if payment_method:
+        revenue = revenue.filter(DailyRevenue.payment_method == payment_method)
+    
+    revenue_rows = [{
+        'day': row.day.isoformat(),
+        'plan_id': row.plan_id,
+        'payment_method': row.payment_method,
+        'payments': row.payments,
+        'revenue_dh': float(row.revenue_dh)
+    } for row in revenue.order_by(DailyRevenue.day, DailyRevenue.plan_id, DailyRevenue.payment_method)]
+    
+    challenge_rows = [{
+        'day': row.day.isoformat(),
+        'plan_id': row.plan_id,
+        'started': row.started,
+        'passed': row.passed,
+        'failed': row.failed
+    } for row in challenges.order_by(DailyChallengeStat.day, DailyChallengeStat.plan_id)]
+    
+    passed = sum(row['passed'] for row in challenge_rows)
+    failed = sum(row['failed'] for row in challenge_rows)
+    
+    return {
+        'revenue': revenue_rows,
+        'challenges': challenge_rows,
+        'totals': {
+            'payments': sum(row['payments'] for row in revenue_rows),
+            'revenue_dh': round(sum(row['revenue_dh'] for row in revenue_rows), 2),
+            'started': sum(row['started'] for row in challenge_rows),
+            'passed': passed,
+            'failed': failed,
+            'pass_rate': round(passed / (passed + failed) * 100, 1) if (passed + failed) > 0 else 0
+        }
+    }
+
+
+def _increment(model, key: dict, deltas: dict):
+    """Add to one rollup row, creating it on the day's first write"""
+    conditions = [getattr(model, name) == value for name, value in key.items()]
+    values = {name: getattr(model, name) + delta for name, delta in deltas.items()}
+    
+    if db.session.execute(update(model).where(*conditions).values(values)).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(model).values({**key, **deltas}))
+    except IntegrityError:
+        # A concurrent transaction created the row first
+        db.session.execute(update(model).where(*conditions).values(values))
+
+
+def _day(moment: datetime) -> date:
+    return (moment or datetime.utcnow()).date()
+
+
+def _as_date(value) -> date:
+    """func.date() yields a date on PostgreSQL and an ISO string on SQLite"""
+    return value if isinstance(value, date) else date.fromisoformat(value)
@@ -0,0 +1,83 @@
+"""
+Auth Cache Service
+Admin authorization from signed JWT claims, checked against a small TTL
+cache of each user's auth_version
+
+Tokens carry is_admin and auth_version claims from login. Changing a user's
+admin rights bumps users.auth_version, so older tokens stop passing once the
+cached version expires (AUTH_CACHE_TTL seconds; at once in the process that
+made the change). An admin request touches the database at most once per
+user per TTL
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import select
+from models import db, User
+
+_MISSING = (None, False)
+
+
+def token_claims(user) -> dict:
+    """Extra claims signed into a user's access token"""
+    return {'is_admin': bool(user.is_admin), 'auth_version': user.auth_version or 0}
+
+
+class AuthCache:
+    """Bounded map of user_id -> (auth_version, is_admin), each kept at most ttl seconds"""
+    
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.max_entries = 10000
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('AUTH_CACHE_TTL', 30)
+        self.max_entries = app.config.get('AUTH_CACHE_MAX_ENTRIES', 10000)
+    
+    def get(self, user_id: int) -> tuple:
+        """(auth_version, is_admin) of a user; (None, False) if it doesn't exist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                return entry[1]
+        
+        row = db.session.execute(
+            select(User.auth_version, User.is_admin).where(User.id == user_id)
+        ).first()
+        current = (row.auth_version or 0, bool(row.is_admin)) if row else _MISSING
+        
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, current)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return current
+    
+    def invalidate(self, *user_ids: int):
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+auth_cache = AuthCache()
+
+
+def has_admin_claim() -> bool:
+    """True if the current request's token carries an admin claim that hasn't been revoked"""
+    claims = get_jwt()
+    if not claims.get('is_admin'):
+        return False
+    
+    auth_version, is_admin = auth_cache.get(int(get_jwt_identity()))
+    return is_admin and auth_version == claims.get('auth_version')
@@ -0,0 +1,440 @@
+"""
+Batch Evaluator Service
+Evaluates the "Killer Rules" for every active challenge in one vectorized pass
+Amounts are integer micro-units, so verdicts match ChallengeEngine exactly
+"""
+
+from datetime import datetime
+from itertools import chain
+import numpy as np
+from sqlalchemy import Table, Column, MetaData, select, insert, update, delete, func, bindparam, cast, BigInteger
+from models import db, Challenge, Plan, Position
+from money import SCALE, CENT, from_micros, div, reaches_pct, pct, to_float
+from services.market_data import MarketDataService
+from services.portfolio_cache import portfolio_cache
+from services.leaderboard import refresh_entries
+from services.rank_index import rank_index
+from services.platform_stats import platform_stats
+from services.period_leaderboard import record_passed
+from services.http_cache import bump_version
+from services.metrics import adjust as adjust_metrics
+from services.analytics import record_closed
+
+AMOUNT_COLUMNS = {
+    'balance': Challenge.current_balance,
+    'initial_balance': Challenge.initial_balance,
+    'daily_start_equity': Challenge.daily_start_equity,
+    'equity': Challenge.equity,
+    'high_water_mark': Challenge.high_water_mark,
+    'max_drawdown_pct': Challenge.max_drawdown_pct,
+    'intraday_high': Challenge.intraday_high,
+    'intraday_low': Challenge.intraday_low,
+    'best_day_pnl': Challenge.best_day_pnl,
+    'worst_day_pnl': Challenge.worst_day_pnl,
+    'max_daily_loss_pct': Plan.max_daily_loss_pct,
+    'max_total_loss_pct': Plan.max_total_loss_pct,
+    'profit_target_pct': Plan.profit_target_pct,
+    'max_trailing_drawdown_pct': Plan.max_trailing_drawdown_pct
+}
+
+# Per-connection scratch table for _bulk_update, shaped like challenges
+# (own metadata, so create_all never makes it permanent)
+STAGED_UPDATES = Table(
+    'staged_challenge_updates', MetaData(),
+    *[Column(column.name, column.type, primary_key=column.primary_key, autoincrement=False) for column in Challenge.__table__.columns],
+    prefixes=['TEMPORARY']
+)
+
+
+def _micros(column):
+    """
+    A NUMERIC column as integer micro-units, converted by the database
+    Rounded to the column's scale first, as the ORM reads it
+    """
+    return cast(func.round(func.round(column, column.type.scale) * SCALE), BigInteger)
+
+
+def _int64_table(rows: list, width: int) -> np.ndarray:
+    """Result rows of integers (or booleans) as an int64 array of shape (len(rows), width)"""
+    return np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * width).reshape(len(rows), width)
+
+
+def _market_values(ids: np.ndarray) -> np.ndarray:
+    """
+    Market value (micro-units) of the open positions of each challenge in ids (sorted)
+    Summed like PortfolioState.market_value: each position rounded with mul and
+    priced at its last mark, or its entry price before the first quote
+    """
+    rows = db.session.execute(
+        select(
+            Position.challenge_id,
+            _micros(Position.quantity),
+            _micros(Position.avg_entry_price),
+            func.coalesce(_micros(Position.current_price), 0)
+        ).join(
+            Challenge, Challenge.id == Position.challenge_id
+        ).where(
+            Challenge.status == 'active'
+        )
+    ).all()
+    
+    market_values = np.zeros(len(ids), dtype=np.int64)
+    if not rows or not len(ids):
+        return market_values
+    
+    challenge_ids, quantity, avg_price, current_price = _int64_table(rows, 4).T
+    index = np.searchsorted(ids, challenge_ids)
+    
+    # A challenge that turned active between the two reads has no row in ids
+    known = index < len(ids)
+    known[known] = ids[index[known]] == challenge_ids[known]
+    
+    price = np.where(current_price != 0, current_price, avg_price)
+    np.add.at(market_values, index[known], _mul(quantity, price)[known])
+    return market_values
+
+
+def load_active_columns() -> dict:
+    """
+    Load everything the rules need for all active challenges as column arrays,
+    ordered by id. Amounts are int64 micro-units; '<name>_null' marks the NULL
+    rows of each
+    """
+    amounts = list(AMOUNT_COLUMNS.values())
+    rows = db.session.execute(
+        select(
+            Challenge.id,
+            Challenge.version,
+            *[func.coalesce(_micros(column), 0) for column in amounts],
+            *[column.is_(None) for column in amounts]
+        ).join(
+            Plan, Plan.id == Challenge.plan_id
+        ).where(
+            Challenge.status == 'active'
+        ).order_by(
+            Challenge.id
+        )
+    ).all()
+    
+    table = _int64_table(rows, 2 + 2 * len(amounts))
+    columns = {'id': table[:, 0], 'version': table[:, 1]}
+    for i, name in enumerate(AMOUNT_COLUMNS):
+        columns[name] = table[:, 2 + i]
+        columns[f'{name}_null'] = table[:, 2 + len(amounts) + i].astype(bool)
+    columns['market_value'] = _market_values(columns['id'])
+    
+    return columns
+
+
+def _mul(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    money.mul over int64 arrays
+    Both factors are split into whole units and micro-units so that no partial
+    product overflows: a * b / SCALE = a * b_hi + a_hi * b_lo + a_lo * b_lo / SCALE
+    """
+    sign = np.sign(a) * np.sign(b)
+    a, b = np.abs(a), np.abs(b)
+    a_hi, a_lo = np.divmod(a, SCALE)
+    b_hi, b_lo = np.divmod(b, SCALE)
+    low, remainder = np.divmod(a_lo * b_lo, SCALE)
+    return sign * (a * b_hi + a_hi * b_lo + low + (remainder * 2 >= SCALE))
+
+
+def _to_cents(micros: np.ndarray) -> np.ndarray:
+    """money.to_cents over an int64 array"""
+    return np.sign(micros) * ((np.abs(micros) + CENT // 2) // CENT) * CENT
+
+
+def _reaches_pct(part: np.ndarray, whole: np.ndarray, pct_micros: np.ndarray) -> np.ndarray:
+    """
+    money.reaches_pct over int64 arrays
+    Its products overflow int64, so float64 decides every row more than a
+    micro-unit from the limit and only the others are checked exactly
+    """
+    limit = pct_micros * whole.astype(np.float64) / (100 * SCALE)
+    reached = part >= limit
+    for i in np.flatnonzero(np.abs(part - limit) <= 1):
+        reached[i] = reaches_pct(int(part[i]), int(whole[i]), int(pct_micros[i]))
+    return reached
+
+
+def _drawdown_pct(high_water_mark: np.ndarray, equity: np.ndarray) -> np.ndarray:
+    """
+    Drawdown from the high-water mark as update_running_stats computes it
+    (four decimals, 0 where the mark isn't positive). float64 rounds every
+    row that isn't within its error of a half; those are divided exactly
+    """
+    positive = high_water_mark > 0
+    ratio = (high_water_mark - equity) * float(SCALE) / np.where(positive, high_water_mark, 1)
+    drawdown = np.where(positive, np.floor(ratio + 0.5), 0).astype(np.int64)
+    for i in np.flatnonzero(positive & (np.abs(ratio - np.floor(ratio) - 0.5) < 1e-6)):
+        drawdown[i] = div(int(high_water_mark[i] - equity[i]), int(high_water_mark[i]))
+    return drawdown * 100
+
+
+def evaluate_active_challenges(write_stats: bool = True) -> dict:
+    """
+    Evaluate every active challenge in one NumPy pass
+    Rule order matches ChallengeEngine.evaluate: daily loss, total loss,
+    trailing drawdown, then profit target
+    Status changes are written back on every run, and so is a new high-water
+    mark where the plan has a trailing limit. Rows whose equity or running
+    statistics alone changed only when write_stats is set, so the scheduler
+    persists those at a lower cadence (STATS_WRITE_INTERVAL)
+    """
+    cols = load_active_columns()
+    count = len(cols['id'])
+    
+    if count == 0:
+        return {'evaluated': 0, 'failed': 0, 'passed': 0, 'updated': 0}
+    
+    # Rules see unrounded equity, running statistics whole cents (as update_running_stats)
+    equity = cols['balance'] + cols['market_value']
+    cents_equity = _to_cents(equity)
+    initial = cols['initial_balance']
+    daily_start = cols['daily_start_equity']
+    
+    # Running statistics
+    high_water_mark = np.maximum(np.where(cols['high_water_mark_null'], initial, cols['high_water_mark']), cents_equity)
+    max_drawdown_pct = np.maximum(cols['max_drawdown_pct'], _drawdown_pct(high_water_mark, cents_equity))
+    intraday_high = np.where(cols['intraday_high_null'], cents_equity, np.maximum(cols['intraday_high'], cents_equity))
+    intraday_low = np.where(cols['intraday_low_null'], cents_equity, np.minimum(cols['intraday_low'], cents_equity))
+    
+    # Killer rules; the trailing limit only applies where the plan defines one
+    daily_failed = _reaches_pct(daily_start - equity, daily_start, cols['max_daily_loss_pct'])
+    total_failed = ~daily_failed & _reaches_pct(initial - equity, initial, cols['max_total_loss_pct'])
+    trailing_failed = (
+        ~daily_failed & ~total_failed & ~cols['max_trailing_drawdown_pct_null']
+        & _reaches_pct(high_water_mark - equity, high_water_mark, cols['max_trailing_drawdown_pct'])
+    )
+    failed = daily_failed | total_failed | trailing_failed
+    passed = ~failed & _reaches_pct(equity - initial, initial, cols['profit_target_pct'])
+    
+    # The trailing rule reads the stored high-water mark, so a new one can't wait
+    high_water_mark_changed = cols['high_water_mark_null'] | (high_water_mark != cols['high_water_mark'])
+    written = failed | passed | (~cols['max_trailing_drawdown_pct_null'] & high_water_mark_changed)
+    if write_stats:
+        written |= (
+            high_water_mark_changed
+            | cols['equity_null'] | (cents_equity != cols['equity'])
+            | (max_drawdown_pct != cols['max_drawdown_pct'])
+            | cols['intraday_high_null'] | (intraday_high != cols['intraday_high'])
+            | cols['intraday_low_null'] | (intraday_low != cols['intraday_low'])
+        )
+    
+    now = datetime.utcnow()
+    updates = []
+    
+    for i in np.flatnonzero(written):
+        row = {
+            'id': int(cols['id'][i]),
+            'version': int(cols['version'][i]),
+            'equity': from_micros(int(cents_equity[i])),
+            'high_water_mark': from_micros(int(high_water_mark[i])),
+            'max_drawdown_pct': from_micros(int(max_drawdown_pct[i])),
+            'intraday_high': from_micros(int(intraday_high[i])),
+            'intraday_low': from_micros(int(intraday_low[i]))
+        }
+        
+        if daily_failed[i]:
+            loss, whole, limit = int(daily_start[i] - equity[i]), int(daily_start[i]), int(cols['max_daily_loss_pct'][i])
+            row['failure_reason'] = f"Daily loss limit exceeded: {pct(loss, whole):.2f}% (max: {to_float(limit)}%)"
+        elif total_failed[i]:
+            loss, whole, limit = int(initial[i] - equity[i]), int(initial[i]), int(cols['max_total_loss_pct'][i])
+            row['failure_reason'] = f"Total loss limit exceeded: {pct(loss, whole):.2f}% (max: {to_float(limit)}%)"
+        elif trailing_failed[i]:
+            loss, whole, limit = int(high_water_mark[i] - equity[i]), int(high_water_mark[i]), int(cols['max_trailing_drawdown_pct'][i])
+            row['failure_reason'] = f"Trailing drawdown limit exceeded: {pct(loss, whole):.2f}% (max: {to_float(limit)}%)"
+        
+        if failed[i]:
+            row['status'] = 'failed'
+            row['end_date'] = now
+        elif passed[i]:
+            row['status'] = 'passed'
+            row['end_date'] = now
+        
+        updates.append(row)
+    
+    # Side effects follow the rows actually written; a fill may have changed the rest
+    written = _bulk_update(updates)
+    updates = [row for row in updates if row['id'] in written]
+    passed_ids = [row['id'] for row in updates if row.get('status') == 'passed']
+    closed_ids = [row['id'] for row in updates if row.get('status')]
+    failed_count = len(closed_ids) - len(passed_ids)
+    
+    refresh_entries([row['id'] for row in updates])
+    record_passed(passed_ids)
+    record_closed(closed_ids)
+    if passed_ids:
+        bump_version('challenge_status', 'leaderboard')
+    elif closed_ids:
+        bump_version('challenge_status')
+    adjust_metrics(
+        challenges_active=-len(closed_ids),
+        challenges_passed=len(passed_ids),
+        challenges_failed=failed_count
+    )
+    db.session.commit()
+    if updates:
+        rank_index.load()
+    if closed_ids:
+        platform_stats.invalidate()
+    
+    return {
+        'evaluated': count,
+        'failed': failed_count,
+        'passed': len(passed_ids),
+        'updated': len(updates)
+    }
+
+
+def revalue_positions() -> dict:
+    """
+    Persist fresh quotes on the open positions of active challenges
+    One quote batch for all held symbols, then one executemany UPDATE keyed
+    by symbol; unrealized P&L is computed in SQL from each row's own
+    quantity and entry price. Run before evaluate_active_challenges so the
+    rules see current market values
+    """
+    active = select(Challenge.id).where(Challenge.status == 'active')
+    symbols = db.session.execute(
+        select(Position.symbol).where(Position.challenge_id.in_(active)).distinct()
+    ).scalars().all()
+    
+    if not symbols:
+        return {'symbols': 0, 'priced': 0, 'updated': 0}
+    
+    quotes = MarketDataService.get_prices(symbols)
+    params = [
+        {'b_symbol': symbol, 'new_price': quote['price']}
+        for symbol, quote in quotes.items()
+        if quote and quote.get('price')
+    ]
+    
+    updated = 0
+    if params:
+        table = Position.__table__
+        stmt = update(table).where(
+            table.c.symbol == bindparam('b_symbol'),
+            table.c.challenge_id.in_(active)
+        ).values(
+            current_price=bindparam('new_price'),
+            unrealized_pnl=func.round((bindparam('new_price') - table.c.avg_entry_price) * table.c.quantity, 2),
+            updated_at=datetime.utcnow()
+        )
+        updated = db.session.execute(stmt, params).rowcount
+        db.session.commit()
+        
+        portfolio_cache.update_marks({param['b_symbol']: param['new_price'] for param in params})
+    
+    return {'symbols': len(symbols), 'priced': len(params), 'updated': updated}
+
+
+def reset_daily_equity_batch() -> dict:
+    """
+    Vectorized daily reset for all active challenges
+    Closes the day (best/worst day P&L), restarts the intraday range and
+    sets daily_start_equity to the current equity
+    """
+    cols = load_active_columns()
+    count = len(cols['id'])
+    
+    if count == 0:
+        return {'reset_count': 0}
+    
+    equity = _to_cents(cols['balance'] + cols['market_value'])
+    day_pnl = equity - cols['daily_start_equity']
+    best_day = np.where(cols['best_day_pnl_null'], day_pnl, np.maximum(cols['best_day_pnl'], day_pnl))
+    worst_day = np.where(cols['worst_day_pnl_null'], day_pnl, np.minimum(cols['worst_day_pnl'], day_pnl))
+    
+    _bulk_update([
+        {
+            'id': int(cols['id'][i]),
+            'version': int(cols['version'][i]),
+            'equity': from_micros(int(equity[i])),
+            'daily_start_equity': from_micros(int(equity[i])),
+            'intraday_high': from_micros(int(equity[i])),
+            'intraday_low': from_micros(int(equity[i])),
+            'best_day_pnl': from_micros(int(best_day[i])),
+            'worst_day_pnl': from_micros(int(worst_day[i]))
+        }
+        for i in range(count)
+    ], check_version=False)
+    refresh_entries([int(challenge_id) for challenge_id in cols['id']])
+    db.session.commit()
+    rank_index.load()
+    
+    return {'reset_count': count}
+
+
+def _bulk_update(rows: list[dict], check_version: bool = True) -> set[int]:
+    """
+    Write back challenge rows by primary key (caller commits)
+    Every write bumps Challenge.version so in-flight fills retry on fresh state
+    With check_version, rows a fill changed since they were loaded are skipped;
+    that fill enqueued its own evaluation. Returns the ids actually written
+    """
+    table = Challenge.__table__
+    written = set()
+    
+    # One statement shape per set of columns
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    
+    for keys, group in groups.items():
+        columns = [key for key in keys if key not in ('id', 'version')]
+        if db.engine.dialect.update_returning:
+            written.update(_update_from_staged(table, columns, group, check_version))
+        else:
+            written.update(_update_by_row(table, columns, group, check_version))
+    
+    return written
+
+
+def _update_from_staged(table, columns: list[str], rows: list[dict], check_version: bool) -> list[int]:
+    """
+    Stage the rows with one executemany INSERT, then apply them all with one
+    UPDATE ... FROM ... RETURNING id. The statements don't depend on the row
+    count, so they compile once, unlike an inline VALUES list
+    """
+    connection = db.session.connection()
+    STAGED_UPDATES.create(connection, checkfirst=True)
+    connection.execute(insert(STAGED_UPDATES), rows)
+    
+    staged = STAGED_UPDATES.c
+    stmt = update(table).where(table.c.id == staged.id)
+    if check_version:
+        stmt = stmt.where(table.c.version == staged.version)
+    stmt = stmt.values(
+        version=table.c.version + 1,
+        **{name: staged[name] for name in columns}
+    ).returning(table.c.id)
+    
+    written = db.session.execute(stmt, execution_options={'synchronize_session': False}).scalars().all()
+    connection.execute(delete(STAGED_UPDATES))
+    return written
+
+
+def _update_by_row(table, columns: list[str], rows: list[dict], check_version: bool) -> list[int]:
+    """
+    Fallback for dialects without UPDATE ... RETURNING: an executemany, or one
+    UPDATE per row with check_version since only a single row's rowcount says
+    whether it still matched
+    """
+    stmt = update(table).where(table.c.id == bindparam('b_id'))
+    if check_version:
+        stmt = stmt.where(table.c.version == bindparam('b_version'))
+    stmt = stmt.values(
+        version=table.c.version + 1,
+        **{name: bindparam(f'new_{name}') for name in columns}
+    )
+    
+    params = [
+        {'b_id': row['id'], 'b_version': row['version'], **{f'new_{name}': row[name] for name in columns}}
+        for row in rows
+    ]
+    if not check_version:
+        db.session.execute(stmt, params)
+        return [row['id'] for row in rows]
+    return [param['b_id'] for param in params if db.session.execute(stmt, param).rowcount]
@@ -0,0 +1,164 @@
+"""
+Bulk Admin Service
+Filtered admin updates applied as set-based statements, one chunk of rows
+per transaction
+
+An operation walks the matching ids in primary-key order, chunk_size at a
+time. Each chunk is one UPDATE that re-checks the filter, so rows that
+stopped matching since they were selected are skipped. It returns the ids it
+changed, and the derived tables (leaderboard, rollups, counters) are kept in
+step for exactly those rows before the chunk commits. Operations are
+idempotent: after a failure, rerunning picks up the rows still matching.
+A dry run only counts the matching rows
+"""
+
+import time
+from datetime import datetime
+from sqlalchemy import select, update, func, or_
+from models import db, User, Plan, Challenge
+from services.leaderboard import refresh_entries
+from services.analytics import record_closed
+from services.metrics import adjust as adjust_metrics
+from services.http_cache import bump_version
+from services.rank_index import rank_index
+from services.platform_stats import platform_stats
+from services.portfolio_cache import portfolio_cache
+from services.auth_cache import auth_cache
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+
+
+def close_expired(started_before: datetime, plan_id: int = None, dry_run: bool = False,
+                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Fail every active challenge started before a cutoff (optionally on one plan)"""
+    filters = [Challenge.status == 'active', Challenge.start_date < started_before]
+    if plan_id is not None:
+        filters.append(Challenge.plan_id == plan_id)
+    
+    now = datetime.utcnow()
+    reason = f'Challenge expired (started before {started_before:%Y-%m-%d})'
+    
+    def apply(ids):
+        closed = _update_returning(Challenge, ids, filters, {
+            'status': 'failed',
+            'failure_reason': reason,
+            'end_date': now,
+            'version': Challenge.version + 1  # in-flight fills retry on fresh state
+        })
+        if closed:
+            refresh_entries(closed)
+            record_closed(closed)
+            adjust_metrics(challenges_active=-len(closed), challenges_failed=len(closed))
+            bump_version('challenge_status')
+        return len(closed)
+    
+    report = _run(Challenge, filters, apply, dry_run, chunk_size)
+    if report['affected']:
+        rank_index.load()
+        platform_stats.invalidate()
+    return report
+
+
+def migrate_plan(from_plan_id: int, to_plan_id: int, price_dh: float = None, dry_run: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Move the active challenges of one plan onto another (balances unchanged, new plan's rules)
+    A new price for the old plan commits with the first chunk, or on its own
+    when no challenge matches, so it never lands without the migration
+    """
+    filters = [Challenge.status == 'active', Challenge.plan_id == from_plan_id]
+    repriced = False
+    
+    def reprice():
+        nonlocal repriced
+        if price_dh is not None and not repriced:
+            db.session.execute(update(Plan).where(Plan.id == from_plan_id).values(price_dh=price_dh))
+            bump_version('plans')
+            repriced = True
+    
+    def apply(ids):
+        reprice()
+        return len(_update_returning(Challenge, ids, filters, {
+            'plan_id': to_plan_id,
+            'version': Challenge.version + 1
+        }))
+    
+    report = _run(Challenge, filters, apply, dry_run, chunk_size)
+    if not dry_run and price_dh is not None and not repriced:
+        reprice()
+        db.session.commit()
+    if report['affected']:
+        # Cached portfolios carry the old plan's thresholds
+        portfolio_cache.invalidate_plan(from_plan_id)
+    
+    report['price_dh'] = price_dh
+    report['repriced'] = repriced
+    return report
+
+
+def set_admin(is_admin: bool, user_ids: list[int] = None, email_domain: str = None,
+              dry_run: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Grant or revoke admin rights for users selected by id and / or email domain"""
+    filters = [
+        or_(User.is_admin.is_(None), User.is_admin.is_(False)) if is_admin else User.is_admin.is_(True)
+    ]
+    if user_ids is not None:
+        filters.append(User.id.in_(user_ids))
+    if email_domain:
+        filters.append(User.email.endswith(f'@{email_domain.lower()}', autoescape=True))
+    
+    def apply(ids):
+        changed = _update_returning(User, ids, filters, {
+            'is_admin': is_admin,
+            'auth_version': User.auth_version + 1  # revokes the admin claim of older tokens
+        })
+        adjust_metrics(users_admins=len(changed) if is_admin else -len(changed))
+        auth_cache.invalidate(*changed)
+        return len(changed)
+    
+    return _run(User, filters, apply, dry_run, chunk_size)
+
+
+def _run(model, filters: list, apply, dry_run: bool, chunk_size: int) -> dict:
+    """Count (dry run) or apply chunk by chunk, committing each; returns the report"""
+    started = time.perf_counter()
+    matched = affected = chunks = 0
+    
+    if dry_run:
+        matched = db.session.query(func.count(model.id)).filter(*filters).scalar()
+    else:
+        last_id = 0
+        while True:
+            ids = db.session.execute(
+                select(model.id).where(*filters, model.id > last_id).order_by(model.id).limit(chunk_size)
+            ).scalars().all()
+            if not ids:
+                break
+            
+            try:
+                affected += apply(ids)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            
+            matched += len(ids)
+            chunks += 1
+            last_id = ids[-1]
+    
+    return {
+        'dry_run': dry_run,
+        'matched': matched,
+        'affected': affected,
+        'chunks': chunks,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def _update_returning(model, ids: list[int], filters: list, values: dict) -> list[int]:
+    """One UPDATE of a chunk, re-checking the filter; returns the ids it changed"""
+    return db.session.execute(
+        update(model).where(model.id.in_(ids), *filters).values(values).returning(model.id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
@@ -4,8 +4,12 @@ Implements the "Killer Rules" for prop trading challenges
 """
 
 from datetime import datetime
-from models import db, Challenge, Trade, Position
-from decimal import Decimal
+from models import db, Challenge, Trade
+from services.batch_evaluator import reset_daily_equity_batch
+from services.portfolio_cache import portfolio_cache
+from services.leaderboard import sync_entry
+from services.period_leaderboard import record_passed
+from money import from_micros, to_micros, div, pct, reaches_pct, to_cents, to_float
 
 
 class ChallengeEngine:
@@ -14,35 +18,36 @@ class ChallengeEngine:
     - Max Daily Loss: 5% → FAILED
     - Max Total Loss: 10% → FAILED  
     - Profit Target: 10% → PASSED
+    - Trailing Drawdown (optional, per plan) → FAILED
     """
     
     def __init__(self, challenge: Challenge):
         self.challenge = challenge
         self.plan = challenge.plan
         
-    def calculate_equity(self) -> Decimal:
-        """Calculate current equity including unrealized P&L from open positions"""
-        balance = Decimal(str(self.challenge.current_balance))
-        
-        # Add unrealized P&L from open positions
-        positions = Position.query.filter_by(challenge_id=self.challenge.id).all()
-        unrealized_pnl = sum(Decimal(str(pos.unrealized_pnl or 0)) for pos in positions)
-        
-        return balance + unrealized_pnl
+    @property
+    def portfolio(self):
+        """Cached micro-unit state: balances, positions and plan thresholds"""
+        # Memory-only while the cached portfolio is current for this challenge version
+        return portfolio_cache.get(self.challenge)
+    
+    def calculate_equity(self) -> int:
+        """Calculate current equity (micro-units): cash balance plus market value of open positions"""
+        # Buys deduct the full cost from the balance, so add back each position's market value
+        return self.portfolio.equity()
     
     def check_daily_loss(self) -> tuple[bool, str]:
         """
         Check if daily loss exceeds 5%
         Returns: (is_failed, reason)
         """
-        max_daily_loss_pct = Decimal(str(self.plan.max_daily_loss_pct)) / 100
-        daily_start = Decimal(str(self.challenge.daily_start_equity))
-        current_equity = self.calculate_equity()
+        portfolio = self.portfolio
+        max_daily_loss_pct = portfolio.thresholds['max_daily_loss_pct']
+        daily_start = portfolio.daily_start_equity
+        daily_loss = daily_start - portfolio.equity()
         
-        daily_loss = (daily_start - current_equity) / daily_start
-        
-        if daily_loss >= max_daily_loss_pct:
-            return True, f"Daily loss limit exceeded: {float(daily_loss * 100):.2f}% (max: {float(max_daily_loss_pct * 100)}%)"
+        if reaches_pct(daily_loss, daily_start, max_daily_loss_pct):
+            return True, f"Daily loss limit exceeded: {pct(daily_loss, daily_start):.2f}% (max: {to_float(max_daily_loss_pct)}%)"
         
         return False, ""
     
@@ -51,14 +56,13 @@ class ChallengeEngine:
         Check if total loss exceeds 10%
         Returns: (is_failed, reason)
         """
-        max_total_loss_pct = Decimal(str(self.plan.max_total_loss_pct)) / 100
-        initial = Decimal(str(self.challenge.initial_balance))
-        current_equity = self.calculate_equity()
-        
-        total_loss = (initial - current_equity) / initial
+        portfolio = self.portfolio
+        max_total_loss_pct = portfolio.thresholds['max_total_loss_pct']
+        initial = portfolio.initial_balance
+        total_loss = initial - portfolio.equity()
         
-        if total_loss >= max_total_loss_pct:
-            return True, f"Total loss limit exceeded: {float(total_loss * 100):.2f}% (max: {float(max_total_loss_pct * 100)}%)"
+        if reaches_pct(total_loss, initial, max_total_loss_pct):
+            return True, f"Total loss limit exceeded: {pct(total_loss, initial):.2f}% (max: {to_float(max_total_loss_pct)}%)"
         
         return False, ""
     
@@ -67,17 +71,62 @@ class ChallengeEngine:
         Check if profit target of 10% is reached
         Returns: (is_passed, reason)
         """
-        profit_target_pct = Decimal(str(self.plan.profit_target_pct)) / 100
-        initial = Decimal(str(self.challenge.initial_balance))
-        current_equity = self.calculate_equity()
+        portfolio = self.portfolio
+        profit_target_pct = portfolio.thresholds['profit_target_pct']
+        initial = portfolio.initial_balance
+        profit = portfolio.equity() - initial
+        
+        if reaches_pct(profit, initial, profit_target_pct):
+            return True, f"Profit target reached: {pct(profit, initial):.2f}% (target: {to_float(profit_target_pct)}%)"
+        
+        return False, ""
+    
+    def check_trailing_drawdown(self) -> tuple[bool, str]:
+        """
+        Check if drawdown from the equity high-water mark exceeds the plan limit
+        Only applies to plans that define max_trailing_drawdown_pct
+        Returns: (is_failed, reason)
+        """
+        portfolio = self.portfolio
+        max_drawdown_pct = portfolio.thresholds['max_trailing_drawdown_pct']
+        if max_drawdown_pct is None or self.challenge.high_water_mark is None:
+            return False, ""
         
-        profit = (current_equity - initial) / initial
+        high_water_mark = to_micros(self.challenge.high_water_mark)
+        drawdown = high_water_mark - portfolio.equity()
         
-        if profit >= profit_target_pct:
-            return True, f"Profit target reached: {float(profit * 100):.2f}% (target: {float(profit_target_pct * 100)}%)"
+        if reaches_pct(drawdown, high_water_mark, max_drawdown_pct):
+            return True, f"Trailing drawdown limit exceeded: {pct(drawdown, high_water_mark):.2f}% (max: {to_float(max_drawdown_pct)}%)"
         
         return False, ""
     
+    def update_running_stats(self, equity: int):
+        """
+        Fold the latest equity (micro-units) into the challenge's running statistics
+        O(1): only the stored aggregates are compared, no trade history is scanned
+        """
+        challenge = self.challenge
+        equity = to_cents(equity)
+        stored = from_micros(equity)
+        
+        high_water_mark = challenge.high_water_mark
+        if high_water_mark is None:
+            high_water_mark = challenge.initial_balance
+        if stored > high_water_mark:
+            high_water_mark = stored
+        challenge.high_water_mark = high_water_mark
+        high_water_mark = to_micros(high_water_mark)
+        
+        # Rounded to the four decimals max_drawdown_pct stores, so an unchanged drawdown compares equal
+        drawdown_pct = from_micros(div(high_water_mark - equity, high_water_mark) * 100) if high_water_mark > 0 else 0
+        if drawdown_pct > (challenge.max_drawdown_pct or 0):
+            challenge.max_drawdown_pct = drawdown_pct
+        
+        if challenge.intraday_high is None or stored > challenge.intraday_high:
+            challenge.intraday_high = stored
+        if challenge.intraday_low is None or stored < challenge.intraday_low:
+            challenge.intraday_low = stored
+    
     def evaluate(self) -> dict:
         """
         Evaluate all rules and update challenge status if needed
@@ -90,7 +139,9 @@ class ChallengeEngine:
                 'changed': False
             }
         
+        seen_version = self.challenge.version
         current_equity = self.calculate_equity()
+        self.update_running_stats(current_equity)
         
         # Check daily loss first (most restrictive)
         daily_failed, daily_reason = self.check_daily_loss()
@@ -99,7 +150,7 @@ class ChallengeEngine:
             return {
                 'status': 'failed',
                 'reason': daily_reason,
-                'equity': float(current_equity),
+                'equity': to_float(current_equity),
                 'changed': True
             }
         
@@ -110,7 +161,18 @@ class ChallengeEngine:
             return {
                 'status': 'failed',
                 'reason': total_reason,
-                'equity': float(current_equity),
+                'equity': to_float(current_equity),
+                'changed': True
+            }
+        
+        # Check trailing drawdown
+        trailing_failed, trailing_reason = self.check_trailing_drawdown()
+        if trailing_failed:
+            self._fail_challenge(trailing_reason)
+            return {
+                'status': 'failed',
+                'reason': trailing_reason,
+                'equity': to_float(current_equity),
                 'changed': True
             }
         
@@ -121,18 +183,24 @@ class ChallengeEngine:
             return {
                 'status': 'passed',
                 'reason': pass_reason,
-                'equity': float(current_equity),
+                'equity': to_float(current_equity),
                 'changed': True
             }
         
         # Update equity
-        self.challenge.equity = current_equity
+        self.challenge.equity = from_micros(to_cents(current_equity))
+        sync_entry(self.challenge)
+        db.session.flush()
+        committed_version = self.challenge.version
         db.session.commit()
         
+        # Only statistics changed: the cached balance and positions are still current
+        portfolio_cache.advance(self.challenge.id, seen_version, committed_version)
+        
         return {
             'status': 'active',
-            'equity': float(current_equity),
-            'profit_pct': float((current_equity - Decimal(str(self.challenge.initial_balance))) / Decimal(str(self.challenge.initial_balance)) * 100),
+            'equity': to_float(current_equity),
+            'profit_pct': pct(current_equity - self.portfolio.initial_balance, self.portfolio.initial_balance),
             'changed': False
         }
     
@@ -141,15 +209,20 @@ class ChallengeEngine:
         self.challenge.status = 'failed'
         self.challenge.failure_reason = reason
         self.challenge.end_date = datetime.utcnow()
-        self.challenge.equity = self.calculate_equity()
+        self.challenge.equity = from_micros(to_cents(self.calculate_equity()))
+        sync_entry(self.challenge)
         db.session.commit()
+        portfolio_cache.invalidate(self.challenge.id)
     
     def _pass_challenge(self, reason: str):
         """Mark challenge as passed"""
         self.challenge.status = 'passed'
         self.challenge.end_date = datetime.utcnow()
-        self.challenge.equity = self.calculate_equity()
+        self.challenge.equity = from_micros(to_cents(self.calculate_equity()))
+        sync_entry(self.challenge)
+        record_passed([self.challenge.id])
         db.session.commit()
+        portfolio_cache.invalidate(self.challenge.id)
 
 
 def evaluate_challenge(challenge_id: int) -> dict:
@@ -168,14 +241,11 @@ def evaluate_challenge(challenge_id: int) -> dict:
 def reset_daily_equity():
     """
     Daily task to reset daily_start_equity for all active challenges
+    Also closes the day in each challenge's running statistics
     Should be run at market open (e.g., 9:30 AM)
     """
-    active_challenges = Challenge.query.filter_by(status='active').all()
-    
-    for challenge in active_challenges:
-        engine = ChallengeEngine(challenge)
-        challenge.daily_start_equity = engine.calculate_equity()
-    
-    db.session.commit()
+    result = reset_daily_equity_batch()
     
-    return {'reset_count': len(active_challenges)}
+    # Every daily start equity changed
+    portfolio_cache.clear()
+    return result
@@ -0,0 +1,171 @@
+"""
+Evaluation Queue Service
+Moves post-trade rule evaluation off the order path
+Pending evaluations are rows in pending_evaluations (one per challenge, so
+repeated fills coalesce) written in the same transaction as the fill; a
+background worker drains them within EVALUATION_QUEUE_INTERVAL seconds
+
+Every process runs a worker; each claims the rows it evaluates (claimed_by,
+claimed_at) in one UPDATE ... RETURNING, so no two evaluate the same
+challenge. Claims older than EVALUATION_CLAIM_TIMEOUT (a crashed worker)
+can be taken over
+"""
+
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_
+from models import db, PendingEvaluation
+from services.challenge_engine import evaluate_challenge
+
+
+class EvaluationQueue:
+    """Durable, per-challenge coalescing work queue for ChallengeEngine.evaluate"""
+    
+    MAX_ATTEMPTS = 5
+    
+    def __init__(self, app=None):
+        self.app = None
+        self.interval = 0.5
+        self.claim_timeout = 60
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._wake = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('EVALUATION_QUEUE_INTERVAL', 0.5)
+        self.claim_timeout = app.config.get('EVALUATION_CLAIM_TIMEOUT', 60)
+        
+        # Also picks up evaluations left pending by a previous process
+        if app.config.get('EVALUATION_QUEUE_ENABLED', True):
+            self.start()
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name='evaluation-queue', daemon=True)
+        self._thread.start()
+    
+    def enqueue(self, challenge_id: int):
+        """
+        Mark a challenge for evaluation in the caller's transaction
+        An already pending challenge only has its timestamp bumped (coalescing)
+        and its claim cleared, so the newer fill is evaluated too
+        """
+        db.session.merge(PendingEvaluation(
+            challenge_id=challenge_id,
+            enqueued_at=datetime.utcnow(),
+            attempts=0,
+            claimed_by=None,
+            claimed_at=None
+        ))
+    
+    def notify(self):
+        """
+        Call after the enqueuing transaction committed
+        Wakes the worker, or drains inline when no worker runs (e.g. testing)
+        """
+        if self.running:
+            self._wake.set()
+        else:
+            self.drain()
+    
+    def drain(self, limit: int = 500) -> int:
+        """Evaluate pending challenges this worker claimed, oldest first. Returns how many were processed"""
+        pending = self._claim(limit)
+        
+        for challenge_id, enqueued_at in pending:
+            try:
+                evaluate_challenge(challenge_id)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error evaluating challenge {challenge_id}: {e}")
+                self._record_failure(challenge_id)
+                continue
+            
+            # Keep the row if a newer fill re-enqueued the challenge meanwhile
+            PendingEvaluation.query.filter(
+                PendingEvaluation.challenge_id == challenge_id,
+                PendingEvaluation.enqueued_at <= enqueued_at
+            ).delete(synchronize_session=False)
+            self._release(challenge_id)
+            db.session.commit()
+        
+        return len(pending)
+    
+    def _claim(self, limit: int) -> list:
+        """
+        Claim up to limit unclaimed (or abandoned) rows for this worker
+        The claimable condition is repeated on the row itself, so a row another
+        worker claimed concurrently is skipped rather than taken over
+        """
+        now = datetime.utcnow()
+        claimable = or_(
+            PendingEvaluation.claimed_at.is_(None),
+            PendingEvaluation.claimed_at < now - timedelta(seconds=self.claim_timeout)
+        )
+        oldest = select(PendingEvaluation.challenge_id).where(claimable).order_by(
+            PendingEvaluation.enqueued_at
+        ).limit(limit)
+        
+        claimed = db.session.execute(
+            update(PendingEvaluation).where(
+                PendingEvaluation.challenge_id.in_(oldest),
+                claimable
+            ).values(
+                claimed_by=self.worker_id,
+                claimed_at=now
+            ).returning(
+                PendingEvaluation.challenge_id,
+                PendingEvaluation.enqueued_at
+            ),
+            execution_options={'synchronize_session': False}
+        ).all()
+        db.session.commit()
+        
+        return sorted(claimed, key=lambda row: row.enqueued_at)
+    
+    def _release(self, challenge_id: int):
+        """Drop this worker's claim on a row that is still queued (re-enqueued or retrying)"""
+        db.session.execute(
+            update(PendingEvaluation).where(
+                PendingEvaluation.challenge_id == challenge_id,
+                PendingEvaluation.claimed_by == self.worker_id
+            ).values(claimed_by=None, claimed_at=None),
+            execution_options={'synchronize_session': False}
+        )
+    
+    def _record_failure(self, challenge_id: int):
+        item = db.session.get(PendingEvaluation, challenge_id)
+        if item is None:
+            return
+        item.attempts = (item.attempts or 0) + 1
+        if item.attempts >= self.MAX_ATTEMPTS:
+            db.session.delete(item)
+        else:
+            item.claimed_by = None
+            item.claimed_at = None
+        db.session.commit()
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            
+            with self.app.app_context():
+                try:
+                    self.drain()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Evaluation queue error: {e}")
+
+
+evaluation_queue = EvaluationQueue()
@@ -0,0 +1,234 @@
+"""
+Export Service
+Streams a challenge's trades or equity curve as CSV or Parquet
+
+Rows come from a server-side cursor (yield_per) through generators and are
+written out in fixed-size chunks / row groups, so memory stays constant
+whatever the history size. Parquet needs the optional pyarrow package
+"""
+
+import csv
+import io
+import threading
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from models import db, Trade, LedgerEntry
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export disabled
+    pa = None
+    pq = None
+
+EXPORT_KINDS = ('trades', 'equity')
+EXPORT_FORMATS = ('csv', 'parquet')
+
+TRADE_COLUMNS = (
+    ('id', 'int'),
+    ('symbol', 'str'),
+    ('side', 'str'),
+    ('quantity', 'float'),
+    ('entry_price', 'float'),
+    ('exit_price', 'float'),
+    ('pnl', 'float'),
+    ('status', 'str'),
+    ('opened_at', 'datetime'),
+    ('closed_at', 'datetime')
+)
+
+EQUITY_COLUMNS = (
+    ('seq', 'int'),
+    ('timestamp', 'datetime'),
+    ('entry_type', 'str'),
+    ('symbol', 'str'),
+    ('side', 'str'),
+    ('quantity', 'float'),
+    ('price', 'float'),
+    ('cash_delta', 'float'),
+    ('balance', 'float'),
+    ('positions_value', 'float'),
+    ('equity', 'float')
+)
+
+# Concurrent exports in this process, so long downloads can't take every worker
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def acquire_export_slot(limit: int) -> bool:
+    """Non-blocking: False when `limit` exports are already streaming"""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(limit)
+    return _slots.acquire(blocking=False)
+
+
+def release_export_slot():
+    _slots.release()
+
+
+def parquet_available() -> bool:
+    return pa is not None
+
+
+def export_columns(kind: str) -> tuple:
+    return TRADE_COLUMNS if kind == 'trades' else EQUITY_COLUMNS
+
+
+def iter_rows(kind: str, challenge_id: int, batch_size: int = 1000):
+    return iter_trade_rows(challenge_id, batch_size) if kind == 'trades' else iter_equity_rows(challenge_id, batch_size)
+
+
+def iter_trade_rows(challenge_id: int, batch_size: int = 1000):
+    """Trades in execution order, fetched batch_size rows at a time"""
+    result = db.session.execute(
+        select(
+            Trade.id, Trade.symbol, Trade.side, Trade.quantity, Trade.entry_price,
+            Trade.exit_price, Trade.pnl, Trade.status, Trade.opened_at, Trade.closed_at
+        ).where(
+            Trade.challenge_id == challenge_id
+        ).order_by(Trade.opened_at, Trade.id).execution_options(yield_per=batch_size)
+    )
+    
+    for row in result:
+        yield tuple(row)
+
+
+def iter_equity_rows(challenge_id: int, batch_size: int = 1000):
+    """
+    Equity after every ledger entry: cash plus open positions marked at the
+    last fill price seen for each symbol
+    Folds the ledger as it streams; only the open positions are kept in memory
+    """
+    result = db.session.execute(
+        select(
+            LedgerEntry.seq, LedgerEntry.created_at, LedgerEntry.entry_type, LedgerEntry.symbol,
+            LedgerEntry.side, LedgerEntry.quantity, LedgerEntry.price, LedgerEntry.cash_delta
+        ).where(
+            LedgerEntry.challenge_id == challenge_id
+        ).order_by(LedgerEntry.seq).execution_options(yield_per=batch_size)
+    )
+    
+    balance = Decimal('0')
+    holdings = {}  # symbol -> quantity
+    marks = {}  # symbol -> last fill price
+    
+    for seq, created_at, entry_type, symbol, side, quantity, price, cash_delta in result:
+        balance += Decimal(str(cash_delta))
+        
+        if entry_type == 'fill':
+            quantity_dec = Decimal(str(quantity))
+            held = holdings.get(symbol, Decimal('0')) + (quantity_dec if side == 'buy' else -quantity_dec)
+            if held > 0:
+                holdings[symbol] = held
+                marks[symbol] = Decimal(str(price))
+            else:
+                holdings.pop(symbol, None)
+                marks.pop(symbol, None)
+        
+        positions_value = sum((held * marks[s] for s, held in holdings.items()), Decimal('0'))
+        
+        yield (
+            seq, created_at, entry_type, symbol, side, quantity, price, cash_delta,
+            round(balance, 2), round(positions_value, 2), round(balance + positions_value, 2)
+        )
+
+
+def stream_csv(columns: tuple, rows, chunk_rows: int = 1000):
+    """Yield CSV text in chunks of chunk_rows rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in columns])
+    
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(value) for value in row])
+        pending += 1
+        if pending >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    
+    yield buffer.getvalue()
+
+
+_ARROW_TYPES = {
+    'int': lambda: pa.int64(),
+    'float': lambda: pa.float64(),
+    'str': lambda: pa.string(),
+    'datetime': lambda: pa.timestamp('us')
+}
+
+
+def stream_parquet(columns: tuple, rows, row_group_rows: int = 10000):
+    """Yield a Parquet file one row group at a time"""
+    schema = pa.schema([(name, _ARROW_TYPES[kind]()) for name, kind in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    
+    batch = [[] for _ in columns]
+    try:
+        for row in rows:
+            for values, (_, kind), value in zip(batch, columns, row):
+                values.append(_arrow_value(kind, value))
+            if len(batch[0]) >= row_group_rows:
+                writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+                batch = [[] for _ in columns]
+                yield sink.drain()
+        
+        if batch[0]:
+            writer.write_table(pa.Table.from_arrays(batch, schema=schema))
+    finally:
+        writer.close()
+    
+    yield sink.drain()
+
+
+def _arrow_value(kind: str, value):
+    if value is None:
+        return None
+    if kind == 'float':
+        return float(value)
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return format(value.normalize(), 'f')
+    return value
+
+
+class _ChunkSink:
+    """Write-only file object handing what was written so far to the response"""
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
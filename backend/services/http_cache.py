@@ -0,0 +1,120 @@
+"""
+HTTP Cache Service
+ETags from data versions, conditional GETs and per-endpoint Cache-Control
+for the public read endpoints
+
+An ETag is built from the endpoint, its query string and the versions of
+the data sets it reads (data_versions rows, bumped by the transactions that
+change them, or a callable such as a time window). Nothing hashes the body:
+If-None-Match is answered with 304 before the view runs, and a small
+in-process store replays bodies already rendered for the current ETag
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response, Response
+from sqlalchemy import update, select
+from models import db, DataVersion
+
+DATA_SETS = ('leaderboard', 'challenge_status', 'plans')
+
+
+def bump_version(*names: str):
+    """Mark data sets as changed, in the caller's transaction (caller commits)"""
+    db.session.execute(
+        update(DataVersion).where(DataVersion.name.in_(names)).values(version=DataVersion.version + 1)
+    )
+
+
+def ensure_versions():
+    """Create the counters once, so bump_version is a plain UPDATE"""
+    existing = set(db.session.execute(select(DataVersion.name)).scalars())
+    db.session.add_all([DataVersion(name=name, version=0) for name in DATA_SETS if name not in existing])
+    db.session.commit()
+
+
+def current_versions(names: list[str]) -> dict:
+    if not names:
+        return {}
+    return dict(db.session.execute(
+        select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names))
+    ).all())
+
+
+class ResponseStore:
+    """Bounded LRU of rendered bodies by ETag, each kept at most max_age seconds"""
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, etag: str):
+        with self._lock:
+            entry = self._entries.get(etag)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[etag]
+                return None
+            self._entries.move_to_end(etag)
+            return entry[1]
+    
+    def put(self, etag: str, max_age: int, body: bytes, mimetype: str):
+        with self._lock:
+            self._entries[etag] = (time.monotonic() + max_age, (body, mimetype))
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+response_store = ResponseStore()
+
+
+def http_cached(*sources, max_age: int):
+    """
+    Cache a public GET endpoint
+    sources: data_versions names, or callables returning a version token
+    max_age: Cache-Control max-age, and how long a rendered body is replayed
+    """
+    names = [source for source in sources if isinstance(source, str)]
+    tokens = [source for source in sources if callable(source)]
+    cache_control = f'public, max-age={max_age}'
+    
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = current_versions(names)
+            key = '|'.join(
+                [request.endpoint, request.query_string.decode('latin-1')]
+                + [f'{name}={versions.get(name, 0)}' for name in names]
+                + [str(token()) for token in tokens]
+            )
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+            
+            if etag in request.if_none_match:
+                response = Response(status=304)
+            else:
+                cached = response_store.get(etag)
+                if cached is not None:
+                    body, mimetype = cached
+                    response = Response(body, status=200, mimetype=mimetype)
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    response_store.put(etag, max_age, response.get_data(), response.mimetype)
+            
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        
+        return wrapper
+    return decorator
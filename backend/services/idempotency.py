@@ -0,0 +1,187 @@
+"""
+Idempotency Service
+Replays the recorded response when a client retries a request with the same
+Idempotency-Key header, instead of executing it again
+
+Keys are scoped per user and claimed in idempotency_keys, whose unique
+(user_id, key) constraint lets exactly one request claim a key, whichever
+process it runs in. A duplicate arriving while the first request is still
+running polls for its response. A claim left in flight by a crashed request
+is taken over after IDEMPOTENCY_CLAIM_TIMEOUT; recorded responses expire
+after IDEMPOTENCY_TTL
+"""
+
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import request, jsonify, make_response, Response
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import update, and_, or_
+from sqlalchemy.exc import IntegrityError
+from models import db, IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyStore:
+    """Claims and recorded responses for (user_id, key), shared through the database"""
+    
+    POLL_INTERVAL = 0.05  # seconds between checks while waiting for the first request
+    
+    def __init__(self, app=None):
+        self.ttl = 86400
+        self.wait_timeout = 30
+        self.claim_timeout = 300
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('IDEMPOTENCY_TTL', 86400)
+        self.wait_timeout = app.config.get('IDEMPOTENCY_WAIT_TIMEOUT', 30)
+        self.claim_timeout = app.config.get('IDEMPOTENCY_CLAIM_TIMEOUT', 300)
+    
+    def begin(self, user_id: int, key: str, fingerprint: str) -> tuple[IdempotencyKey, bool]:
+        """
+        Claim a key. Returns (entry, True) for the first request, which must
+        then call complete() or abandon(), or the existing entry and False
+        """
+        while True:
+            now = datetime.utcnow()
+            
+            # Expired keys and claims abandoned by a crashed request are free again
+            IdempotencyKey.query.filter(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    and_(
+                        IdempotencyKey.status_code.is_(None),
+                        IdempotencyKey.created_at <= now - timedelta(seconds=self.claim_timeout)
+                    )
+                )
+            ).delete(synchronize_session='fetch')
+            
+            entry = IdempotencyKey(
+                user_id=user_id,
+                key=key,
+                fingerprint=fingerprint,
+                created_at=now,
+                expires_at=now + timedelta(seconds=self.ttl)
+            )
+            db.session.add(entry)
+            try:
+                db.session.commit()
+                return entry, True
+            except IntegrityError:
+                db.session.rollback()
+            
+            existing = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+            if existing is not None:
+                return existing, False
+            # Released between our insert and the lookup: claim it again
+    
+    def wait(self, user_id: int, key: str):
+        """
+        Poll until the request holding a key records its response
+        Returns the entry (status_code still None on timeout), or None if the
+        claim was released and the key is free
+        """
+        deadline = time.monotonic() + self.wait_timeout
+        
+        while True:
+            db.session.rollback()  # each poll reads in a fresh transaction
+            entry = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+            if entry is None or entry.status_code is not None or time.monotonic() >= deadline:
+                return entry
+            time.sleep(self.POLL_INTERVAL)
+    
+    def complete(self, entry_id: int, response: Response):
+        db.session.rollback()
+        db.session.execute(
+            update(IdempotencyKey).where(IdempotencyKey.id == entry_id).values(
+                status_code=response.status_code,
+                body=response.get_data(),
+                mimetype=response.mimetype
+            )
+        )
+        db.session.commit()
+    
+    def abandon(self, entry_id: int):
+        """Release a key whose request failed, so a retry executes it afresh"""
+        db.session.rollback()
+        IdempotencyKey.query.filter_by(id=entry_id).delete(synchronize_session='fetch')
+        db.session.commit()
+    
+    def purge(self) -> int:
+        """Delete expired keys"""
+        deleted = IdempotencyKey.query.filter(
+            IdempotencyKey.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _should_record(response: Response) -> bool:
+    """Server errors and retryable conflicts are not final: let the retry run"""
+    return response.status_code < 500 and response.status_code != 409
+
+
+def idempotent(view):
+    """
+    Honour an Idempotency-Key header on a JWT-protected endpoint
+    Must be applied below @jwt_required()
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+        
+        user_id = int(get_jwt_identity())
+        fingerprint = hashlib.sha256(
+            request.method.encode() + request.path.encode() + b'\n' + request.get_data()
+        ).hexdigest()
+        
+        entry, owner = idempotency_store.begin(user_id, key, fingerprint)
+        
+        if not owner:
+            if entry.fingerprint != fingerprint:
+                return jsonify({'error': 'Idempotency-Key was already used for a different request'}), 422
+            
+            # Wait for the first request rather than racing it
+            entry = idempotency_store.wait(user_id, key)
+            
+            if entry is None:
+                # The first attempt failed and released the key: run it now
+                entry, owner = idempotency_store.begin(user_id, key, fingerprint)
+                if not owner:
+                    return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            elif entry.status_code is None:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            else:
+                replay = Response(entry.body, status=entry.status_code, mimetype=entry.mimetype)
+                replay.headers['Idempotent-Replayed'] = 'true'
+                return replay
+        
+        entry_id = entry.id
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            idempotency_store.abandon(entry_id)
+            raise
+        
+        if _should_record(response):
+            idempotency_store.complete(entry_id, response)
+        else:
+            idempotency_store.abandon(entry_id)
+        
+        return response
+    
+    return wrapper
@@ -0,0 +1,108 @@
+"""
+Leaderboard Service
+Materialized ranking rows (status, equity, profit_pct) per challenge
+
+Rows are written in the transaction that changes the challenge, so the
+public leaderboard reads are top-N scans of the profit_pct indexes instead
+of a sort over every challenge
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, insert, delete, func, literal
+from models import db, Challenge, LeaderboardEntry
+from services.rank_index import rank_index
+from services.platform_stats import platform_stats
+from services.http_cache import bump_version
+from services.metrics import challenge_status_changed
+from services.analytics import record_challenge
+
+PCT_PLACES = Decimal('0.0001')
+
+_COLUMNS = (
+    'challenge_id', 'user_id', 'status', 'initial_balance', 'equity', 'profit_pct',
+    'start_date', 'end_date', 'updated_at'
+)
+
+
+def sync_entry(challenge) -> LeaderboardEntry:
+    """Refresh one challenge's row from the challenge in the session (caller commits)"""
+    if challenge.id is None:
+        db.session.flush()  # assigns the id and start_date of a new challenge
+    
+    entry = challenge.leaderboard_entry
+    if entry is None:
+        entry = LeaderboardEntry()
+        challenge.leaderboard_entry = entry
+    
+    previous = entry.status
+    transition = previous != challenge.status
+    
+    initial = Decimal(str(challenge.initial_balance))
+    equity = Decimal(str(challenge.equity))
+    
+    entry.user_id = challenge.user_id
+    entry.status = challenge.status
+    entry.initial_balance = initial
+    entry.equity = equity
+    entry.profit_pct = ((equity - initial) / initial * 100).quantize(PCT_PLACES)
+    entry.start_date = challenge.start_date
+    entry.end_date = challenge.end_date
+    
+    rank_index.stage(challenge.id, challenge.user_id, challenge.status, entry.profit_pct)
+    
+    # New challenge or status transition: the platform counts changed
+    if transition:
+        platform_stats.invalidate()
+        challenge_status_changed(previous, challenge.status)
+        record_challenge(challenge, previous)
+        bump_version(*(('challenge_status', 'leaderboard') if challenge.status == 'passed' else ('challenge_status',)))
+    return entry
+
+
+def refresh_entries(challenge_ids: list[int] = None, chunk_size: int = 500) -> int:
+    """
+    Rewrite the rows of many challenges from the challenges table, set-based
+    (DELETE + INSERT ... SELECT per chunk); all challenges when ids is None
+    Caller commits. Returns the number of challenges refreshed
+    """
+    if challenge_ids is None:
+        db.session.execute(delete(LeaderboardEntry))
+        return db.session.execute(
+            insert(LeaderboardEntry).from_select(_COLUMNS, _source())
+        ).rowcount
+    
+    refreshed = 0
+    for start in range(0, len(challenge_ids), chunk_size):
+        chunk = challenge_ids[start:start + chunk_size]
+        db.session.execute(delete(LeaderboardEntry).where(LeaderboardEntry.challenge_id.in_(chunk)))
+        refreshed += db.session.execute(
+            insert(LeaderboardEntry).from_select(_COLUMNS, _source().where(Challenge.id.in_(chunk)))
+        ).rowcount
+    return refreshed
+
+
+def backfill_leaderboard() -> int:
+    """One-off backfill on the first start after the leaderboard table was added"""
+    if LeaderboardEntry.query.first() is not None:
+        return 0
+    if Challenge.query.first() is None:
+        return 0
+    
+    count = refresh_entries()
+    db.session.commit()
+    return count
+
+
+def _source():
+    return select(
+        Challenge.id,
+        Challenge.user_id,
+        Challenge.status,
+        Challenge.initial_balance,
+        Challenge.equity,
+        func.round((Challenge.equity - Challenge.initial_balance) * 100.0 / Challenge.initial_balance, 4),
+        Challenge.start_date,
+        Challenge.end_date,
+        literal(datetime.utcnow())
+    )
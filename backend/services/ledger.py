@@ -0,0 +1,275 @@
+"""
+Trade Ledger Service
+Append-only ledger of fills and cash movements with periodic snapshots
+Any challenge's balance and positions can be rebuilt from its latest
+snapshot plus the entries written after it
+"""
+
+import json
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy import create_engine, select, func
+from models import db, Challenge, LedgerEntry, LedgerSnapshot, Position, Trade
+
+
+def record_deposit(challenge, amount) -> LedgerEntry:
+    """Record the funding of a challenge (initial balance)"""
+    return _append(challenge, entry_type='deposit', cash_delta=Decimal(str(amount)))
+
+
+def record_fill(challenge, trade, side: str, quantity: Decimal, price: Decimal, cash_delta: Decimal = None) -> LedgerEntry:
+    """
+    Record a buy or sell fill and its cash impact
+    Pass cash_delta when the caller already rounded the balance change
+    """
+    if cash_delta is None:
+        cash_delta = -(price * quantity) if side == 'buy' else price * quantity
+    
+    return _append(
+        challenge,
+        entry_type='fill',
+        symbol=trade.symbol,
+        side=side,
+        quantity=quantity,
+        price=price,
+        cash_delta=cash_delta,
+        trade=trade
+    )
+
+
+def _append(challenge, **fields) -> LedgerEntry:
+    """
+    Append an entry in the caller's transaction
+    The sequence number comes from the challenge row, so it is written
+    atomically with the balance change it describes
+    """
+    challenge.ledger_seq = (challenge.ledger_seq or 0) + 1
+    
+    entry = LedgerEntry(challenge=challenge, seq=challenge.ledger_seq, **fields)
+    db.session.add(entry)
+    
+    interval = current_app.config.get('LEDGER_SNAPSHOT_INTERVAL', 50)
+    if challenge.id is not None and challenge.ledger_seq % interval == 0:
+        take_snapshot(challenge.id)
+    
+    return entry
+
+
+def backfill_ledger() -> int:
+    """
+    One-off backfill for challenges created before the ledger was added
+    Untraded challenges get their opening deposit; traded ones an opening
+    snapshot of their live balance and positions, so replays start there
+    """
+    challenges = Challenge.query.filter(func.coalesce(Challenge.ledger_seq, 0) == 0).all()
+    if not challenges:
+        return 0
+    
+    ids = [challenge.id for challenge in challenges]
+    traded = set(db.session.execute(
+        select(Trade.challenge_id).where(Trade.challenge_id.in_(ids)).distinct()
+    ).scalars())
+    positions = {}
+    for pos in Position.query.filter(Position.challenge_id.in_(ids)):
+        positions.setdefault(pos.challenge_id, {})[pos.symbol] = (
+            Decimal(str(pos.quantity)), Decimal(str(pos.avg_entry_price))
+        )
+    
+    for challenge in challenges:
+        if challenge.id in traded or challenge.id in positions:
+            challenge.ledger_seq = 1
+            db.session.add(LedgerSnapshot(
+                challenge_id=challenge.id,
+                seq=1,
+                balance=challenge.current_balance,
+                positions=_dump_positions(positions.get(challenge.id, {}))
+            ))
+        else:
+            record_deposit(challenge, challenge.current_balance)
+    
+    db.session.commit()
+    return len(challenges)
+
+
+def take_snapshot(challenge_id: int) -> LedgerSnapshot:
+    """Fold the ledger up to its last entry and store the result as a snapshot"""
+    state = rebuild_state(challenge_id)
+    
+    snapshot = LedgerSnapshot(
+        challenge_id=challenge_id,
+        seq=state['seq'],
+        balance=state['balance'],
+        positions=_dump_positions(state['positions'])
+    )
+    db.session.add(snapshot)
+    return snapshot
+
+
+def apply_entries(balance: Decimal, positions: dict, entries) -> Decimal:
+    """
+    Fold ledger entries into a balance and a positions dict
+    positions maps symbol -> [quantity, avg_entry_price] and is updated in place
+    Entries are (entry_type, symbol, side, quantity, price, cash_delta) tuples
+    """
+    for entry_type, symbol, side, quantity, price, cash_delta in entries:
+        balance += Decimal(str(cash_delta))
+        
+        if entry_type != 'fill':
+            continue
+        
+        quantity = Decimal(str(quantity))
+        price = Decimal(str(price))
+        held = positions.get(symbol)
+        
+        if side == 'buy':
+            if held:
+                total_quantity = held[0] + quantity
+                held[1] = (held[0] * held[1] + quantity * price) / total_quantity
+                held[0] = total_quantity
+            else:
+                positions[symbol] = [quantity, price]
+        elif held:
+            held[0] -= quantity
+            if held[0] <= 0:
+                del positions[symbol]
+    
+    return balance
+
+
+def rebuild_state(challenge_id: int) -> dict:
+    """Rebuild balance and positions from the latest snapshot plus a short replay"""
+    snapshot = LedgerSnapshot.query.filter_by(
+        challenge_id=challenge_id
+    ).order_by(LedgerSnapshot.seq.desc()).first()
+    
+    balance, positions, seq = _snapshot_state(snapshot)
+    
+    entries = db.session.execute(
+        _entries_query(challenge_id, seq)
+    ).all()
+    
+    balance = apply_entries(balance, positions, [entry[1:] for entry in entries])
+    if entries:
+        seq = entries[-1][0]
+    
+    return {'seq': seq, 'balance': balance, 'positions': positions}
+
+
+def verify_challenge(challenge) -> dict:
+    """Compare the live challenge rows against the state rebuilt from the ledger"""
+    if not challenge.ledger_seq:
+        return {'challenge_id': challenge.id, 'consistent': None, 'message': 'No ledger entries'}
+    
+    state = rebuild_state(challenge.id)
+    live_positions = {
+        pos.symbol: [Decimal(str(pos.quantity)), Decimal(str(pos.avg_entry_price))]
+        for pos in Position.query.filter_by(challenge_id=challenge.id).all()
+    }
+    
+    return compare_state(challenge.id, Decimal(str(challenge.current_balance)), live_positions, state)
+
+
+def compare_state(challenge_id: int, live_balance: Decimal, live_positions: dict, state: dict) -> dict:
+    """Diff live balance/positions against a rebuilt state (cent and micro-unit tolerances)"""
+    differences = []
+    
+    if abs(live_balance - state['balance']) >= Decimal('0.01'):
+        differences.append({'field': 'balance', 'live': float(live_balance), 'ledger': float(state['balance'])})
+    
+    for symbol in sorted(set(live_positions) | set(state['positions'])):
+        live = live_positions.get(symbol)
+        rebuilt = state['positions'].get(symbol)
+        
+        if live is None or rebuilt is None \
+                or abs(live[0] - rebuilt[0]) >= Decimal('0.000001') \
+                or abs(live[1] - rebuilt[1]) >= Decimal('0.0001'):
+            differences.append({
+                'field': f'position:{symbol}',
+                'live': [float(v) for v in live] if live else None,
+                'ledger': [float(v) for v in rebuilt] if rebuilt else None
+            })
+    
+    return {
+        'challenge_id': challenge_id,
+        'consistent': not differences,
+        'seq': state['seq'],
+        'differences': differences
+    }
+
+
+def replay_challenges(database_url: str, challenge_ids: list[int], workers: int = 4, chunk_size: int = 500) -> dict:
+    """
+    Rebuild many challenges in parallel, outside the Flask app
+    Each worker opens its own read-only connection and only reads the ledger
+    tables, so audits never lock the live challenge/position rows
+    Returns {challenge_id: state}
+    """
+    chunks = [challenge_ids[i:i + chunk_size] for i in range(0, len(challenge_ids), chunk_size)]
+    states = {}
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(_replay_chunk, [database_url] * len(chunks), chunks):
+            states.update(result)
+    
+    return states
+
+
+def _replay_chunk(database_url: str, challenge_ids: list[int]) -> dict:
+    """Worker: rebuild a chunk of challenges over a dedicated engine"""
+    engine = create_engine(database_url)
+    states = {}
+    
+    try:
+        with engine.connect() as conn:
+            for challenge_id in challenge_ids:
+                snapshot = conn.execute(
+                    select(LedgerSnapshot.seq, LedgerSnapshot.balance, LedgerSnapshot.positions)
+                    .where(LedgerSnapshot.challenge_id == challenge_id)
+                    .order_by(LedgerSnapshot.seq.desc())
+                    .limit(1)
+                ).first()
+                
+                balance, positions, seq = _snapshot_state(snapshot)
+                entries = conn.execute(_entries_query(challenge_id, seq)).all()
+                
+                balance = apply_entries(balance, positions, [entry[1:] for entry in entries])
+                if entries:
+                    seq = entries[-1][0]
+                
+                states[challenge_id] = {'seq': seq, 'balance': balance, 'positions': positions}
+    finally:
+        engine.dispose()
+    
+    return states
+
+
+def _entries_query(challenge_id: int, after_seq: int):
+    return select(
+        LedgerEntry.seq,
+        LedgerEntry.entry_type,
+        LedgerEntry.symbol,
+        LedgerEntry.side,
+        LedgerEntry.quantity,
+        LedgerEntry.price,
+        LedgerEntry.cash_delta
+    ).where(
+        LedgerEntry.challenge_id == challenge_id,
+        LedgerEntry.seq > after_seq
+    ).order_by(LedgerEntry.seq)
+
+
+def _snapshot_state(snapshot) -> tuple[Decimal, dict, int]:
+    """Starting point for a replay: (balance, positions, seq)"""
+    if snapshot is None:
+        return Decimal('0'), {}, 0
+    
+    positions = {
+        symbol: [Decimal(quantity), Decimal(price)]
+        for symbol, (quantity, price) in json.loads(snapshot.positions).items()
+    }
+    return Decimal(str(snapshot.balance)), positions, snapshot.seq
+
+
+def _dump_positions(positions: dict) -> str:
+    return json.dumps({symbol: [str(quantity), str(price)] for symbol, (quantity, price) in positions.items()})
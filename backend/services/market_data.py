@@ -256,3 +256,25 @@ class MarketDataService:
         
         # Otherwise try US market
         return MarketDataService.get_single_us_price(symbol)
+    
+    @staticmethod
+    def get_prices(symbols: list[str]) -> dict:
+        """
+        Get prices for many symbols (US or Morocco) in one batch
+        One yfinance batch for the US symbols and at most one exchange scrape
+        for the Moroccan ones, instead of one fetch per symbol
+        """
+        symbols = list(dict.fromkeys(s.upper() for s in symbols))
+        morocco = [s for s in symbols if s in MarketDataService.MOROCCO_SYMBOLS]
+        us = [s for s in symbols if s not in MarketDataService.MOROCCO_SYMBOLS]
+        
+        results = {}
+        
+        if us:
+            results.update(MarketDataService.get_us_prices(us))
+        
+        if morocco:
+            morocco_prices = MarketDataService.scrape_morocco_prices()
+            results.update({s: morocco_prices[s] for s in morocco if s in morocco_prices})
+        
+        return results
@@ -0,0 +1,159 @@
+"""
+Metrics Rollup Service
+Admin dashboard counters (users, challenges by status, payments and revenue
+by status and method) held in the single metrics_rollup row
+
+The writes that create users, grant admin rights, change a challenge's
+status or record a payment adjust the row in their own transaction, so the
+dashboard is a one-row read. reconcile() recomputes every counter from the
+source tables on a schedule and repairs any drift
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import update, func, case
+from models import db, User, Challenge, Payment, MetricsRollup
+
+ROLLUP_ID = 1
+
+CHALLENGE_STATUSES = ('active', 'passed', 'failed')
+PAYMENT_STATUSES = ('pending', 'completed', 'failed')
+PAYMENT_METHODS = ('mock_cmi', 'mock_crypto', 'paypal')
+
+
+def adjust(**deltas):
+    """Add to counters in the caller's transaction (caller commits)"""
+    values = {name: getattr(MetricsRollup, name) + delta for name, delta in deltas.items() if delta}
+    if values:
+        db.session.execute(update(MetricsRollup).where(MetricsRollup.id == ROLLUP_ID).values(values))
+
+
+def challenge_status_changed(previous: str, status: str):
+    """A challenge was created (previous None) or moved between statuses"""
+    deltas = {}
+    if previous in CHALLENGE_STATUSES:
+        deltas[f'challenges_{previous}'] = -1
+    if status in CHALLENGE_STATUSES:
+        deltas[f'challenges_{status}'] = deltas.get(f'challenges_{status}', 0) + 1
+    adjust(**deltas)
+
+
+def payment_recorded(payment):
+    """A new payment row was added"""
+    if payment.status not in PAYMENT_STATUSES:
+        return
+    
+    amount = Decimal(str(payment.amount_dh))
+    deltas = {f'payments_{payment.status}': 1, f'revenue_{payment.status}': amount}
+    if payment.status == 'completed':
+        deltas[_method_column(payment.payment_method)] = amount
+    adjust(**deltas)
+
+
+def compute_counters() -> dict:
+    """Every counter from the source tables: three grouped aggregates"""
+    counters = {name: Decimal(0) if name.startswith('revenue_') else 0 for name in _COUNTERS}
+    
+    users, admins = db.session.query(
+        func.count(User.id),
+        func.sum(case((User.is_admin.is_(True), 1), else_=0))
+    ).one()
+    counters['users_total'] = users
+    counters['users_admins'] = int(admins or 0)
+    
+    for status, count in db.session.query(Challenge.status, func.count(Challenge.id)).group_by(Challenge.status):
+        if status in CHALLENGE_STATUSES:
+            counters[f'challenges_{status}'] = count
+    
+    payments = db.session.query(
+        Payment.status, Payment.payment_method, func.count(Payment.id), func.sum(Payment.amount_dh)
+    ).group_by(Payment.status, Payment.payment_method)
+    for status, method, count, amount in payments:
+        if status not in PAYMENT_STATUSES:
+            continue
+        amount = Decimal(str(amount or 0))
+        counters[f'payments_{status}'] += count
+        counters[f'revenue_{status}'] += amount
+        if status == 'completed':
+            counters[_method_column(method)] += amount
+    
+    return counters
+
+
+def reconcile() -> dict:
+    """
+    Overwrite the rollup with freshly computed counters
+    Returns the drift that was repaired, {counter: computed - stored}
+    """
+    counters = compute_counters()
+    rollup = db.session.get(MetricsRollup, ROLLUP_ID)
+    if rollup is None:
+        rollup = MetricsRollup(id=ROLLUP_ID)
+        db.session.add(rollup)
+    
+    drift = {}
+    for name, value in counters.items():
+        difference = value - (getattr(rollup, name) or 0)
+        if difference:
+            drift[name] = float(difference) if isinstance(difference, Decimal) else difference
+        setattr(rollup, name, value)
+    rollup.reconciled_at = datetime.utcnow()
+    db.session.commit()
+    return drift
+
+
+def ensure_rollup():
+    """Create and fill the row on the first start after the table was added"""
+    if db.session.get(MetricsRollup, ROLLUP_ID) is None:
+        reconcile()
+
+
+def dashboard() -> dict:
+    """Admin dashboard payload from the rollup row"""
+    rollup = db.session.get(MetricsRollup, ROLLUP_ID)
+    if rollup is None:
+        reconcile()
+        rollup = db.session.get(MetricsRollup, ROLLUP_ID)
+    
+    passed, failed = rollup.challenges_passed, rollup.challenges_failed
+    
+    return {
+        'users': {
+            'total': rollup.users_total,
+            'admins': rollup.users_admins
+        },
+        'challenges': {
+            'total': rollup.challenges_active + passed + failed,
+            'active': rollup.challenges_active,
+            'passed': passed,
+            'failed': failed,
+            'pass_rate': round((passed / (passed + failed) * 100) if (passed + failed) > 0 else 0, 1)
+        },
+        'revenue': {
+            'total_payments': rollup.payments_completed,
+            'total_revenue_dh': float(rollup.revenue_completed),
+            'by_status': {
+                status: {
+                    'payments': getattr(rollup, f'payments_{status}'),
+                    'amount_dh': float(getattr(rollup, f'revenue_{status}'))
+                } for status in PAYMENT_STATUSES
+            },
+            'by_method': {
+                method: float(getattr(rollup, _method_column(method))) for method in PAYMENT_METHODS + ('other',)
+            }
+        },
+        'reconciled_at': rollup.reconciled_at.isoformat() if rollup.reconciled_at else None
+    }
+
+
+def _method_column(method: str) -> str:
+    return f'revenue_{method}' if method in PAYMENT_METHODS else 'revenue_other'
+
+
+_COUNTERS = (
+    ['users_total', 'users_admins']
+    + [f'challenges_{status}' for status in CHALLENGE_STATUSES]
+    + [f'payments_{status}' for status in PAYMENT_STATUSES]
+    + [f'revenue_{status}' for status in PAYMENT_STATUSES]
+    + [f'revenue_{method}' for method in PAYMENT_METHODS + ('other',)]
+)
@@ -0,0 +1,262 @@
+"""
+Order Book Service
+Resting limit, stop-loss and take-profit orders and the tick-driven matching engine
+
+Open orders live in the orders table and are mirrored in an in-memory book
+per symbol, split by trigger direction into two heaps on trigger price:
+
+- "falls" side fires when price <= trigger (buy limit, stop-loss)
+- "rises" side fires when price >= trigger (sell limit, take-profit)
+
+A tick therefore pops the orders it crosses off the top of each heap:
+O(k log n). Triggered orders are filled through the regular trade executor
+at the tick price
+"""
+
+import threading
+from heapq import heappush, heappop, heapify
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select
+from models import db, Order
+from money import to_micros, from_micros
+from services.market_data import MarketDataService
+from services.trade_executor import run_serialized, apply_order
+from services.evaluation_queue import evaluation_queue
+
+ORDER_TYPES = ('limit', 'stop_loss', 'take_profit')
+SYNC_CHUNK_SIZE = 500
+
+
+def fires_on_fall(side: str, order_type: str) -> bool:
+    """True when the order triggers as price drops to its trigger"""
+    return order_type == 'stop_loss' or (order_type == 'limit' and side == 'buy')
+
+
+class SymbolBook:
+    """
+    Open orders of one symbol as two heaps of (key, order_id)
+    Removed orders stay in their heap until they surface and are skipped
+    """
+    
+    __slots__ = ('falls', 'rises', 'removed')
+    
+    def __init__(self):
+        # Keyed on -trigger so the orders a falling price crosses surface first
+        self.falls = []
+        self.rises = []
+        self.removed = set()
+    
+    def _side(self, side: str, order_type: str, trigger: float) -> tuple[list, float]:
+        if fires_on_fall(side, order_type):
+            return self.falls, -trigger
+        return self.rises, trigger
+    
+    def add(self, order_id: int, side: str, order_type: str, trigger: float):
+        entries, key = self._side(side, order_type, trigger)
+        heappush(entries, (key, order_id))
+    
+    def remove(self, order_id: int):
+        """Drop an order in the book; the heaps are compacted once removed entries are half of them"""
+        self.removed.add(order_id)
+        if len(self.removed) * 2 > len(self.falls) + len(self.rises):
+            self.falls = [entry for entry in self.falls if entry[1] not in self.removed]
+            self.rises = [entry for entry in self.rises if entry[1] not in self.removed]
+            heapify(self.falls)
+            heapify(self.rises)
+            self.removed.clear()
+    
+    def cross(self, price: float) -> list[int]:
+        """Pop and return the ids of every order this price triggers"""
+        triggered = []
+        
+        for entries, limit in ((self.falls, -price), (self.rises, price)):
+            while entries and entries[0][0] <= limit:
+                _, order_id = heappop(entries)
+                if order_id in self.removed:
+                    self.removed.discard(order_id)
+                else:
+                    triggered.append(order_id)
+        
+        return triggered
+    
+    def __len__(self):
+        return len(self.falls) + len(self.rises) - len(self.removed)
+
+
+class OrderBook:
+    """In-memory index of open orders, kept in step with the orders table"""
+    
+    def __init__(self, app=None):
+        self.app = None
+        self._books = {}
+        self._symbols = {}  # order_id -> symbol of every order in the book
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.app = app
+        with app.app_context():
+            self.sync()
+    
+    def add(self, order: Order):
+        with self._lock:
+            if order.id in self._symbols:
+                return
+            book = self._books.setdefault(order.symbol, SymbolBook())
+            book.add(order.id, order.side, order.order_type, float(order.trigger_price))
+            self._symbols[order.id] = order.symbol
+    
+    def remove(self, order: Order) -> bool:
+        with self._lock:
+            symbol = self._symbols.pop(order.id, None)
+            if symbol is None:
+                return False
+            self._books[symbol].remove(order.id)
+            return True
+    
+    def symbols(self) -> list[str]:
+        with self._lock:
+            return [symbol for symbol, book in self._books.items() if book]
+    
+    def sync(self) -> int:
+        """
+        Load every open order missing from the book: placed by another process,
+        or committed after an order with a higher id (ids don't commit in order)
+        One index-only scan of the open ids, then the missing rows by id
+        Cancelled or filled entries left in the book are harmless: the order
+        row is re-checked before any fill
+        """
+        open_ids = db.session.execute(
+            select(Order.id).where(Order.status == 'open')
+        ).scalars().all()
+        
+        with self._lock:
+            missing = [order_id for order_id in open_ids if order_id not in self._symbols]
+        
+        loaded = 0
+        for start in range(0, len(missing), SYNC_CHUNK_SIZE):
+            orders = Order.query.filter(
+                Order.id.in_(missing[start:start + SYNC_CHUNK_SIZE]),
+                Order.status == 'open'
+            ).all()
+            for order in orders:
+                self.add(order)
+            loaded += len(orders)
+        
+        return loaded
+    
+    def on_tick(self, symbol: str, price) -> dict:
+        """Fill every open order on `symbol` that `price` crosses"""
+        with self._lock:
+            book = self._books.get(symbol)
+            triggered = book.cross(float(price)) if book else []
+            for order_id in triggered:
+                del self._symbols[order_id]
+        
+        result = {'triggered': len(triggered), 'filled': 0, 'rejected': 0}
+        
+        for order_id in triggered:
+            outcome = self._fill(order_id, to_micros(price))
+            if outcome in result:
+                result[outcome] += 1
+        
+        if result['filled']:
+            evaluation_queue.notify()
+        
+        return result
+    
+    def match(self) -> dict:
+        """Poll quotes for every symbol with open orders and run the ticks"""
+        self.sync()
+        
+        symbols = self.symbols()
+        if not symbols:
+            return {'symbols': 0, 'triggered': 0, 'filled': 0, 'rejected': 0}
+        
+        totals = {'symbols': len(symbols), 'triggered': 0, 'filled': 0, 'rejected': 0}
+        
+        for symbol, quote in MarketDataService.get_prices(symbols).items():
+            if not quote or not quote.get('price'):
+                continue
+            for key, value in self.on_tick(symbol, quote['price']).items():
+                totals[key] += value
+        
+        return totals
+    
+    def _fill(self, order_id: int, price: int) -> str:
+        """Execute one triggered order at `price` (micro-units). Returns 'filled', 'rejected' or 'skipped'"""
+        order = db.session.get(Order, order_id, populate_existing=True)
+        if order is None or order.status != 'open':
+            return 'skipped'
+        
+        def work(challenge):
+            fill = apply_order(challenge, order.symbol, order.side, to_micros(order.quantity), price)
+            if 'error' in fill:
+                return fill
+            
+            # Conditional on still being open, so a concurrent cancel wins cleanly
+            claimed = Order.query.filter_by(id=order_id, status='open').update({
+                'status': 'filled',
+                'fill_price': from_micros(price),
+                'trade_id': fill['trade']['id'],
+                'filled_at': datetime.utcnow()
+            }, synchronize_session=False)
+            if not claimed:
+                return {'error': 'Order is no longer open', 'skipped': True}
+            return fill
+        
+        result = run_serialized(order.challenge_id, work)
+        
+        if 'error' not in result:
+            return 'filled'
+        if result.get('skipped'):
+            return 'skipped'
+        
+        if result.get('retryable'):
+            # Leave it open and back in the book for the next tick
+            self.add(db.session.get(Order, order_id))
+            return 'skipped'
+        
+        order = db.session.get(Order, order_id, populate_existing=True)
+        if order is not None and order.status == 'open':
+            order.status = 'rejected'
+            order.reject_reason = result['error'][:255]
+            db.session.commit()
+        return 'rejected'
+
+
+def place_order(challenge, symbol: str, side: str, order_type: str, quantity: Decimal, trigger_price: Decimal) -> Order:
+    """Store a new open order and add it to the book"""
+    order = Order(
+        challenge_id=challenge.id,
+        symbol=symbol,
+        side=side,
+        order_type=order_type,
+        quantity=quantity,
+        trigger_price=trigger_price,
+        status='open'
+    )
+    db.session.add(order)
+    db.session.commit()
+    
+    order_book.add(order)
+    return order
+
+
+def cancel_order(order: Order) -> bool:
+    """
+    Cancel an open order and drop it from the book
+    Returns False if it was filled (or cancelled) first
+    """
+    cancelled = Order.query.filter_by(id=order.id, status='open').update(
+        {'status': 'cancelled'}, synchronize_session=False
+    )
+    db.session.commit()
+    
+    order_book.remove(order)
+    return bool(cancelled)
+
+
+order_book = OrderBook()
@@ -0,0 +1,98 @@
+"""
+Pagination Helpers
+Keyset (cursor) pagination for list endpoints
+
+Pages are ordered by (sort column, id) descending and the cursor carries the
+last row's pair, so each page is an index range scan that starts where the
+previous one stopped, however deep the client pages
+"""
+
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values) -> str:
+    """Opaque, URL-safe token for a row's sort key"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> list:
+    """Inverse of encode_cursor. Raises ValueError on a malformed token"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_size(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Clamp a ?limit= argument. Raises ValueError if it isn't a positive integer"""
+    if value in (None, ''):
+        return default
+    
+    size = int(value)
+    if size <= 0:
+        raise ValueError('Limit must be a positive integer')
+    return min(size, MAX_PAGE_SIZE)
+
+
+def date_range(query, column, start: str = None, end: str = None):
+    """
+    Filter `column` to the ISO dates or datetimes start..end (inclusive)
+    A date-only end covers that whole day. Raises ValueError on a malformed value
+    """
+    if start:
+        query = query.filter(column >= datetime.fromisoformat(start))
+    if end:
+        try:
+            day = date.fromisoformat(end)
+        except ValueError:
+            query = query.filter(column <= datetime.fromisoformat(end))
+        else:
+            query = query.filter(column < datetime.combine(day, time()) + timedelta(days=1))
+    return query
+
+
+def keyset_paginate(query, sort_column, id_column, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE) -> tuple[list, str]:
+    """
+    Fetch one page of `query`, newest first
+    Returns (rows, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 2:
+            raise ValueError('Invalid cursor')
+        
+        last_sort, last_id = values
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise ValueError('Invalid cursor')
+        if sort_column.type.python_type is datetime:
+            if not isinstance(last_sort, str):
+                raise ValueError('Invalid cursor')
+            last_sort = datetime.fromisoformat(last_sort)
+        elif not isinstance(last_sort, (int, float, str)) or isinstance(last_sort, bool):
+            raise ValueError('Invalid cursor')
+        
+        query = query.filter(or_(
+            sort_column < last_sort,
+            and_(sort_column == last_sort, id_column < last_id)
+        ))
+    
+    rows = query.order_by(sort_column.desc(), id_column.desc()).limit(limit + 1).all()
+    
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
@@ -0,0 +1,143 @@
+"""
+Period Leaderboard Service
+Daily, weekly (ISO) and monthly leaderboards of passed challenges, by plan
+
+A challenge is written into the three buckets of the period it closed in,
+in the transaction that passes it. Challenges only ever close "now", so a
+bucket whose period has ended never changes again: its top N is an index
+range scan that responses can mark immutable. Rows carry the display name
+the user had when the challenge passed, so later renames leave them alone
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import select, insert
+from models import db, Challenge, PeriodRanking, User
+
+PERIODS = ('day', 'week', 'month')
+
+PCT_PLACES = Decimal('0.0001')
+
+
+def period_key(period: str, moment: datetime) -> str:
+    """Bucket key of a timestamp: 2026-10-19, 2026-W42 or 2026-10"""
+    if period == 'day':
+        return moment.strftime('%Y-%m-%d')
+    if period == 'week':
+        year, week, _ = moment.isocalendar()
+        return f'{year}-W{week:02d}'
+    return moment.strftime('%Y-%m')
+
+
+def parse_period_key(period: str, key: str):
+    """Validate a bucket key; returns None when malformed"""
+    formats = {'day': ('%Y-%m-%d', key), 'week': ('%G-W%V-%u', f'{key}-1'), 'month': ('%Y-%m', key)}
+    pattern, value = formats[period]
+    try:
+        parsed = datetime.strptime(value, pattern)
+    except ValueError:
+        return None
+    # Round-trip so keys are canonical (2026-W7 -> 2026-W07 would miss the index)
+    return key if period_key(period, parsed) == key else None
+
+
+def is_closed(period: str, key: str, now: datetime = None) -> bool:
+    """True once the period has ended (keys sort chronologically)"""
+    return key < period_key(period, now or datetime.utcnow())
+
+
+def display_name(username: str, email: str) -> str:
+    """Name shown on leaderboards: the username, else the email's local part"""
+    return username or email.split('@')[0]
+
+
+def record_passed(challenge_ids: list[int]) -> int:
+    """
+    Add passed challenges to their day, week and month buckets (caller commits)
+    One read and one bulk insert for any number of challenges
+    """
+    if not challenge_ids:
+        return 0
+    
+    db.session.flush()
+    rows = db.session.execute(
+        select(
+            Challenge.id, Challenge.plan_id, Challenge.user_id,
+            Challenge.initial_balance, Challenge.equity, Challenge.end_date,
+            User.username, User.email
+        ).join(
+            User, User.id == Challenge.user_id
+        ).where(
+            Challenge.id.in_(challenge_ids),
+            Challenge.status == 'passed',
+            Challenge.end_date.isnot(None)
+        )
+    ).all()
+    
+    values = []
+    for challenge_id, plan_id, user_id, initial_balance, equity, end_date, username, email in rows:
+        initial = Decimal(str(initial_balance))
+        profit_pct = ((Decimal(str(equity)) - initial) / initial * 100).quantize(PCT_PLACES)
+        for period in PERIODS:
+            values.append({
+                'period': period,
+                'period_key': period_key(period, end_date),
+                'plan_id': plan_id,
+                'challenge_id': challenge_id,
+                'user_id': user_id,
+                'username': display_name(username, email),
+                'initial_balance': initial_balance,
+                'equity': equity,
+                'profit_pct': profit_pct,
+                'closed_at': end_date
+            })
+    
+    if values:
+        db.session.execute(insert(PeriodRanking), values)
+    return len(rows)
+
+
+def top_ranked(period: str, key: str, plan_id: int = None, limit: int = 10) -> list:
+    """Top of one bucket, best profit first (index range scan)"""
+    query = PeriodRanking.query.filter_by(period=period, period_key=key)
+    if plan_id is not None:
+        query = query.filter_by(plan_id=plan_id)
+    return query.order_by(PeriodRanking.profit_pct.desc()).limit(limit).all()
+
+
+def backfill_period_rankings() -> int:
+    """
+    One-off backfills: the first start after the period_rankings table was
+    added, and names of rows recorded before display names were stored
+    """
+    _backfill_usernames()
+    if PeriodRanking.query.first() is not None:
+        return 0
+    
+    passed = [row.id for row in db.session.query(Challenge.id).filter(
+        Challenge.status == 'passed', Challenge.end_date.isnot(None)
+    )]
+    if not passed:
+        return 0
+    
+    count = 0
+    for start in range(0, len(passed), 500):
+        count += record_passed(passed[start:start + 500])
+    db.session.commit()
+    return count
+
+
+def _backfill_usernames():
+    """Current display name of rows without one (once per older database)"""
+    users = db.session.execute(
+        select(User.id, User.username, User.email).where(
+            User.id.in_(select(PeriodRanking.user_id).where(PeriodRanking.username.is_(None)))
+        )
+    ).all()
+    
+    for user_id, username, email in users:
+        PeriodRanking.query.filter_by(user_id=user_id, username=None).update(
+            {'username': display_name(username, email)}, synchronize_session=False
+        )
+    if users:
+        db.session.commit()
@@ -0,0 +1,83 @@
+"""
+Platform Stats Service
+Challenge counts and total passed profit from one grouped aggregate query,
+held in a small rollup cache
+
+The rollup is dropped whenever a challenge changes status (checkout, pass,
+fail) and otherwise lives PLATFORM_STATS_TTL seconds, so the public stats
+endpoint costs one constant-size query per refresh whatever the history size
+"""
+
+import threading
+import time
+from sqlalchemy import func
+from models import db, Challenge
+
+STATUSES = ('active', 'passed', 'failed')
+
+
+class PlatformStats:
+    """Cached platform-wide rollup"""
+    
+    def __init__(self, app=None):
+        self.ttl = 15
+        self._rollup = None
+        self._computed_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('PLATFORM_STATS_TTL', 15)
+    
+    def get(self) -> dict:
+        rollup = self._rollup
+        if rollup is not None and time.monotonic() - self._computed_at < self.ttl:
+            return rollup
+        
+        # One refresh at a time; waiting callers reuse its result
+        with self._lock:
+            rollup = self._rollup
+            if rollup is None or time.monotonic() - self._computed_at >= self.ttl:
+                generation = self._generation
+                rollup = compute_rollup()
+                # Only keep it if no status changed while it was computed
+                if generation == self._generation:
+                    self._rollup = rollup
+                    self._computed_at = time.monotonic()
+            return rollup
+    
+    def invalidate(self):
+        self._generation += 1
+        self._rollup = None
+
+
+platform_stats = PlatformStats()
+
+
+def compute_rollup() -> dict:
+    """COUNT and SUM(profit) per status in one GROUP BY"""
+    rows = db.session.query(
+        Challenge.status,
+        func.count(Challenge.id),
+        func.sum(Challenge.equity - Challenge.initial_balance)
+    ).group_by(Challenge.status).all()
+    
+    counts = {status: 0 for status in STATUSES}
+    profits = {}
+    for status, count, profit in rows:
+        counts[status] = count
+        profits[status] = float(profit or 0)
+    
+    passed, failed = counts['passed'], counts['failed']
+    completed = passed + failed
+    
+    return {
+        'total_challenges': sum(count for _, count, _ in rows),
+        'active_challenges': counts['active'],
+        'passed_challenges': passed,
+        'failed_challenges': failed,
+        'pass_rate': round(passed / completed * 100, 1) if completed > 0 else 0,
+        'total_profit': round(profits.get('passed', 0.0), 2)
+    }
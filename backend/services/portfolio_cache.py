@@ -0,0 +1,239 @@
+"""
+Portfolio Cache Service
+Write-through, in-memory copy of each active challenge's portfolio state:
+balance, positions, daily start equity and plan thresholds
+
+Entries are tagged with the Challenge.version they were built from. Every
+write to a challenge row bumps that version, so a caller holding a freshly
+loaded challenge only gets the cached state if nothing (in any process)
+changed it since, and a rebuild from the database otherwise. Fills in this
+process write their changes through after commit, keeping the entry valid.
+Admin plan changes invalidate directly; PORTFOLIO_CACHE_TTL bounds how long
+marks or thresholds changed by another process can go unseen
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from models import db, Position
+from money import to_micros, from_micros, mul, to_cents
+
+STAGED_KEY = 'portfolio_changes'
+
+
+class PortfolioState:
+    """
+    Immutable snapshot of one challenge's portfolio (replaced, never mutated)
+    Amounts, prices, quantities and thresholds are integer micro-units
+    """
+    
+    __slots__ = (
+        'challenge_id', 'plan_id', 'version', 'status', 'balance', 'initial_balance',
+        'daily_start_equity', 'positions', 'thresholds', 'loaded_at'
+    )
+    
+    def __init__(self, challenge_id, plan_id, version, status, balance, initial_balance,
+                 daily_start_equity, positions, thresholds, loaded_at):
+        self.challenge_id = challenge_id
+        self.plan_id = plan_id
+        self.version = version
+        self.status = status
+        self.balance = balance
+        self.initial_balance = initial_balance
+        self.daily_start_equity = daily_start_equity
+        self.positions = positions  # symbol -> (quantity, avg_entry_price, current_price)
+        self.thresholds = thresholds
+        self.loaded_at = loaded_at
+    
+    def replace(self, **fields) -> 'PortfolioState':
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(fields)
+        return PortfolioState(**values)
+    
+    def market_value(self) -> int:
+        return sum(
+            mul(quantity, current_price or avg_price) for quantity, avg_price, current_price in self.positions.values()
+        )
+    
+    def equity(self) -> int:
+        """Cash balance plus market value of open positions"""
+        return self.balance + self.market_value()
+    
+    def check_order(self, symbol: str, side: str, quantity: int, price: int) -> Optional[str]:
+        """
+        Pre-trade check against the cached state, without touching the database
+        The fill re-checks on the locked challenge row, so this only rejects early
+        """
+        if side == 'buy':
+            if to_cents(mul(price, quantity)) > self.balance:
+                return 'Insufficient balance for this trade'
+            return None
+        
+        held = self.positions.get(symbol)
+        if not held:
+            return f'No open position for {symbol}'
+        if quantity > held[0]:
+            return f'Cannot sell more than position size ({from_micros(held[0])})'
+        return None
+
+
+class PortfolioCache:
+    """Bounded LRU of PortfolioState keyed by challenge id"""
+    
+    def __init__(self, app=None):
+        self.ttl = 30
+        self.max_entries = 10000
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.ttl = app.config.get('PORTFOLIO_CACHE_TTL', 30)
+        self.max_entries = app.config.get('PORTFOLIO_CACHE_MAX_ENTRIES', 10000)
+    
+    def get(self, challenge) -> PortfolioState:
+        """State for a challenge row just read from the database (cached if still current)"""
+        now = time.monotonic()
+        
+        with self._lock:
+            state = self._entries.get(challenge.id)
+            if state is not None and state.version == challenge.version and now - state.loaded_at < self.ttl:
+                self._entries.move_to_end(challenge.id)
+                return state
+        
+        state = self._load(challenge, now)
+        
+        if state.status == 'active':
+            self._store(state)
+        else:
+            self.invalidate(challenge.id)
+        return state
+    
+    def write_through(self, challenge_id: int, from_version: int, to_version: int, balance: int, changes: dict):
+        """
+        Apply a committed fill to the cached entry
+        changes maps symbol -> (quantity, avg_entry_price, current_price), or None when closed
+        An entry that wasn't built from from_version missed a write and is dropped
+        """
+        with self._lock:
+            state = self._entries.get(challenge_id)
+            if state is None:
+                return
+            if state.version != from_version:
+                del self._entries[challenge_id]
+                return
+            
+            positions = dict(state.positions)
+            for symbol, held in changes.items():
+                if held is None:
+                    positions.pop(symbol, None)
+                else:
+                    positions[symbol] = held
+            
+            self._entries[challenge_id] = state.replace(
+                version=to_version,
+                balance=balance,
+                positions=positions
+            )
+    
+    def advance(self, challenge_id: int, from_version: int, to_version: int):
+        """
+        Re-tag an entry after a commit that changed none of the cached fields
+        (e.g. running statistics), so it stays a cache hit
+        """
+        with self._lock:
+            state = self._entries.get(challenge_id)
+            if state is not None and state.version == from_version:
+                self._entries[challenge_id] = state.replace(version=to_version)
+    
+    def update_marks(self, prices: dict):
+        """Refresh current prices of cached positions (symbol -> price)"""
+        with self._lock:
+            for challenge_id, state in list(self._entries.items()):
+                if not any(symbol in prices for symbol in state.positions):
+                    continue
+                self._entries[challenge_id] = state.replace(positions={
+                    symbol: (quantity, avg_price, to_micros(prices[symbol]) if symbol in prices else current_price)
+                    for symbol, (quantity, avg_price, current_price) in state.positions.items()
+                })
+    
+    def invalidate(self, challenge_id: int):
+        with self._lock:
+            self._entries.pop(challenge_id, None)
+    
+    def invalidate_plan(self, plan_id: int):
+        """Drop every challenge on a plan whose thresholds changed"""
+        with self._lock:
+            for challenge_id in [cid for cid, state in self._entries.items() if state.plan_id == plan_id]:
+                del self._entries[challenge_id]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def _store(self, state: PortfolioState):
+        with self._lock:
+            self._entries[state.challenge_id] = state
+            self._entries.move_to_end(state.challenge_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def _load(self, challenge, now: float) -> PortfolioState:
+        rows = db.session.query(
+            Position.symbol, Position.quantity, Position.avg_entry_price, Position.current_price
+        ).filter(Position.challenge_id == challenge.id).all()
+        
+        plan = challenge.plan
+        thresholds = {
+            'max_daily_loss_pct': to_micros(plan.max_daily_loss_pct),
+            'max_total_loss_pct': to_micros(plan.max_total_loss_pct),
+            'profit_target_pct': to_micros(plan.profit_target_pct),
+            'max_trailing_drawdown_pct': (
+                to_micros(plan.max_trailing_drawdown_pct) if plan.max_trailing_drawdown_pct is not None else None
+            )
+        }
+        
+        return PortfolioState(
+            challenge_id=challenge.id,
+            plan_id=challenge.plan_id,
+            version=challenge.version,
+            status=challenge.status,
+            balance=to_micros(challenge.current_balance),
+            initial_balance=to_micros(challenge.initial_balance),
+            daily_start_equity=to_micros(challenge.daily_start_equity),
+            positions={
+                symbol: (
+                    to_micros(quantity),
+                    to_micros(avg_price),
+                    to_micros(current_price) if current_price is not None else None
+                )
+                for symbol, quantity, avg_price, current_price in rows
+            },
+            thresholds=thresholds,
+            loaded_at=now
+        )
+
+
+portfolio_cache = PortfolioCache()
+
+
+def stage_position(symbol: str, position):
+    """
+    Record a position change made in the current transaction, for write-through
+    once it commits; pass None for a closed position
+    """
+    held = None
+    if position is not None:
+        held = (
+            to_micros(position.quantity),
+            to_micros(position.avg_entry_price),
+            to_micros(position.current_price) if position.current_price is not None else None
+        )
+    db.session.info.setdefault(STAGED_KEY, {})[symbol] = held
+
+
+def take_staged() -> dict:
+    """Pop the position changes staged in the current transaction"""
+    return db.session.info.pop(STAGED_KEY, None) or {}
@@ -0,0 +1,211 @@
+"""
+Rank Index Service
+In-process order-statistic index over the active challenges, ranked by profit_pct
+
+A Fenwick tree counts challenges per profit bucket (0.01% wide), so the
+number of challenges ahead of any bucket is an O(log B) prefix sum and the
+k-th ranked challenge an O(log B) descent. Each bucket keeps its few
+challenges in exact (profit, id) order. Rank-of, neighbors-around and top-N
+never touch the database
+
+Kept in step by the leaderboard writes in this process, staged in the
+session and applied once their transaction commits (dropped on rollback,
+so failed fills leave no phantom ranks); a full reload from
+leaderboard_entries after batch jobs, and at most every RANK_INDEX_MAX_AGE
+seconds, picks up changes made by other processes
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+from sqlalchemy import event
+from models import db, LeaderboardEntry
+
+STAGED_KEY = 'rank_index_updates'
+
+MIN_PCT = -100
+MAX_PCT = 1000
+BUCKETS_PER_PCT = 100
+BUCKETS = (MAX_PCT - MIN_PCT) * BUCKETS_PER_PCT + 1
+
+
+def _slot(profit_pct: float) -> int:
+    """Bucket of a profit percentage; out-of-range values share the end buckets"""
+    slot = round((profit_pct - MIN_PCT) * BUCKETS_PER_PCT)
+    return min(max(slot, 0), BUCKETS - 1)
+
+
+class RankIndex:
+    """Ranks active challenges by profit_pct (rank 1 = highest), ties by challenge id"""
+    
+    def __init__(self, app=None):
+        self.max_age = 60
+        self._lock = threading.Lock()
+        self._reset()
+        if app is not None:
+            self.init_app(app)
+    
+    def init_app(self, app):
+        self.max_age = app.config.get('RANK_INDEX_MAX_AGE', 60)
+        with app.app_context():
+            self.load()
+    
+    def _reset(self):
+        self._tree = [0] * (BUCKETS + 1)  # Fenwick tree, position 1 = highest bucket
+        self._buckets = {}  # slot -> sorted [(-profit_pct, challenge_id)]
+        self._entries = {}  # challenge_id -> (profit_pct, user_id)
+        self._by_user = {}  # user_id -> challenge_id
+        self.loaded_at = 0.0
+    
+    def load(self) -> int:
+        """Rebuild from the active rows of leaderboard_entries (one query, linear build)"""
+        rows = LeaderboardEntry.query.with_entities(
+            LeaderboardEntry.challenge_id, LeaderboardEntry.user_id, LeaderboardEntry.profit_pct
+        ).filter(LeaderboardEntry.status == 'active').all()
+        
+        counts = [0] * (BUCKETS + 1)
+        buckets = {}
+        entries = {}
+        by_user = {}
+        for challenge_id, user_id, profit_pct in rows:
+            profit_pct = float(profit_pct)
+            slot = _slot(profit_pct)
+            counts[BUCKETS - slot] += 1
+            buckets.setdefault(slot, []).append((-profit_pct, challenge_id))
+            entries[challenge_id] = (profit_pct, user_id)
+            by_user[user_id] = challenge_id
+        
+        for bucket in buckets.values():
+            bucket.sort()
+        
+        # Linear Fenwick construction: push each node's total to its parent
+        for position in range(1, BUCKETS + 1):
+            parent = position + (position & -position)
+            if parent <= BUCKETS:
+                counts[parent] += counts[position]
+        
+        with self._lock:
+            self._tree, self._buckets, self._entries, self._by_user = counts, buckets, entries, by_user
+            self.loaded_at = time.monotonic()
+        return len(entries)
+    
+    def refresh_if_stale(self):
+        if time.monotonic() - self.loaded_at >= self.max_age:
+            self.load()
+    
+    def update(self, challenge_id: int, user_id: int, status: str, profit_pct):
+        """Insert, move or (for a non-active status) drop one challenge: O(log B)"""
+        with self._lock:
+            self._remove(challenge_id)
+            if status != 'active':
+                return
+            
+            profit_pct = float(profit_pct)
+            slot = _slot(profit_pct)
+            insort(self._buckets.setdefault(slot, []), (-profit_pct, challenge_id))
+            self._add(BUCKETS - slot, 1)
+            self._entries[challenge_id] = (profit_pct, user_id)
+            self._by_user[user_id] = challenge_id
+    
+    def stage(self, challenge_id: int, user_id: int, status: str, profit_pct):
+        """Queue an update made in the current transaction; applied after it commits"""
+        db.session.info.setdefault(STAGED_KEY, {})[challenge_id] = (user_id, status, profit_pct)
+    
+    def remove(self, challenge_id: int):
+        with self._lock:
+            self._remove(challenge_id)
+    
+    def challenge_of(self, user_id: int):
+        return self._by_user.get(user_id)
+    
+    def total(self) -> int:
+        return len(self._entries)
+    
+    def rank_of(self, challenge_id: int):
+        """1-based rank of an active challenge, or None"""
+        with self._lock:
+            return self._rank(challenge_id)
+    
+    def around(self, challenge_id: int, count: int) -> list[dict]:
+        """The challenge with up to `count` neighbors ranked above and below it"""
+        with self._lock:
+            rank = self._rank(challenge_id)
+            if rank is None:
+                return []
+            first = max(1, rank - count)
+            last = min(len(self._entries), rank + count)
+            return [self._row(r) for r in range(first, last + 1)]
+    
+    def top(self, n: int) -> list[dict]:
+        with self._lock:
+            return [self._row(r) for r in range(1, min(n, len(self._entries)) + 1)]
+    
+    def _remove(self, challenge_id: int):
+        held = self._entries.pop(challenge_id, None)
+        if held is None:
+            return
+        profit_pct, user_id = held
+        if self._by_user.get(user_id) == challenge_id:
+            del self._by_user[user_id]
+        
+        slot = _slot(profit_pct)
+        bucket = self._buckets[slot]
+        del bucket[bisect_left(bucket, (-profit_pct, challenge_id))]
+        if not bucket:
+            del self._buckets[slot]
+        self._add(BUCKETS - slot, -1)
+    
+    def _rank(self, challenge_id: int):
+        held = self._entries.get(challenge_id)
+        if held is None:
+            return None
+        profit_pct = held[0]
+        slot = _slot(profit_pct)
+        ahead = self._prefix(BUCKETS - slot - 1)
+        return ahead + bisect_left(self._buckets[slot], (-profit_pct, challenge_id)) + 1
+    
+    def _row(self, rank: int) -> dict:
+        """The challenge at a 1-based rank: Fenwick descent to its bucket, then offset"""
+        position = 0
+        remaining = rank
+        step = 1 << BUCKETS.bit_length()
+        while step:
+            following = position + step
+            if following <= BUCKETS and self._tree[following] < remaining:
+                position = following
+                remaining -= self._tree[following]
+            step >>= 1
+        
+        negative_pct, challenge_id = self._buckets[BUCKETS - (position + 1)][remaining - 1]
+        return {
+            'rank': rank,
+            'challenge_id': challenge_id,
+            'user_id': self._entries[challenge_id][1],
+            'profit_pct': -negative_pct
+        }
+    
+    def _add(self, position: int, delta: int):
+        while position <= BUCKETS:
+            self._tree[position] += delta
+            position += position & -position
+    
+    def _prefix(self, position: int) -> int:
+        total = 0
+        while position > 0:
+            total += self._tree[position]
+            position -= position & -position
+        return total
+
+
+rank_index = RankIndex()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_staged(session):
+    for challenge_id, (user_id, status, profit_pct) in (session.info.pop(STAGED_KEY, None) or {}).items():
+        rank_index.update(challenge_id, user_id, status, profit_pct)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_staged(session):
+    session.info.pop(STAGED_KEY, None)
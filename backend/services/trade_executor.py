@@ -0,0 +1,261 @@
+"""
+Trade Executor Service
+Applies market fills to a challenge, safely under concurrency
+
+- Orders for the same challenge are serialized in-process by a striped lock
+- Across processes, the challenge row is locked (SELECT ... FOR UPDATE where
+  supported) and version-checked on write (Challenge.version), so two fills
+  can never both spend the same balance
+- Version conflicts, lock timeouts, deadlocks and serialization failures are
+  retried a bounded number of times on fresh state; other database errors
+  propagate
+- Committed fills are written through to the portfolio cache
+"""
+
+import random
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from models import db, Trade, Position, Challenge
+from money import from_micros, to_micros, round_micros, round_cents
+from services.ledger import record_fill
+from services.evaluation_queue import evaluation_queue
+from services.portfolio_cache import portfolio_cache, stage_position, take_staged
+from services.trading_stats import record_close
+
+LOCK_STRIPES = 256
+_challenge_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+# Serialization failure, deadlock, lock not available (PostgreSQL SQLSTATEs)
+RETRYABLE_SQLSTATES = {'40001', '40P01', '55P03'}
+# SQLite busy database, MySQL deadlock and lock wait timeout
+RETRYABLE_MESSAGES = ('database is locked', 'deadlock', 'lock wait timeout')
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed fill may succeed when re-run on fresh state"""
+    if isinstance(error, StaleDataError):
+        return True
+    if not isinstance(error, OperationalError):
+        return False
+    
+    sqlstate = getattr(error.orig, 'pgcode', None) or getattr(error.orig, 'sqlstate', None)
+    if sqlstate in RETRYABLE_SQLSTATES:
+        return True
+    message = str(error.orig).lower()
+    return any(text in message for text in RETRYABLE_MESSAGES)
+
+
+def challenge_lock(challenge_id: int) -> threading.Lock:
+    """In-process lock serializing all orders of one challenge"""
+    return _challenge_locks[challenge_id % LOCK_STRIPES]
+
+
+def execute_order(challenge_id: int, symbol: str, side: str, quantity: int, price: int) -> dict:
+    """
+    Execute a market order at `price` and commit it (quantity and price in micro-units)
+    Returns the fill ({'trade', 'position', ...}) or {'error': ...}
+    Rule evaluation is enqueued in the same transaction; call
+    evaluation_queue.notify() once the response no longer depends on it
+    """
+    return run_serialized(challenge_id, lambda challenge: apply_order(challenge, symbol, side, quantity, price))
+
+
+def execute_orders(challenge_id: int, orders: list[tuple]) -> dict:
+    """
+    Execute several market orders in one transaction
+    orders: [(symbol, side, quantity, price), ...], applied in sequence so each
+    order sees the cumulative balance and positions of the ones before it
+    All fills commit together, or none do: returns {'fills': [...]} or
+    {'error': ..., 'failed_index': i}
+    """
+    def work(challenge):
+        fills = []
+        for index, (symbol, side, quantity, price) in enumerate(orders):
+            result = apply_order(challenge, symbol, side, quantity, price)
+            if 'error' in result:
+                return {'error': result['error'], 'failed_index': index}
+            fills.append(result)
+        return {'fills': fills}
+    
+    return run_serialized(challenge_id, work)
+
+
+def run_serialized(challenge_id: int, work) -> dict:
+    """
+    Run `work(challenge)` on a freshly locked active challenge and commit
+    `work` must not commit; returning a dict with 'error' rolls back
+    """
+    max_retries = current_app.config.get('ORDER_MAX_RETRIES', 3)
+    backoff = current_app.config.get('ORDER_RETRY_BACKOFF', 0.02)
+    
+    with challenge_lock(challenge_id):
+        for attempt in range(max_retries + 1):
+            try:
+                challenge = db.session.get(
+                    Challenge, challenge_id,
+                    with_for_update=True,
+                    populate_existing=True
+                )
+                
+                if not challenge or challenge.status != 'active':
+                    db.session.rollback()
+                    return {'error': 'No active challenge. Please start a challenge first.'}
+                
+                from_version = challenge.version
+                take_staged()
+                
+                result = work(challenge)
+                
+                if 'error' in result:
+                    db.session.rollback()
+                    take_staged()
+                    return result
+                
+                evaluation_queue.enqueue(challenge.id)
+                db.session.flush()
+                to_version, balance = challenge.version, to_micros(challenge.current_balance)
+                db.session.commit()
+                
+                # Write-through: the cached portfolio now matches the committed rows
+                portfolio_cache.write_through(challenge_id, from_version, to_version, balance, take_staged())
+                return result
+            
+            except (StaleDataError, OperationalError) as e:
+                db.session.rollback()
+                take_staged()
+                if not is_retryable(e):
+                    raise
+                if attempt == max_retries:
+                    current_app.logger.warning(f"Order for challenge {challenge_id} failed after {attempt + 1} attempts: {e}")
+                    return {'error': 'Order conflicted with concurrent activity, please retry', 'retryable': True}
+                time.sleep(backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def apply_order(challenge, symbol: str, side: str, quantity: int, price: int) -> dict:
+    """
+    Apply one fill to a locked challenge without committing (quantity and price in micro-units)
+    The rows are updated in Decimal, rounded as the micro-unit portfolio cache rounds
+    """
+    quantity, price = from_micros(quantity), from_micros(price)
+    if side == 'buy':
+        return _execute_buy(challenge, symbol, quantity, price)
+    return _execute_sell(challenge, symbol, quantity, price)
+
+
+def _execute_buy(challenge, symbol, quantity, price):
+    """Execute a buy order"""
+    trade_value = round_cents(round_micros(price * quantity))
+    balance = challenge.current_balance
+    
+    # Check balance on the locked row, not on a value read earlier in the request
+    if trade_value > balance:
+        return {'error': 'Insufficient balance for this trade'}
+    
+    # Deduct from balance
+    challenge.current_balance = balance - trade_value
+    
+    # Create trade record
+    trade = Trade(
+        challenge_id=challenge.id,
+        symbol=symbol,
+        side='buy',
+        quantity=quantity,
+        entry_price=price,
+        status='open'
+    )
+    db.session.add(trade)
+    record_fill(challenge, trade, 'buy', quantity, price, cash_delta=-trade_value)
+    
+    # Update or create position
+    position = Position.query.filter_by(challenge_id=challenge.id, symbol=symbol).first()
+    
+    if position:
+        # Average down/up
+        held = position.quantity
+        total_quantity = held + quantity
+        total_cost = round_micros(position.avg_entry_price * held) + round_micros(price * quantity)
+        position.avg_entry_price = round_micros(total_cost / total_quantity)
+        position.quantity = total_quantity
+        position.current_price = price
+    else:
+        position = Position(
+            challenge_id=challenge.id,
+            symbol=symbol,
+            quantity=quantity,
+            avg_entry_price=price,
+            current_price=price
+        )
+        db.session.add(position)
+    
+    stage_position(symbol, position)
+    
+    # Flush so version conflicts and duplicate positions surface here (and are retried)
+    db.session.flush()
+    
+    return {
+        'trade': trade.to_dict(),
+        'position': position.to_dict()
+    }
+
+
+def _execute_sell(challenge, symbol, quantity, price):
+    """Execute a sell order (close position)"""
+    # Find existing position
+    position = Position.query.filter_by(challenge_id=challenge.id, symbol=symbol).first()
+    
+    if not position:
+        return {'error': f'No open position for {symbol}'}
+    
+    held = position.quantity
+    if quantity > held:
+        return {'error': f'Cannot sell more than position size ({position.quantity})'}
+    
+    # Calculate P&L
+    entry_price = position.avg_entry_price
+    pnl = round_cents(round_micros((price - entry_price) * quantity))
+    
+    # Create trade record
+    trade = Trade(
+        challenge_id=challenge.id,
+        symbol=symbol,
+        side='sell',
+        quantity=quantity,
+        entry_price=entry_price,
+        exit_price=price,
+        pnl=pnl,
+        status='closed',
+        closed_at=datetime.utcnow()
+    )
+    db.session.add(trade)
+    
+    # Add proceeds to balance
+    sale_proceeds = round_cents(round_micros(price * quantity))
+    challenge.current_balance = challenge.current_balance + sale_proceeds
+    
+    record_fill(challenge, trade, 'sell', quantity, price, cash_delta=sale_proceeds)
+    record_close(challenge.id, symbol, quantity, pnl)
+    
+    # Update position
+    remaining = held - quantity
+    
+    if remaining <= 0:
+        db.session.delete(position)
+        position_dict = None
+        stage_position(symbol, None)
+    else:
+        position.quantity = remaining
+        position.current_price = price
+        position_dict = position.to_dict()
+        stage_position(symbol, position)
+    
+    db.session.flush()
+    
+    return {
+        'trade': trade.to_dict(),
+        'position': position_dict,
+        'realized_pnl': float(pnl)
+    }
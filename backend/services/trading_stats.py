@@ -0,0 +1,131 @@
+"""
+Trading Statistics Service
+Per-challenge, per-symbol realized statistics (win rate, average win/loss,
+profit factor, realized P&L), folded in on every sell in the fill's own
+transaction so reads never scan the trade history
+"""
+
+from decimal import Decimal
+from sqlalchemy import func, case
+from models import db, Trade, TradingStat
+
+
+def record_close(challenge_id: int, symbol: str, quantity: Decimal, pnl: Decimal) -> TradingStat:
+    """
+    Fold one closing fill into its symbol's statistics (caller commits)
+    pnl is already rounded to cents
+    """
+    stat = TradingStat.query.filter_by(challenge_id=challenge_id, symbol=symbol).first()
+    
+    if stat is None:
+        stat = TradingStat(
+            challenge_id=challenge_id,
+            symbol=symbol,
+            closed_trades=0,
+            winning_trades=0,
+            losing_trades=0,
+            gross_profit=Decimal('0'),
+            gross_loss=Decimal('0'),
+            largest_win=Decimal('0'),
+            largest_loss=Decimal('0'),
+            volume=Decimal('0')
+        )
+        db.session.add(stat)
+    
+    stat.closed_trades += 1
+    stat.volume += quantity
+    
+    if pnl > 0:
+        stat.winning_trades += 1
+        stat.gross_profit += pnl
+        stat.largest_win = max(stat.largest_win, pnl)
+    elif pnl < 0:
+        stat.losing_trades += 1
+        stat.gross_loss -= pnl
+        stat.largest_loss = max(stat.largest_loss, -pnl)
+    
+    return stat
+
+
+def trading_summary(challenge_id: int) -> dict:
+    """Overall and per-symbol statistics for a challenge (one indexed read)"""
+    stats = TradingStat.query.filter_by(challenge_id=challenge_id).order_by(TradingStat.symbol).all()
+    
+    closed = sum(s.closed_trades for s in stats)
+    wins = sum(s.winning_trades for s in stats)
+    losses = sum(s.losing_trades for s in stats)
+    gross_profit = sum((Decimal(str(s.gross_profit)) for s in stats), Decimal('0'))
+    gross_loss = sum((Decimal(str(s.gross_loss)) for s in stats), Decimal('0'))
+    realized = gross_profit - gross_loss
+    
+    return {
+        'closed_trades': closed,
+        'winning_trades': wins,
+        'losing_trades': losses,
+        'win_rate': round(wins / closed * 100, 2) if closed else 0,
+        'realized_pnl': float(realized),
+        'average_win': round(float(gross_profit / wins), 2) if wins else 0,
+        'average_loss': round(float(gross_loss / losses), 2) if losses else 0,
+        'profit_factor': round(float(gross_profit / gross_loss), 2) if gross_loss else None,
+        'expectancy': round(float(realized / closed), 2) if closed else 0,
+        'largest_win': max((float(s.largest_win) for s in stats), default=0),
+        'largest_loss': max((float(s.largest_loss) for s in stats), default=0),
+        'by_symbol': [s.to_dict() for s in stats]
+    }
+
+
+def rebuild_trading_stats(challenge_ids: list[int] = None) -> int:
+    """
+    Recompute statistics from the closed trades with one grouped query
+    Used to backfill challenges traded before the table existed
+    Returns the number of (challenge, symbol) rows written
+    """
+    pnl = func.round(Trade.pnl, 2)
+    query = db.session.query(
+        Trade.challenge_id,
+        Trade.symbol,
+        func.count(Trade.id),
+        func.sum(case((pnl > 0, 1), else_=0)),
+        func.sum(case((pnl < 0, 1), else_=0)),
+        func.sum(case((pnl > 0, pnl), else_=0)),
+        func.sum(case((pnl < 0, -pnl), else_=0)),
+        func.max(case((pnl > 0, pnl), else_=0)),
+        func.max(case((pnl < 0, -pnl), else_=0)),
+        func.sum(Trade.quantity)
+    ).filter(Trade.side == 'sell').group_by(Trade.challenge_id, Trade.symbol)
+    
+    delete = TradingStat.query
+    if challenge_ids is not None:
+        query = query.filter(Trade.challenge_id.in_(challenge_ids))
+        delete = delete.filter(TradingStat.challenge_id.in_(challenge_ids))
+    
+    rows = query.all()
+    delete.delete(synchronize_session=False)
+    
+    db.session.add_all([
+        TradingStat(
+            challenge_id=challenge_id,
+            symbol=symbol,
+            closed_trades=closed,
+            winning_trades=wins or 0,
+            losing_trades=losses or 0,
+            gross_profit=gross_profit or 0,
+            gross_loss=gross_loss or 0,
+            largest_win=largest_win or 0,
+            largest_loss=largest_loss or 0,
+            volume=volume or 0
+        )
+        for challenge_id, symbol, closed, wins, losses, gross_profit, gross_loss, largest_win, largest_loss, volume in rows
+    ])
+    db.session.commit()
+    
+    return len(rows)
+
+
+def backfill_trading_stats() -> int:
+    """One-off backfill on the first start after the statistics table was added"""
+    if TradingStat.query.first() is not None:
+        return 0
+    if Trade.query.filter_by(side='sell').first() is None:
+        return 0
+    return rebuild_trading_stats()
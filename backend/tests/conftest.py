@@ -0,0 +1,28 @@
+"""
+Shared test fixtures
+Each app gets its own in-memory SQLite database (TEST_DATABASE_URL)
+"""
+
+import os
+import sys
+
+os.environ.setdefault('FLASK_ENV', 'testing')
+os.environ.setdefault('TEST_DATABASE_URL', 'sqlite://')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def make_app():
+    """Build a fresh testing app (empty database, cold in-process caches)"""
+    from app import create_app
+    from services.portfolio_cache import portfolio_cache
+    from services.auth_cache import auth_cache
+    
+    def factory():
+        portfolio_cache.clear()
+        auth_cache.clear()
+        return create_app('testing')
+    
+    return factory
@@ -0,0 +1,92 @@
+"""
+Admin authorization from signed token claims: rights changes bump
+users.auth_version, which revokes the admin claim of older tokens
+"""
+
+import pytest
+from models import db, User
+from services.auth_cache import auth_cache
+
+PASSWORD = 'secret1'
+
+
+@pytest.fixture
+def client(make_app):
+    app = make_app()
+    return app.test_client()
+
+
+def _login(client, email: str) -> dict:
+    token = client.post('/api/auth/login', json={'email': email, 'password': PASSWORD}).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _admin(client, email: str) -> dict:
+    """Register a user, make them admin in the database and log in"""
+    client.post('/api/auth/register', json={'email': email, 'password': PASSWORD})
+    with client.application.app_context():
+        User.query.filter_by(email=email).update({'is_admin': True})
+        db.session.commit()
+    return _login(client, email)
+
+
+def _user_id(client, email: str) -> int:
+    with client.application.app_context():
+        return User.query.filter_by(email=email).first().id
+
+
+def _is_admin(client, headers) -> bool:
+    status = client.get('/api/admin/plans', headers=headers).status_code
+    assert status in (200, 403)
+    return status == 200
+
+
+def test_claim_is_signed_at_login(client):
+    token = client.post('/api/auth/register', json={'email': 'late@tradesense.test', 'password': PASSWORD}).get_json()['access_token']
+    before = {'Authorization': f'Bearer {token}'}
+    after = _admin(client, 'late@tradesense.test')
+    
+    assert not _is_admin(client, before)
+    assert _is_admin(client, after)
+
+
+def test_toggle_revokes_older_tokens_at_once(client):
+    root = _admin(client, 'root@tradesense.test')
+    other = _admin(client, 'other@tradesense.test')
+    other_id = _user_id(client, 'other@tradesense.test')
+    assert _is_admin(client, other)
+    
+    assert client.post(f'/api/admin/users/{other_id}/admin', headers=root).status_code == 200  # revoke
+    assert not _is_admin(client, other)
+    
+    # Granting again does not revive the old token, only a new login
+    assert client.post(f'/api/admin/users/{other_id}/admin', headers=root).status_code == 200
+    assert not _is_admin(client, other)
+    assert _is_admin(client, _login(client, 'other@tradesense.test'))
+
+
+def test_bulk_revoke_refuses_the_token(client):
+    root = _admin(client, 'root@tradesense.test')
+    other = _admin(client, 'other@tradesense.test')
+    
+    response = client.post('/api/admin/bulk/users/admin', headers=root, json={
+        'is_admin': False, 'user_ids': [_user_id(client, 'other@tradesense.test')]
+    })
+    
+    assert response.get_json()['affected'] == 1
+    assert not _is_admin(client, other)
+    assert _is_admin(client, root)
+
+
+def test_change_by_another_process_is_seen_after_the_ttl(client):
+    root = _admin(client, 'root@tradesense.test')
+    assert _is_admin(client, root)
+    
+    # Another process bumps the version without touching this process's cache
+    with client.application.app_context():
+        User.query.filter_by(email='root@tradesense.test').update({'auth_version': User.auth_version + 1})
+        db.session.commit()
+    assert _is_admin(client, root)  # cached version, for at most AUTH_CACHE_TTL
+    
+    auth_cache.clear()  # the cached entry expires
+    assert not _is_admin(client, root)
@@ -0,0 +1,98 @@
+"""
+Bulk admin operations: dry-run counts, chunked application, and the plan
+re-price committing with the first migration chunk
+"""
+
+import pytest
+from decimal import Decimal
+from models import db, User, Plan, Challenge
+from services import bulk_admin
+
+
+def _populate(count: int) -> tuple[Plan, Plan]:
+    """count active challenges on the first plan, plus one already passed"""
+    source, target = Plan.query.order_by(Plan.id).limit(2).all()
+    
+    for i in range(count + 1):
+        user = User(email=f'bulk{i}@tradesense.test', username=f'bulk{i}', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Challenge(
+            user_id=user.id,
+            plan_id=source.id,
+            initial_balance=source.initial_balance,
+            current_balance=source.initial_balance,
+            equity=source.initial_balance,
+            daily_start_equity=source.initial_balance,
+            status='active' if i < count else 'passed'
+        ))
+    db.session.commit()
+    return source, target
+
+
+def _on_plan(plan_id: int) -> int:
+    return Challenge.query.filter_by(plan_id=plan_id, status='active').count()
+
+
+def test_dry_run_only_counts(make_app):
+    app = make_app()
+    with app.app_context():
+        source, target = _populate(5)
+        price = source.price_dh
+        
+        report = bulk_admin.migrate_plan(source.id, target.id, price_dh=1.0, dry_run=True)
+        
+        assert (report['matched'], report['affected'], report['chunks']) == (5, 0, 0)
+        assert not report['repriced']
+        db.session.expire_all()
+        assert _on_plan(source.id) == 5
+        assert db.session.get(Plan, source.id).price_dh == price
+
+
+def test_migration_runs_in_chunks(make_app):
+    app = make_app()
+    with app.app_context():
+        source, target = _populate(5)
+        
+        report = bulk_admin.migrate_plan(source.id, target.id, price_dh=249.0, chunk_size=2)
+        
+        assert (report['matched'], report['affected'], report['chunks']) == (5, 5, 3)
+        assert report['repriced']
+        db.session.expire_all()
+        assert _on_plan(source.id) == 0
+        assert _on_plan(target.id) == 5
+        assert Challenge.query.filter_by(plan_id=source.id, status='passed').count() == 1
+        assert db.session.get(Plan, source.id).price_dh == Decimal('249.00')
+        
+        # Nothing left to move: a rerun changes nothing
+        assert bulk_admin.migrate_plan(source.id, target.id, chunk_size=2)['affected'] == 0
+
+
+def test_price_rolls_back_with_a_failed_first_chunk(make_app, monkeypatch):
+    app = make_app()
+    with app.app_context():
+        source, target = _populate(3)
+        price = source.price_dh
+        
+        def fail(*args, **kwargs):
+            raise RuntimeError('chunk failed')
+        monkeypatch.setattr(bulk_admin, '_update_returning', fail)
+        
+        with pytest.raises(RuntimeError):
+            bulk_admin.migrate_plan(source.id, target.id, price_dh=1.0, chunk_size=2)
+        
+        db.session.expire_all()
+        assert db.session.get(Plan, source.id).price_dh == price
+        assert _on_plan(source.id) == 3
+
+
+def test_price_applies_without_challenges_to_move(make_app):
+    app = make_app()
+    with app.app_context():
+        source, target = Plan.query.order_by(Plan.id).limit(2).all()
+        
+        report = bulk_admin.migrate_plan(source.id, target.id, price_dh=99.0)
+        
+        assert (report['matched'], report['chunks'], report['repriced']) == (0, 0, True)
+        db.session.expire_all()
+        assert db.session.get(Plan, source.id).price_dh == Decimal('99.00')
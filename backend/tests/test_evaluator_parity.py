@@ -0,0 +1,213 @@
+"""
+ChallengeEngine and the batch evaluator must reach the same verdicts
+Both run on identical populations, including challenges sitting exactly on
+a rule boundary and equities that only differ below a cent
+"""
+
+import pytest
+from decimal import Decimal
+from models import db, User, Plan, Challenge, Position, LeaderboardEntry
+from services.challenge_engine import evaluate_challenge
+from services.batch_evaluator import evaluate_active_challenges
+from services.leaderboard import refresh_entries
+
+# (plan, daily_start_equity, balance, high_water_mark, positions as (quantity, avg_entry_price, current_price))
+# Starter: 5000 initial, 5% daily, 10% total, 10% target; Elite gets an 8% trailing limit below
+POPULATION = [
+    ('Starter', '5000.00', '4750.00', None, []),  # daily loss exactly 5%
+    ('Starter', '5000.00', '4750.01', None, []),
+    ('Starter', '5000.00', '4749.99', None, [('1', '0.010001', '0.010001')]),  # a micro-unit short of 5%
+    ('Starter', '5000.00', '4749.99', None, [('2', '0.004', '0.005')]),  # exactly 5% through a position
+    ('Starter', '4700.00', '4500.00', None, []),  # total loss exactly 10%
+    ('Starter', '4700.00', '4500.01', None, []),
+    ('Starter', '5000.00', '5500.00', None, []),  # profit target exactly 10%
+    ('Starter', '5000.00', '5499.99', None, []),
+    ('Starter', '5000.00', '4500.00', None, [('0.5', '1000.00', '1000.000001')]),  # half a micro-unit rounds up
+    ('Starter', '5000.00', '4499.99', None, [('3', '333.33', None)]),  # no quote yet: priced at entry
+    ('Starter', '5000.00', '4499.99', None, [('0.333333', '3000.00', '3000.03')]),
+    ('Elite', '55300.00', '55200.00', '60000.00', []),  # trailing drawdown exactly 8%, ahead of the target
+    ('Elite', '55300.00', '55200.01', '60000.00', []),
+    ('Elite', '50000.00', '51000.00', None, [('10', '100.00', '99.999999')]),
+    ('Elite', '50000.00', '46000.00', '50500.00', []),
+    ('Starter', '5000.40', '4750.38', None, []),  # exactly 5%, but not in float64
+    ('Elite', '46100.00', '46002.76', '50003.00', []),  # exactly 8% trailing, but not in float64
+    ('Starter', '5000.00', '4999.50', None, [('0.5', '1000.00', '1000.999999')]),  # target reached by rounding the market value
+]
+
+FIELDS = ['status', 'failure_reason', 'equity', 'high_water_mark', 'max_drawdown_pct', 'intraday_high', 'intraday_low']
+
+
+def _populate() -> list[int]:
+    """Insert POPULATION and return the challenge ids in order"""
+    plans = {plan.name: plan for plan in Plan.query.all()}
+    plans['Elite'].max_trailing_drawdown_pct = Decimal('8.00')
+    
+    ids = []
+    for i, (plan_name, daily_start, balance, high_water_mark, positions) in enumerate(POPULATION):
+        user = User(email=f'parity{i}@tradesense.test', username=f'parity{i}', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        
+        plan = plans[plan_name]
+        challenge = Challenge(
+            user_id=user.id,
+            plan_id=plan.id,
+            initial_balance=plan.initial_balance,
+            current_balance=Decimal(balance),
+            equity=Decimal(balance),
+            daily_start_equity=Decimal(daily_start),
+            high_water_mark=Decimal(high_water_mark) if high_water_mark else None,
+            status='active'
+        )
+        db.session.add(challenge)
+        db.session.flush()
+        
+        for j, (quantity, avg_price, current_price) in enumerate(positions):
+            db.session.add(Position(
+                challenge_id=challenge.id,
+                symbol=f'SYM{j}',
+                quantity=Decimal(quantity),
+                avg_entry_price=Decimal(avg_price),
+                current_price=Decimal(current_price) if current_price else None
+            ))
+        ids.append(challenge.id)
+    
+    db.session.commit()
+    refresh_entries(ids)
+    db.session.commit()
+    return ids
+
+
+def _outcomes(make_app, evaluate) -> list[dict]:
+    app = make_app()
+    with app.app_context():
+        ids = _populate()
+        evaluate(ids)
+        db.session.expire_all()
+        return [
+            {field: getattr(db.session.get(Challenge, challenge_id), field) for field in FIELDS}
+            for challenge_id in ids
+        ]
+
+
+def test_batch_matches_engine(make_app):
+    def one_by_one(ids):
+        for challenge_id in ids:
+            evaluate_challenge(challenge_id)
+    
+    engine = _outcomes(make_app, one_by_one)
+    batch = _outcomes(make_app, lambda ids: evaluate_active_challenges())
+    
+    for spec, expected, actual in zip(POPULATION, engine, batch):
+        assert actual == expected, spec
+
+
+def test_boundaries_are_inclusive(make_app):
+    outcomes = _outcomes(make_app, lambda ids: evaluate_active_challenges())
+    statuses = [outcome['status'] for outcome in outcomes]
+    
+    assert statuses[:8] == ['failed', 'active', 'active', 'failed', 'failed', 'active', 'passed', 'active']
+    assert statuses[11:13] == ['failed', 'passed']
+    assert statuses[15:] == ['failed', 'failed', 'passed']
+    assert outcomes[11]['failure_reason'].startswith('Trailing drawdown limit exceeded: 8.00%')
+
+
+@pytest.mark.parametrize('update_returning', [True, False])
+def test_batch_skips_rows_changed_since_load(make_app, monkeypatch, update_returning):
+    import services.batch_evaluator as batch_evaluator
+    
+    app = make_app()
+    with app.app_context():
+        # False: the row-by-row fallback of dialects without UPDATE ... RETURNING
+        monkeypatch.setattr(db.engine.dialect, 'update_returning', update_returning)
+        ids = _populate()
+        bumped = [ids[0], ids[6]]  # a failure and a pass
+        load = batch_evaluator.load_active_columns
+        
+        def load_then_fill():
+            # A fill commits on two challenges after the batch read them
+            cols = load()
+            Challenge.query.filter(Challenge.id.in_(bumped)).update(
+                {'version': Challenge.version + 1}, synchronize_session=False
+            )
+            return cols
+        
+        monkeypatch.setattr(batch_evaluator, 'load_active_columns', load_then_fill)
+        result = evaluate_active_challenges()
+        db.session.expire_all()
+        
+        statuses = {challenge_id: db.session.get(Challenge, challenge_id).status for challenge_id in ids}
+        entries = {entry.challenge_id: entry.status for entry in LeaderboardEntry.query.all()}
+        
+        assert [statuses[challenge_id] for challenge_id in bumped] == ['active', 'active']
+        assert entries == statuses
+        assert result['passed'] == list(statuses.values()).count('passed')
+        assert result['failed'] == list(statuses.values()).count('failed')
+
+
+def test_kernels_match_money_beyond_float_precision():
+    import numpy as np
+    import random
+    from money import mul, div, reaches_pct
+    from services.batch_evaluator import _mul, _reaches_pct, _drawdown_pct
+    
+    rng = random.Random(7)
+    n = 20000
+    quantity = np.array([rng.choice((1, -1)) * rng.randrange(1, 10**13) for _ in range(n)], dtype=np.int64)
+    price = np.array([rng.randrange(1, 10**12) // rng.choice((1, 10**6)) for _ in range(n)], dtype=np.int64)
+    notional_ok = np.abs(quantity.astype(float) * price) < 2**62 * 1e6
+    expected = [mul(int(a), int(b)) for a, b in zip(quantity[notional_ok], price[notional_ok])]
+    assert _mul(quantity[notional_ok], price[notional_ok]).tolist() == expected
+    
+    # Parts on and around each limit, on balances up to ten million
+    whole = np.array([rng.randrange(10**6, 10**13) for _ in range(n)], dtype=np.int64)
+    limit = np.array([rng.randrange(1, 100) * 10**4 + rng.choice((0, 1, 5000)) for _ in range(n)], dtype=np.int64)
+    part = np.array([int(w) * int(p) // (100 * 10**6) + rng.randrange(-2, 3) for w, p in zip(whole, limit)], dtype=np.int64)
+    expected = [reaches_pct(int(a), int(w), int(p)) for a, w, p in zip(part, whole, limit)]
+    assert _reaches_pct(part, whole, limit).tolist() == expected
+    
+    equity = whole - part
+    expected = [div(int(h - e), int(h)) * 100 for h, e in zip(whole, equity)]
+    assert _drawdown_pct(whole, equity).tolist() == expected
+
+
+def test_running_stats_wait_for_write_stats(make_app):
+    app = make_app()
+    with app.app_context():
+        ids = _populate()
+        evaluate_active_challenges()
+        
+        # Every active balance gains a dollar: new equity, highs and high-water marks
+        active = Challenge.query.filter(Challenge.id.in_(ids), Challenge.status == 'active').all()
+        for challenge in active:
+            challenge.current_balance += Decimal('1.00')
+        db.session.commit()
+        before = {
+            challenge.id: (challenge.equity, challenge.high_water_mark, challenge.plan.max_trailing_drawdown_pct is not None)
+            for challenge in active
+        }
+        
+        result = evaluate_active_challenges(write_stats=False)
+        db.session.expire_all()
+        
+        marks_written = 0
+        for challenge_id, (equity, high_water_mark, trailing) in before.items():
+            challenge = db.session.get(Challenge, challenge_id)
+            if challenge.status != 'active':
+                continue
+            # Only a trailing limit's new high-water mark is written between write-backs
+            new_mark = trailing and equity + 1 > high_water_mark
+            assert challenge.high_water_mark == (equity + 1 if new_mark else high_water_mark)
+            assert challenge.equity == (equity + 1 if new_mark else equity)
+            marks_written += new_mark
+        
+        assert 0 < marks_written < len(before)
+        assert result['updated'] == result['passed'] + result['failed'] + marks_written
+        
+        evaluate_active_challenges(write_stats=True)
+        db.session.expire_all()
+        
+        for challenge_id, (equity, high_water_mark, trailing) in before.items():
+            challenge = db.session.get(Challenge, challenge_id)
+            if challenge.status == 'active':
+                assert challenge.equity == equity + 1
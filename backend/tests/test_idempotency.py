@@ -0,0 +1,104 @@
+"""
+Idempotency-Key on POST /api/trades: replays, key reuse with a different
+body, per-user scoping, and conflicts that release the key for a retry
+"""
+
+import pytest
+from models import db, User, Plan, Challenge, Trade
+from services.market_data import MarketDataService
+import routes.trades
+
+
+@pytest.fixture
+def client(make_app, monkeypatch):
+    monkeypatch.setattr(MarketDataService, 'get_price', staticmethod(
+        lambda symbol: {'symbol': symbol.upper(), 'price': 100.0, 'source': 'test'}
+    ))
+    app = make_app()
+    return app.test_client()
+
+
+def _trader(client, email: str) -> dict:
+    """Register a user with an active challenge; returns the auth header"""
+    token = client.post('/api/auth/register', json={'email': email, 'password': 'secret1'}).get_json()['access_token']
+    
+    with client.application.app_context():
+        user = User.query.filter_by(email=email).first()
+        plan = Plan.query.first()
+        db.session.add(Challenge(
+            user_id=user.id,
+            plan_id=plan.id,
+            initial_balance=plan.initial_balance,
+            current_balance=plan.initial_balance,
+            equity=plan.initial_balance,
+            daily_start_equity=plan.initial_balance,
+            status='active'
+        ))
+        db.session.commit()
+    
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _trades(client) -> int:
+    with client.application.app_context():
+        return Trade.query.count()
+
+
+def _buy(client, headers, key, quantity=10):
+    return client.post(
+        '/api/trades',
+        json={'symbol': 'AAPL', 'side': 'buy', 'quantity': quantity},
+        headers={**headers, 'Idempotency-Key': key}
+    )
+
+
+def test_retry_replays_the_recorded_response(client):
+    headers = _trader(client, 'replay@tradesense.test')
+    
+    first = _buy(client, headers, 'order-1')
+    retry = _buy(client, headers, 'order-1')
+    
+    assert first.status_code == retry.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert _trades(client) == 1
+
+
+def test_key_reused_for_a_different_request_is_refused(client):
+    headers = _trader(client, 'mismatch@tradesense.test')
+    
+    assert _buy(client, headers, 'order-1', quantity=10).status_code == 201
+    response = _buy(client, headers, 'order-1', quantity=11)
+    
+    assert response.status_code == 422
+    assert 'different request' in response.get_json()['error']
+    assert _trades(client) == 1
+
+
+def test_keys_are_scoped_per_user(client):
+    alice = _trader(client, 'alice@tradesense.test')
+    bob = _trader(client, 'bob@tradesense.test')
+    
+    assert _buy(client, alice, 'shared').status_code == 201
+    response = _buy(client, bob, 'shared')
+    
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _trades(client) == 2
+
+
+def test_conflict_releases_the_key_for_a_retry(client, monkeypatch):
+    headers = _trader(client, 'conflict@tradesense.test')
+    execute_order = routes.trades.execute_order
+    monkeypatch.setattr(routes.trades, 'execute_order', lambda *args: {'error': 'Conflict', 'retryable': True})
+    
+    assert _buy(client, headers, 'order-1').status_code == 409
+    assert _trades(client) == 0
+    
+    monkeypatch.setattr(routes.trades, 'execute_order', execute_order)
+    response = _buy(client, headers, 'order-1')
+    
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert _trades(client) == 1
@@ -0,0 +1,117 @@
+"""
+The in-memory order book: heap-ordered triggers, removal, and syncing open
+orders that committed out of id order
+"""
+
+from decimal import Decimal
+from models import db, User, Plan, Challenge, Order
+from services.order_book import SymbolBook, OrderBook
+
+
+def test_cross_pops_triggered_orders_from_both_sides():
+    book = SymbolBook()
+    book.add(1, 'buy', 'limit', 90.0)  # falls
+    book.add(2, 'sell', 'stop_loss', 95.0)  # falls
+    book.add(3, 'sell', 'take_profit', 110.0)  # rises
+    book.add(4, 'sell', 'limit', 105.0)  # rises
+    book.add(5, 'buy', 'limit', 80.0)
+    
+    assert book.cross(100.0) == []
+    assert book.cross(95.0) == [2]
+    assert sorted(book.cross(105.0)) == [4]
+    assert book.cross(90.0) == [1]
+    assert len(book) == 2
+    assert book.cross(200.0) == [3]
+    assert book.cross(0.0) == [5]
+    assert len(book) == 0
+
+
+def test_removed_orders_never_trigger():
+    book = SymbolBook()
+    for order_id in range(1, 11):
+        book.add(order_id, 'buy', 'limit', float(order_id))
+    
+    for order_id in (3, 4, 5, 6, 7, 8):
+        book.remove(order_id)  # compacts past half
+    
+    assert len(book) == 4
+    assert book.cross(11.0) == []
+    assert sorted(book.cross(9.0)) == [9, 10]
+    assert sorted(book.cross(0.5)) == [1, 2]
+    assert len(book) == 0
+
+
+def _challenge() -> Challenge:
+    user = User(email='book@tradesense.test', username='book', password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    
+    plan = Plan.query.first()
+    challenge = Challenge(
+        user_id=user.id,
+        plan_id=plan.id,
+        initial_balance=plan.initial_balance,
+        current_balance=plan.initial_balance,
+        equity=plan.initial_balance,
+        daily_start_equity=plan.initial_balance,
+        status='active'
+    )
+    db.session.add(challenge)
+    db.session.commit()
+    return challenge
+
+
+def _order(challenge, trigger: str) -> Order:
+    order = Order(
+        challenge_id=challenge.id,
+        symbol='AAPL',
+        side='sell',
+        order_type='take_profit',
+        quantity=Decimal('1'),
+        trigger_price=Decimal(trigger),
+        status='open'
+    )
+    db.session.add(order)
+    db.session.flush()
+    return order
+
+
+def test_sync_loads_orders_committed_below_the_highest_id(make_app):
+    app = make_app()
+    with app.app_context():
+        challenge = _challenge()
+        book = OrderBook()
+        
+        # This process places order 2 while another process's order 1 is
+        # still uncommitted; it shows up as open only afterwards
+        earlier = _order(challenge, '110')
+        earlier.status = 'pending'
+        later = _order(challenge, '120')
+        db.session.commit()
+        book.add(later)
+        
+        assert book.sync() == 0
+        
+        earlier.status = 'open'
+        db.session.commit()
+        
+        assert book.sync() == 1
+        assert book.sync() == 0
+        
+        # Both trigger; without a position each fill is rejected
+        assert book.on_tick('AAPL', 130) == {'triggered': 2, 'filled': 0, 'rejected': 2}
+        assert book.symbols() == []
+
+
+def test_cancelled_order_leaves_the_book(make_app):
+    app = make_app()
+    with app.app_context():
+        challenge = _challenge()
+        book = OrderBook()
+        order = _order(challenge, '110')
+        db.session.commit()
+        
+        book.sync()
+        assert book.remove(order)
+        assert not book.remove(order)
+        assert book.on_tick('AAPL', 130)['triggered'] == 0
@@ -0,0 +1,106 @@
+"""
+Concurrent fills on one challenge through run_serialized: the balance is
+never double-spent, and the balance, positions, trades and ledger agree
+afterwards (the invariants benchmarks/order_stress.py checks)
+"""
+
+import random
+import threading
+from decimal import Decimal
+from config import config
+from models import db, User, Plan, Challenge, Position, Trade
+from money import to_micros, round_micros, round_cents
+from services.ledger import record_deposit, verify_challenge
+from services.trade_executor import run_serialized, apply_order
+from services.portfolio_cache import portfolio_cache
+
+THREADS = 8
+ORDERS_PER_THREAD = 25
+SYMBOLS = {'AAPL': 178.50, 'MSFT': 378.20}
+
+
+def test_concurrent_buys_and_sells_keep_the_invariants(make_app, monkeypatch, tmp_path):
+    # Threads share one database file; in-memory SQLite is one database per connection
+    monkeypatch.setattr(config['testing'], 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'orders.db'}")
+    app = make_app()
+    
+    with app.app_context():
+        plan = Plan.query.filter_by(name='Elite').first()
+        user = User(email='concurrent@tradesense.test', username='concurrent', password_hash='x')
+        challenge = Challenge(
+            user=user,
+            plan_id=plan.id,
+            initial_balance=plan.initial_balance,
+            current_balance=plan.initial_balance,
+            equity=plan.initial_balance,
+            daily_start_equity=plan.initial_balance,
+            status='active'
+        )
+        db.session.add_all([user, challenge])
+        record_deposit(challenge, plan.initial_balance)
+        db.session.commit()
+        challenge_id, initial_balance = challenge.id, challenge.initial_balance
+        
+        # Fills write through to a cached portfolio
+        portfolio_cache.get(challenge)
+    
+    results = []
+    results_lock = threading.Lock()
+    
+    def worker(seed):
+        rng = random.Random(seed)
+        outcomes = []
+        with app.app_context():
+            for _ in range(ORDERS_PER_THREAD):
+                symbol = rng.choice(list(SYMBOLS))
+                side = 'buy' if rng.random() < 0.6 else 'sell'
+                quantity = to_micros(rng.randint(1, 10))
+                price = to_micros(round(SYMBOLS[symbol] * rng.uniform(0.995, 1.005), 2))
+                
+                outcomes.append(run_serialized(challenge_id, lambda c: apply_order(c, symbol, side, quantity, price)))
+            db.session.remove()
+        
+        with results_lock:
+            results.extend(outcomes)
+    
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    with app.app_context():
+        challenge = db.session.get(Challenge, challenge_id)
+        trades = Trade.query.filter_by(challenge_id=challenge_id).all()
+        
+        assert len(results) == THREADS * ORDERS_PER_THREAD
+        assert not [result for result in results if result.get('retryable')]
+        assert len(trades) == sum('error' not in result for result in results)
+        assert {trade.side for trade in trades} == {'buy', 'sell'}
+        assert challenge.current_balance >= 0
+        
+        # Balance: every buy paid and every sale credited exactly once
+        cash = initial_balance
+        net = {}
+        for trade in trades:
+            if trade.side == 'buy':
+                cash -= round_cents(round_micros(trade.entry_price * trade.quantity))
+                net[trade.symbol] = net.get(trade.symbol, Decimal('0')) + trade.quantity
+            else:
+                cash += round_cents(round_micros(trade.exit_price * trade.quantity))
+                net[trade.symbol] = net.get(trade.symbol, Decimal('0')) - trade.quantity
+        assert challenge.current_balance == cash
+        
+        # Positions: the net traded quantity of each symbol
+        held = {p.symbol: p.quantity for p in Position.query.filter_by(challenge_id=challenge_id)}
+        assert held == {symbol: quantity for symbol, quantity in net.items() if quantity}
+        
+        # Ledger: replaying it rebuilds the live balance and positions
+        audit = verify_challenge(challenge)
+        assert audit['consistent'], audit['differences']
+        
+        # Cache: the written-through portfolio matches a fresh load
+        cached = portfolio_cache._entries[challenge_id]
+        assert cached.version == challenge.version
+        stored = portfolio_cache._load(challenge, 0)
+        assert (cached.balance, cached.positions) == (stored.balance, stored.positions)
@@ -0,0 +1,94 @@
+"""
+Keyset pagination of the admin payment list: cursor paging across tied
+timestamps, the inclusive 'to' day, and malformed cursors
+"""
+
+import pytest
+from datetime import datetime
+from models import db, User, Plan, Payment
+from services.pagination import encode_cursor
+
+TIMES = [
+    datetime(2026, 2, 28, 18, 0),
+    datetime(2026, 3, 1, 9, 0),
+    datetime(2026, 3, 1, 9, 0),  # same timestamp: ordered by id
+    datetime(2026, 3, 1, 9, 0),
+    datetime(2026, 3, 1, 23, 59, 59, 500000),
+    datetime(2026, 3, 2, 0, 0),
+    datetime(2026, 3, 2, 12, 0),
+]
+
+
+@pytest.fixture
+def admin(make_app):
+    """(client, admin auth header, payment ids in list order)"""
+    app = make_app()
+    client = app.test_client()
+    client.post('/api/auth/register', json={'email': 'admin@tradesense.test', 'password': 'secret1'})
+    
+    with app.app_context():
+        user = User.query.filter_by(email='admin@tradesense.test').first()
+        user.is_admin = True
+        plan = Plan.query.first()
+        payments = [
+            Payment(user_id=user.id, plan_id=plan.id, amount_dh=plan.price_dh, payment_method='mock_cmi',
+                    transaction_id=f'TXN-{i}', status='completed', created_at=created_at)
+            for i, created_at in enumerate(TIMES)
+        ]
+        db.session.add_all(payments)
+        db.session.commit()
+        ordered = [p.id for p in sorted(payments, key=lambda p: (p.created_at, p.id), reverse=True)]
+    
+    token = client.post('/api/auth/login', json={'email': 'admin@tradesense.test', 'password': 'secret1'}).get_json()['access_token']
+    return client, {'Authorization': f'Bearer {token}'}, ordered
+
+
+def _ids(response) -> list[int]:
+    return [payment['id'] for payment in response.get_json()['payments']]
+
+
+def test_cursor_pages_cover_every_row_once(admin):
+    client, headers, ordered = admin
+    seen, cursor, pages = [], None, 0
+    
+    while True:
+        url = '/api/admin/payments?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        seen += _ids(response)
+        pages += 1
+        assert body['total'] == len(TIMES)
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    
+    assert seen == ordered
+    assert pages == 4
+
+
+def test_to_date_includes_the_whole_day(admin):
+    client, headers, _ = admin
+    
+    whole_day = client.get('/api/admin/payments?from=2026-03-01&to=2026-03-01', headers=headers)
+    assert whole_day.get_json()['total'] == 4  # 09:00 x3 and 23:59:59.5, not midnight of the 2nd
+    
+    up_to_time = client.get('/api/admin/payments?to=2026-03-01T09:00:00', headers=headers)
+    assert up_to_time.get_json()['total'] == 4  # a datetime bound is inclusive as given
+    
+    paged = client.get('/api/admin/payments?to=2026-03-01&limit=3', headers=headers).get_json()
+    rest = client.get(f"/api/admin/payments?to=2026-03-01&limit=3&cursor={paged['next_cursor']}", headers=headers)
+    assert len(paged['payments']) + len(_ids(rest)) == 5
+    assert rest.get_json()['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    encode_cursor('2026-03-01T09:00:00'),
+    encode_cursor('2026-03-01T09:00:00', 'x'),
+    encode_cursor(None, 1),
+    encode_cursor('yesterday', 1),
+])
+def test_malformed_cursor_is_a_400(admin, cursor):
+    client, headers, _ = admin
+    assert client.get(f'/api/admin/payments?cursor={cursor}', headers=headers).status_code == 400
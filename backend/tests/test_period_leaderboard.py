@@ -0,0 +1,60 @@
+"""
+Period leaderboards: closed buckets are served as immutable, so everything in
+the body, display names included, is fixed when the challenge passes
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from models import db, User, Plan, Challenge, PeriodRanking
+from services.period_leaderboard import record_passed, backfill_period_rankings
+
+CLOSED_DAY = datetime(2026, 1, 5, 12, 0)
+
+
+def _passed(username: str) -> Challenge:
+    user = User(email=f'{username}@tradesense.test', username=username, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    
+    plan = Plan.query.first()
+    challenge = Challenge(
+        user_id=user.id,
+        plan_id=plan.id,
+        initial_balance=plan.initial_balance,
+        current_balance=plan.initial_balance,
+        equity=plan.initial_balance * Decimal('1.12'),
+        daily_start_equity=plan.initial_balance,
+        status='passed',
+        end_date=CLOSED_DAY
+    )
+    db.session.add(challenge)
+    db.session.flush()
+    record_passed([challenge.id])
+    db.session.commit()
+    return challenge
+
+
+def test_closed_period_keeps_the_name_at_pass_time(make_app):
+    app = make_app()
+    with app.app_context():
+        challenge = _passed('alice')
+        challenge.user.username = 'alice_renamed'
+        db.session.commit()
+    
+    response = app.test_client().get('/api/leaderboard/periods/day/2026-01-05')
+    
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert [row['username'] for row in response.get_json()['leaderboard']] == ['alice']
+
+
+def test_rows_recorded_without_a_name_are_backfilled(make_app):
+    app = make_app()
+    with app.app_context():
+        _passed('bob')
+        PeriodRanking.query.update({'username': None})
+        db.session.commit()
+        
+        backfill_period_rankings()
+        
+        assert {row.username for row in PeriodRanking.query.all()} == {'bob'}
@@ -0,0 +1,85 @@
+"""
+Rank index: ordering, and leaderboard writes that only reach the index once
+their transaction commits
+"""
+
+from decimal import Decimal
+from models import db, User, Plan, Challenge
+from services.leaderboard import sync_entry
+from services.rank_index import RankIndex, rank_index
+
+
+def test_ranks_by_profit_then_challenge_id():
+    index = RankIndex()
+    index.update(1, 10, 'active', 5.0)
+    index.update(2, 20, 'active', 12.5)
+    index.update(3, 30, 'active', 5.0)
+    index.update(4, 40, 'active', -3.0)
+    
+    assert [row['challenge_id'] for row in index.top(10)] == [2, 1, 3, 4]
+    assert index.rank_of(3) == 3
+    assert [row['challenge_id'] for row in index.around(3, 1)] == [1, 3, 4]
+    
+    index.update(4, 40, 'active', 20.0)  # moves to the top
+    index.update(2, 20, 'failed', 12.5)  # leaves the index
+    assert [row['challenge_id'] for row in index.top(10)] == [4, 1, 3]
+    assert index.rank_of(2) is None
+    assert index.challenge_of(20) is None
+
+
+def _challenge(email: str, equity: str) -> Challenge:
+    user = User(email=email, username=email.split('@')[0], password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    
+    plan = Plan.query.first()
+    challenge = Challenge(
+        user_id=user.id,
+        plan_id=plan.id,
+        initial_balance=plan.initial_balance,
+        current_balance=plan.initial_balance,
+        equity=plan.initial_balance * Decimal(equity),
+        daily_start_equity=plan.initial_balance,
+        status='active'
+    )
+    db.session.add(challenge)
+    sync_entry(challenge)
+    db.session.commit()
+    return challenge
+
+
+def test_update_applies_after_commit(make_app):
+    app = make_app()
+    with app.app_context():
+        leader = _challenge('leader@tradesense.test', '1.05')
+        chaser = _challenge('chaser@tradesense.test', '1.02')
+        assert rank_index.rank_of(leader.id) == 1
+        assert rank_index.rank_of(chaser.id) == 2
+        
+        chaser.equity = chaser.initial_balance * Decimal('1.08')
+        sync_entry(chaser)
+        assert rank_index.rank_of(chaser.id) == 2  # staged only
+        
+        db.session.commit()
+        assert rank_index.rank_of(chaser.id) == 1
+        assert rank_index.rank_of(leader.id) == 2
+
+
+def test_rollback_drops_the_staged_update(make_app):
+    app = make_app()
+    with app.app_context():
+        leader = _challenge('leader@tradesense.test', '1.05')
+        chaser = _challenge('chaser@tradesense.test', '1.02')
+        
+        chaser.equity = chaser.initial_balance * Decimal('1.08')
+        sync_entry(chaser)
+        db.session.rollback()
+        assert rank_index.rank_of(chaser.id) == 2
+        
+        # A later, unrelated commit must not apply the dropped update
+        leader.equity = leader.initial_balance * Decimal('1.06')
+        sync_entry(leader)
+        db.session.commit()
+        assert rank_index.rank_of(leader.id) == 1
+        assert rank_index.rank_of(chaser.id) == 2
+        assert rank_index.top(2)[1]['profit_pct'] == 2.0
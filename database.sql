@@ -8,6 +8,7 @@ CREATE TABLE IF NOT EXISTS users (
     password_hash VARCHAR(255) NOT NULL,
     username VARCHAR(100),
     is_admin BOOLEAN DEFAULT FALSE,
+    auth_version INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -21,6 +22,7 @@ CREATE TABLE IF NOT EXISTS plans (
     max_daily_loss_pct DECIMAL(5, 2) DEFAULT 5.00,
     max_total_loss_pct DECIMAL(5, 2) DEFAULT 10.00,
     profit_target_pct DECIMAL(5, 2) DEFAULT 10.00,
+    max_trailing_drawdown_pct DECIMAL(5, 2),
     description TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -42,6 +44,14 @@ CREATE TABLE IF NOT EXISTS challenges (
     daily_start_equity DECIMAL(15, 2) NOT NULL,
     status VARCHAR(20) DEFAULT 'active' CHECK (status IN ('active', 'passed', 'failed')),
     failure_reason VARCHAR(255),
+    high_water_mark DECIMAL(15, 2),
+    max_drawdown_pct DECIMAL(7, 4) DEFAULT 0,
+    intraday_high DECIMAL(15, 2),
+    intraday_low DECIMAL(15, 2),
+    best_day_pnl DECIMAL(15, 2),
+    worst_day_pnl DECIMAL(15, 2),
+    ledger_seq INTEGER DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1,
     start_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     end_date TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -81,6 +91,185 @@ CREATE TABLE IF NOT EXISTS positions (
     UNIQUE(challenge_id, symbol)
 );
 
+-- Resting orders (limit, stop-loss, take-profit)
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id INTEGER NOT NULL,
+    symbol VARCHAR(20) NOT NULL,
+    side VARCHAR(10) NOT NULL CHECK (side IN ('buy', 'sell')),
+    order_type VARCHAR(20) NOT NULL CHECK (order_type IN ('limit', 'stop_loss', 'take_profit')),
+    quantity DECIMAL(15, 6) NOT NULL,
+    trigger_price DECIMAL(15, 6) NOT NULL,
+    status VARCHAR(20) DEFAULT 'open' CHECK (status IN ('open', 'filled', 'cancelled', 'rejected')),
+    reject_reason VARCHAR(255),
+    fill_price DECIMAL(15, 6),
+    trade_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    filled_at TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    FOREIGN KEY (trade_id) REFERENCES trades(id)
+);
+
+-- Trade ledger (append-only fills and cash movements)
+CREATE TABLE IF NOT EXISTS ledger_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    entry_type VARCHAR(20) NOT NULL CHECK (entry_type IN ('deposit', 'fill')),
+    symbol VARCHAR(20),
+    side VARCHAR(10) CHECK (side IN ('buy', 'sell')),
+    quantity DECIMAL(15, 6),
+    price DECIMAL(15, 6),
+    cash_delta DECIMAL(15, 2) NOT NULL,
+    trade_id INTEGER,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    FOREIGN KEY (trade_id) REFERENCES trades(id),
+    UNIQUE(challenge_id, seq)
+);
+
+-- Ledger snapshots (state folded up to seq)
+CREATE TABLE IF NOT EXISTS ledger_snapshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    balance DECIMAL(15, 2) NOT NULL,
+    positions TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    UNIQUE(challenge_id, seq)
+);
+
+-- Idempotency-Key claims and recorded responses (one row per user and key)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    fingerprint VARCHAR(64) NOT NULL,  -- sha256 of method, path and body
+    status_code INTEGER,  -- NULL while the first request is in flight
+    body BLOB,
+    mimetype VARCHAR(100),
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL,
+    UNIQUE (user_id, key),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Post-trade evaluation queue (one row per pending challenge)
+CREATE TABLE IF NOT EXISTS pending_evaluations (
+    challenge_id INTEGER PRIMARY KEY,
+    enqueued_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    attempts INTEGER DEFAULT 0,
+    claimed_by VARCHAR(100),  -- host:pid of the worker evaluating it
+    claimed_at TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE
+);
+
+-- Realized trading statistics per challenge and symbol
+CREATE TABLE IF NOT EXISTS trading_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    challenge_id INTEGER NOT NULL,
+    symbol VARCHAR(20) NOT NULL,
+    closed_trades INTEGER NOT NULL DEFAULT 0,
+    winning_trades INTEGER NOT NULL DEFAULT 0,
+    losing_trades INTEGER NOT NULL DEFAULT 0,
+    gross_profit DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    gross_loss DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    largest_win DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    largest_loss DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    volume DECIMAL(15, 6) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    UNIQUE (challenge_id, symbol)
+);
+
+-- Materialized leaderboard, one row per challenge
+CREATE TABLE IF NOT EXISTS leaderboard_entries (
+    challenge_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    initial_balance DECIMAL(15, 2) NOT NULL,
+    equity DECIMAL(15, 2) NOT NULL,
+    profit_pct DECIMAL(11, 4) NOT NULL,
+    start_date TIMESTAMP,
+    end_date TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- Passed challenges bucketed by the day, ISO week and month they closed in
+CREATE TABLE IF NOT EXISTS period_rankings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    period VARCHAR(10) NOT NULL CHECK (period IN ('day', 'week', 'month')),
+    period_key VARCHAR(10) NOT NULL,
+    plan_id INTEGER NOT NULL,
+    challenge_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    username VARCHAR(100),
+    initial_balance DECIMAL(15, 2) NOT NULL,
+    equity DECIMAL(15, 2) NOT NULL,
+    profit_pct DECIMAL(11, 4) NOT NULL,
+    closed_at TIMESTAMP NOT NULL,
+    FOREIGN KEY (plan_id) REFERENCES plans(id),
+    FOREIGN KEY (challenge_id) REFERENCES challenges(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id),
+    UNIQUE (period, period_key, challenge_id)
+);
+
+-- Change counters for public data sets (ETags of cached responses)
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Admin dashboard counters (single row, id = 1)
+CREATE TABLE IF NOT EXISTS metrics_rollup (
+    id INTEGER PRIMARY KEY,
+    users_total INTEGER NOT NULL DEFAULT 0,
+    users_admins INTEGER NOT NULL DEFAULT 0,
+    challenges_active INTEGER NOT NULL DEFAULT 0,
+    challenges_passed INTEGER NOT NULL DEFAULT 0,
+    challenges_failed INTEGER NOT NULL DEFAULT 0,
+    payments_pending INTEGER NOT NULL DEFAULT 0,
+    payments_completed INTEGER NOT NULL DEFAULT 0,
+    payments_failed INTEGER NOT NULL DEFAULT 0,
+    revenue_pending DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_completed DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_failed DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_mock_cmi DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_mock_crypto DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_paypal DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    revenue_other DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    reconciled_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Admin analytics: completed payments per day, plan and method
+CREATE TABLE IF NOT EXISTS daily_revenue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day DATE NOT NULL,
+    plan_id INTEGER NOT NULL,
+    payment_method VARCHAR(50) NOT NULL,
+    payments INTEGER NOT NULL DEFAULT 0,
+    revenue_dh DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    FOREIGN KEY (plan_id) REFERENCES plans(id),
+    UNIQUE (day, plan_id, payment_method)
+);
+
+-- Admin analytics: challenges started, passed and failed per day and plan
+CREATE TABLE IF NOT EXISTS daily_challenge_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day DATE NOT NULL,
+    plan_id INTEGER NOT NULL,
+    started INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (plan_id) REFERENCES plans(id),
+    UNIQUE (day, plan_id)
+);
+
 -- Payments table
 CREATE TABLE IF NOT EXISTS payments (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -148,8 +337,20 @@ LIMIT 10;
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_challenges_user_id ON challenges(user_id);
 CREATE INDEX IF NOT EXISTS idx_challenges_status ON challenges(status);
-CREATE INDEX IF NOT EXISTS idx_trades_challenge_id ON trades(challenge_id);
+CREATE INDEX IF NOT EXISTS ix_users_created_id ON users(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires ON idempotency_keys(expires_at);
+CREATE INDEX IF NOT EXISTS ix_challenges_created_id ON challenges(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_challenges_status_created_id ON challenges(status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_trades_challenge_opened ON trades(challenge_id, opened_at, id);
+CREATE INDEX IF NOT EXISTS idx_trades_challenge_symbol_opened ON trades(challenge_id, symbol, opened_at, id);
 CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
 CREATE INDEX IF NOT EXISTS idx_positions_challenge_id ON positions(challenge_id);
+CREATE INDEX IF NOT EXISTS ix_orders_status_id ON orders(status, id);
+CREATE INDEX IF NOT EXISTS ix_leaderboard_status_profit ON leaderboard_entries(status, profit_pct);
+CREATE INDEX IF NOT EXISTS ix_leaderboard_profit ON leaderboard_entries(profit_pct);
+CREATE INDEX IF NOT EXISTS ix_period_rankings_bucket ON period_rankings(period, period_key, profit_pct);
+CREATE INDEX IF NOT EXISTS ix_period_rankings_plan_bucket ON period_rankings(period, period_key, plan_id, profit_pct);
 CREATE INDEX IF NOT EXISTS idx_payments_user_id ON payments(user_id);
+CREATE INDEX IF NOT EXISTS ix_payments_created_id ON payments(created_at, id);
+CREATE INDEX IF NOT EXISTS ix_payments_status_created_id ON payments(status, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_market_data_symbol ON market_data(symbol);
@@ -9,6 +9,8 @@ function AdminPanel() {
     const [users, setUsers] = useState([])
     const [challenges, setChallenges] = useState([])
     const [payments, setPayments] = useState([])
+    const [totals, setTotals] = useState({ users: 0, challenges: 0, payments: 0 })
+    const [cursors, setCursors] = useState({ users: null, challenges: null, payments: null })
     const [paypalConfig, setPaypalConfig] = useState({ client_id: '', client_secret: '', mode: 'sandbox' })
     const [loading, setLoading] = useState(true)
 
@@ -37,16 +39,30 @@ function AdminPanel() {
         }
     }
 
-    const fetchUsers = async () => {
+    // One keyset page of an admin list; the returned next_cursor fetches the following page
+    const fetchPage = async (list, cursor) => {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+        const res = await fetch(`${API_URL}/admin/${list}${query}`, {
+            headers: { Authorization: `Bearer ${token}` }
+        })
+        const data = await res.json()
+        if (res.ok) {
+            setCursors(prev => ({ ...prev, [list]: data.next_cursor || null }))
+            setTotals(prev => ({ ...prev, [list]: data.total || 0 }))
+        }
+        return { res, data }
+    }
+
+    // Without a cursor the list restarts at the first page, with one the page is appended
+    const appendOrReplace = (cursor, rows) => prev => cursor ? [...prev, ...rows] : rows
+
+    const fetchUsers = async (cursor = null) => {
         try {
             console.log('Fetching users...')
-            const res = await fetch(`${API_URL}/admin/users`, {
-                headers: { Authorization: `Bearer ${token}` }
-            })
-            const data = await res.json()
+            const { res, data } = await fetchPage('users', cursor)
             console.log('Users response:', data)
             if (res.ok) {
-                setUsers(data.users || [])
+                setUsers(appendOrReplace(cursor, data.users || []))
             } else {
                 console.error('Error fetching users:', data.error)
                 alert('Erreur: ' + (data.error || 'Impossible de charger les utilisateurs'))
@@ -57,20 +73,14 @@ function AdminPanel() {
         }
     }
 
-    const fetchChallenges = async () => {
-        const res = await fetch(`${API_URL}/admin/challenges`, {
-            headers: { Authorization: `Bearer ${token}` }
-        })
-        const data = await res.json()
-        setChallenges(data.challenges || [])
+    const fetchChallenges = async (cursor = null) => {
+        const { data } = await fetchPage('challenges', cursor)
+        setChallenges(appendOrReplace(cursor, data.challenges || []))
     }
 
-    const fetchPayments = async () => {
-        const res = await fetch(`${API_URL}/admin/payments`, {
-            headers: { Authorization: `Bearer ${token}` }
-        })
-        const data = await res.json()
-        setPayments(data.payments || [])
+    const fetchPayments = async (cursor = null) => {
+        const { data } = await fetchPage('payments', cursor)
+        setPayments(appendOrReplace(cursor, data.payments || []))
     }
 
     const fetchPaypalConfig = async () => {
@@ -122,11 +132,16 @@ function AdminPanel() {
         }
     }
 
-    // Helper to get user email by id
-    const getUserEmail = (userId) => {
-        const user = users.find(u => u.id === userId)
-        return user ? user.email : `User #${userId}`
-    }
+    const loadMore = (shown, list, fetchNext) => (
+        <div className="admin-load-more">
+            <span>{shown} / {totals[list]} affichés</span>
+            {cursors[list] && (
+                <button className="btn btn-secondary" onClick={() => fetchNext(cursors[list])}>
+                    Charger plus
+                </button>
+            )}
+        </div>
+    )
 
     if (loading) {
         return (
@@ -246,7 +261,7 @@ function AdminPanel() {
                 {activeTab === 'users' && (
                     <div className="admin-section">
                         <h1>👥 Gestion des Utilisateurs</h1>
-                        <p className="admin-subtitle">Total: {users.length} comptes enregistrés</p>
+                        <p className="admin-subtitle">Total: {totals.users} comptes enregistrés</p>
 
                         <table className="admin-table">
                             <thead>
@@ -283,6 +298,7 @@ function AdminPanel() {
                                 ))}
                             </tbody>
                         </table>
+                        {loadMore(users.length, 'users', fetchUsers)}
                     </div>
                 )}
 
@@ -290,7 +306,7 @@ function AdminPanel() {
                 {activeTab === 'challenges' && (
                     <div className="admin-section">
                         <h1>🎯 Tous les Challenges</h1>
-                        <p className="admin-subtitle">Total: {challenges.length} challenges créés</p>
+                        <p className="admin-subtitle">Total: {totals.challenges} challenges créés</p>
 
                         <table className="admin-table">
                             <thead>
@@ -309,7 +325,7 @@ function AdminPanel() {
                                 {challenges.map(c => (
                                     <tr key={c.id}>
                                         <td>#{c.id}</td>
-                                        <td><strong>User #{c.user_id}</strong></td>
+                                        <td><strong>{c.user_email || `User #${c.user_id}`}</strong></td>
                                         <td>{c.plan_name}</td>
                                         <td>${c.initial_balance?.toLocaleString()}</td>
                                         <td>${c.equity?.toLocaleString()}</td>
@@ -326,6 +342,7 @@ function AdminPanel() {
                                 ))}
                             </tbody>
                         </table>
+                        {loadMore(challenges.length, 'challenges', fetchChallenges)}
                     </div>
                 )}
 
@@ -333,7 +350,7 @@ function AdminPanel() {
                 {activeTab === 'payments' && (
                     <div className="admin-section">
                         <h1>💳 Historique des Paiements</h1>
-                        <p className="admin-subtitle">Total: {payments.length} paiements</p>
+                        <p className="admin-subtitle">Total: {totals.payments} paiements</p>
 
                         <table className="admin-table">
                             <thead>
@@ -353,8 +370,8 @@ function AdminPanel() {
                                     <tr key={p.id}>
                                         <td>#{p.id}</td>
                                         <td><code>{p.transaction_id || '-'}</code></td>
-                                        <td><strong>User #{p.user_id}</strong></td>
-                                        <td>Plan #{p.plan_id}</td>
+                                        <td><strong>{p.user_email || `User #${p.user_id}`}</strong></td>
+                                        <td>{p.plan_name || `Plan #${p.plan_id}`}</td>
                                         <td><strong>{p.amount_dh} DH</strong></td>
                                         <td>
                                             <span className="badge badge-secondary">
@@ -373,6 +390,7 @@ function AdminPanel() {
                                 ))}
                             </tbody>
                         </table>
+                        {loadMore(payments.length, 'payments', fetchPayments)}
                     </div>
                 )}
 